@@ -0,0 +1,271 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from google.cloud import bigquery
+from config.config import Config
+
+READY_STATUS = "ACTIVE"
+
+
+def build_filter_clause(
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, List[Any]]:
+    """WHERE predicates and query parameters for metadata filters
+
+    Supported keys: tags (any of), primary_tag (any of), created_after,
+    created_before, min_score. The date predicates compare creation_date directly
+    so BigQuery prunes partitions. The table is clustered on primary_tag, so only
+    the primary_tag filter prunes blocks; tags matches any tag of a post and has
+    to scan every block of the selected partitions.
+    """
+    filters = filters or {}
+    predicates = ["deleted IS NOT TRUE"]
+    params = []
+    if filters.get("primary_tag"):
+        predicates.append("primary_tag IN UNNEST(@filter_primary_tags)")
+        params.append(
+            bigquery.ArrayQueryParameter(
+                "filter_primary_tags", "STRING", list(filters["primary_tag"])
+            )
+        )
+    if filters.get("tags"):
+        predicates.append(
+            "EXISTS (SELECT 1 FROM UNNEST(tags) AS tag WHERE tag IN UNNEST(@filter_tags))"
+        )
+        params.append(
+            bigquery.ArrayQueryParameter("filter_tags", "STRING", list(filters["tags"]))
+        )
+    if filters.get("created_after") is not None:
+        predicates.append("creation_date >= @created_after")
+        params.append(
+            bigquery.ScalarQueryParameter(
+                "created_after", "TIMESTAMP", filters["created_after"]
+            )
+        )
+    if filters.get("created_before") is not None:
+        predicates.append("creation_date < @created_before")
+        params.append(
+            bigquery.ScalarQueryParameter(
+                "created_before", "TIMESTAMP", filters["created_before"]
+            )
+        )
+    if filters.get("min_score") is not None:
+        predicates.append("score >= @min_score")
+        params.append(
+            bigquery.ScalarQueryParameter(
+                "min_score", "INT64", int(filters["min_score"])
+            )
+        )
+    return " AND ".join(predicates), params
+
+
+def build_exact_query(top_k: int, filters: Optional[Dict[str, Any]] = None) -> str:
+    """brute-force cosine distance over every live chunk matching the filters"""
+    where, _ = build_filter_clause(filters)
+    return f"""
+    SELECT
+        doc_id,
+        title,
+        content,
+        chunk_index,
+        char_start,
+        char_end,
+        ML.DISTANCE(embedding, @query_embedding, 'COSINE') AS distance
+    FROM `{Config.get_bigquery_table()}`
+    WHERE {where}
+    ORDER BY distance ASC
+    LIMIT {int(top_k)}
+    """
+
+
+def build_vector_search_query(
+    top_k: int,
+    fraction_lists_to_search: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> str:
+    """VECTOR_SEARCH that can use the table's vector index, pre-filtered"""
+    where, _ = build_filter_clause(filters)
+    options = {}
+    if fraction_lists_to_search is not None:
+        options["fraction_lists_to_search"] = float(fraction_lists_to_search)
+    options_sql = f",\n        options => '{json.dumps(options)}'" if options else ""
+    return f"""
+    SELECT
+        base.doc_id AS doc_id,
+        base.title AS title,
+        base.content AS content,
+        base.chunk_index AS chunk_index,
+        base.char_start AS char_start,
+        base.char_end AS char_end,
+        distance
+    FROM VECTOR_SEARCH(
+        (SELECT * FROM `{Config.get_bigquery_table()}` WHERE {where}),
+        'embedding',
+        (SELECT @query_embedding AS embedding),
+        top_k => {int(top_k)},
+        distance_type => 'COSINE'{options_sql}
+    )
+    ORDER BY distance ASC
+    """
+
+
+def build_vector_index_ddl() -> str:
+    """same statement as sql/create_vector_index.sql for the configured table"""
+    return f"""
+    CREATE VECTOR INDEX IF NOT EXISTS `{Config.VECTOR_SEARCH_INDEX_NAME}`
+    ON `{Config.get_bigquery_table()}`(embedding)
+    STORING (doc_id, title, content, chunk_index, char_start, char_end, tags,
+             primary_tag, creation_date, score, deleted)
+    OPTIONS (
+        index_type = '{Config.VECTOR_SEARCH_INDEX_TYPE}',
+        distance_type = 'COSINE'
+    )
+    """
+
+
+class VectorIndexStatus:
+    """Cached view of INFORMATION_SCHEMA.VECTOR_INDEXES for the documents table"""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._checked_at = 0.0
+        self._status: Optional[Dict[str, Any]] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def fetch(self, client) -> Optional[Dict[str, Any]]:
+        sql = f"""
+        SELECT index_status, coverage_percentage
+        FROM `{Config.PROJECT_ID}.{Config.DATASET_ID}.INFORMATION_SCHEMA.VECTOR_INDEXES`
+        WHERE table_name = @table_name AND index_name = @index_name
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ScalarQueryParameter("table_name", "STRING", Config.TABLE_ID),
+                bigquery.ScalarQueryParameter(
+                    "index_name", "STRING", Config.VECTOR_SEARCH_INDEX_NAME
+                ),
+            ]
+        )
+        rows = client.query(sql, job_config=job_config).result().to_dataframe()
+        if rows.empty:
+            return None
+        return {
+            "index_status": rows["index_status"].iloc[0],
+            "coverage_percentage": float(rows["coverage_percentage"].iloc[0] or 0),
+        }
+
+    def get(self, client) -> Optional[Dict[str, Any]]:
+        # one caller refreshes outside the lock, the others keep the cached status
+        with self._lock:
+            if self._refreshing or time.time() - self._checked_at <= self.ttl:
+                return self._status
+            self._refreshing = True
+        try:
+            status = self.fetch(client)
+        except Exception as e:
+            print(f"[WARN] Failed to read vector index status: {e}")
+            status = None
+        with self._lock:
+            self._status = status
+            self._checked_at = time.time()
+            self._refreshing = False
+        return status
+
+    def is_ready(self, client) -> bool:
+        status = self.get(client)
+        return (
+            status is not None
+            and status["index_status"] == READY_STATUS
+            and status["coverage_percentage"] >= Config.VECTOR_SEARCH_MIN_COVERAGE
+        )
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+
+index_status = VectorIndexStatus(ttl=Config.VECTOR_SEARCH_STATUS_TTL)
+
+
+def _run(
+    client,
+    sql: str,
+    query_embedding: List[float],
+    filters: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    _, filter_params = build_filter_clause(filters)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("query_embedding", "FLOAT64", query_embedding)
+        ]
+        + filter_params
+    )
+    job = client.query(sql, job_config=job_config)
+    results = job.result().to_dataframe()
+    results.attrs["bytes_processed"] = getattr(job, "total_bytes_processed", None)
+    return results
+
+
+def exact_search(
+    client,
+    query_embedding: List[float],
+    top_k: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    results = _run(client, build_exact_query(top_k, filters), query_embedding, filters)
+    results.attrs["search_path"] = "exact"
+    return results
+
+
+def search(
+    client,
+    query_embedding: List[float],
+    top_k: int,
+    fraction_lists_to_search: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    status: VectorIndexStatus = index_status,
+) -> pd.DataFrame:
+    """VECTOR_SEARCH when the vector index is active, exact search otherwise
+
+    The chosen path and the job's bytes processed are recorded in the result's
+    attrs["search_path"] and attrs["bytes_processed"].
+    """
+    if Config.VECTOR_SEARCH_ENABLED and status.is_ready(client):
+        try:
+            results = _run(
+                client,
+                build_vector_search_query(top_k, fraction_lists_to_search, filters),
+                query_embedding,
+                filters,
+            )
+            results.attrs["search_path"] = "vector_search"
+            return results
+        except Exception as e:
+            print(f"[WARN] VECTOR_SEARCH failed, falling back to exact search: {e}")
+            status.reset()
+
+    return exact_search(client, query_embedding, top_k, filters)
+
+
+def ensure_vector_index(client) -> bool:
+    """create the vector index once the table is large enough, True if issued"""
+    # CREATE ... IF NOT EXISTS keeps this safe when the status lookup failed
+    if index_status.get(client) is not None:
+        return False
+
+    sql = f"""
+    SELECT COUNT(*) AS row_count
+    FROM `{Config.get_bigquery_table()}`
+    WHERE deleted IS NOT TRUE
+    """
+    row_count = int(client.query(sql).result().to_dataframe()["row_count"].iloc[0])
+    if row_count < Config.VECTOR_SEARCH_MIN_ROWS:
+        return False
+
+    client.query(build_vector_index_ddl()).result()
+    index_status.reset()
+    print(f"[INFO] Vector index creation started - {row_count} rows")
+    return True
@@ -0,0 +1,188 @@
+import re
+from html.parser import HTMLParser
+from typing import List, NamedTuple, Tuple
+from config.config import Config
+
+CHARS_PER_TOKEN = 4
+CODE_FENCE = "```"
+BLOCK_TAGS = {
+    "p",
+    "div",
+    "br",
+    "li",
+    "ul",
+    "ol",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "blockquote",
+    "table",
+    "tr",
+    "hr",
+}
+
+_CODE_BLOCK = re.compile(r"```\n.*?\n```", re.DOTALL)
+_SENTENCE_END = re.compile(r"[.!?。！？]+(?=\s)|\n\n")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+class Chunk(NamedTuple):
+    text: str
+    # character offsets into the cleaned document text
+    start: int
+    end: int
+    tokens: int
+
+
+def estimate_tokens(text: str) -> int:
+    """rough token count: ~4 ASCII characters per token, one per CJK character"""
+    # every non-ASCII character in the CJK range takes 3 UTF-8 bytes
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return max(1, (len(text) - non_ascii) // CHARS_PER_TOKEN + non_ascii)
+
+
+class _MarkupStripper(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "pre":
+            self.parts.append(f"\n{CODE_FENCE}\n")
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "pre":
+            self.parts.append(f"\n{CODE_FENCE}\n")
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def _normalize_prose(text: str) -> str:
+    text = _SPACES.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def strip_markup(html: str) -> str:
+    """drop tags and entities, keeping <pre> code blocks as fenced blocks"""
+    parser = _MarkupStripper()
+    parser.feed(html)
+    parser.close()
+    raw = "".join(parser.parts)
+
+    parts = []
+    position = 0
+    for match in re.finditer(r"\n```\n(.*?)\n```\n", raw, re.DOTALL):
+        parts.append(_normalize_prose(raw[position : match.start()]))
+        code = match.group(1).strip("\n")
+        if code.strip():
+            parts.append(f"{CODE_FENCE}\n{code}\n{CODE_FENCE}")
+        position = match.end()
+    parts.append(_normalize_prose(raw[position:]))
+    return "\n\n".join(part for part in parts if part)
+
+
+def _hard_split(
+    text: str, start: int, end: int, max_tokens: int
+) -> List[Tuple[int, int]]:
+    """split an oversized span at whitespace so each piece fits the token budget"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    spans = []
+    while estimate_tokens(text[start:end]) > max_tokens:
+        cut = start + max_chars
+        while estimate_tokens(text[start:cut]) > max_tokens:
+            cut = start + (cut - start) // 2
+        space = text.rfind(" ", start, cut)
+        newline = text.rfind("\n", start, cut)
+        boundary = max(space, newline)
+        if boundary > start + (cut - start) // 2:
+            cut = boundary
+        spans.append((start, cut))
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+
+def _segments(text: str, max_tokens: int) -> List[Tuple[int, int]]:
+    """sentence and code-block spans, none larger than max_tokens"""
+    spans = []
+
+    def add_prose(start: int, end: int):
+        boundaries = [m.end() for m in _SENTENCE_END.finditer(text, start, end)]
+        for boundary in boundaries + [end]:
+            add_span(start, boundary)
+            start = boundary
+
+    def add_span(start: int, end: int):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.extend(_hard_split(text, start, end, max_tokens))
+
+    position = 0
+    for match in _CODE_BLOCK.finditer(text):
+        add_prose(position, match.start())
+        add_span(match.start(), match.end())
+        position = match.end()
+    add_prose(position, len(text))
+    return spans
+
+
+def chunk_document(
+    text: str,
+    max_tokens: int = Config.CHUNK_MAX_TOKENS,
+    overlap_tokens: int = Config.CHUNK_OVERLAP_TOKENS,
+    html: bool = True,
+) -> List[Chunk]:
+    """split a document into token-budgeted chunks on sentence/code boundaries
+
+    Consecutive chunks share up to overlap_tokens of whole sentences; the offsets
+    let callers detect and remove that overlap downstream.
+    """
+    clean = strip_markup(text) if html else text
+    spans = _segments(clean, max_tokens)
+    tokens = [estimate_tokens(clean[start:end]) for start, end in spans]
+
+    chunks = []
+    i = 0
+    while i < len(spans):
+        start = spans[i][0]
+        j = i + 1
+        # measure the joined span so separators between segments are counted too
+        while (
+            j < len(spans) and estimate_tokens(clean[start : spans[j][1]]) <= max_tokens
+        ):
+            j += 1
+
+        end = spans[j - 1][1]
+        chunk_text = clean[start:end]
+        chunks.append(Chunk(chunk_text, start, end, estimate_tokens(chunk_text)))
+        if j >= len(spans):
+            break
+
+        # step back over whole trailing segments for the overlap, always advancing
+        k, overlap = j, 0
+        while k - 1 > i and overlap + tokens[k - 1] <= overlap_tokens:
+            k -= 1
+            overlap += tokens[k]
+        # give up overlap the next chunk has no room for: a chunk that cannot
+        # reach past this one's end would only repeat a suffix of it
+        while k < j and estimate_tokens(clean[spans[k][0] : spans[j][1]]) > max_tokens:
+            k += 1
+        i = k
+
+    return chunks
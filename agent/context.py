@@ -0,0 +1,167 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+import pandas as pd
+from config.config import Config
+from agent.chunking import estimate_tokens
+from agent.lexical_index import tokenize
+
+# suffix/prefix overlap bounds used when chunks carry no character offsets
+MIN_TEXT_OVERLAP = 20
+MAX_TEXT_OVERLAP = 4000
+
+
+class Passage(NamedTuple):
+    doc_id: str
+    text: str
+    distance: float
+    tokens: int
+
+
+def _offset(value: Any) -> Optional[int]:
+    return None if value is None or pd.isna(value) else int(value)
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """length of the longest suffix of left that is a prefix of right (0 if short)"""
+    if not right:
+        return 0
+    position = left.find(
+        right[0], max(0, len(left) - min(len(right), MAX_TEXT_OVERLAP))
+    )
+    while position != -1 and len(left) - position >= MIN_TEXT_OVERLAP:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(right[0], position + 1)
+    return 0
+
+
+def _merge_document(chunks: pd.DataFrame) -> List[Tuple[str, float]]:
+    """merge one document's overlapping or adjacent chunks into (text, distance)"""
+    has_offsets = "char_start" in chunks and chunks["char_start"].notna().all()
+    if has_offsets:
+        chunks = chunks.sort_values("char_start")
+    elif "chunk_index" in chunks and chunks["chunk_index"].notna().all():
+        chunks = chunks.sort_values("chunk_index")
+
+    merged: List[Tuple[str, float]] = []
+    text, distance, end, index = None, 0.0, None, None
+    for _, row in chunks.iterrows():
+        content = row["content"]
+        start = _offset(row.get("char_start"))
+        chunk_index = _offset(row.get("chunk_index"))
+        overlap = 0 if has_offsets or text is None else _text_overlap(text, content)
+        adjacent = (
+            index is not None and chunk_index is not None and chunk_index == index + 1
+        )
+
+        if text is None:
+            joined = None
+        elif has_offsets and start <= end:
+            joined = text + content[end - start :]
+        elif overlap:
+            joined = text + content[overlap:]
+        elif adjacent:
+            joined = f"{text}\n{content}"
+        else:
+            joined = None
+
+        if joined is None:
+            if text is not None:
+                merged.append((text, distance))
+            text, distance = content, float(row["distance"])
+        else:
+            text, distance = joined, min(distance, float(row["distance"]))
+        if has_offsets:
+            chunk_end = _offset(row.get("char_end"))
+            end = chunk_end if joined is None else max(end, chunk_end)
+        index = chunk_index
+
+    if text is not None:
+        merged.append((text, distance))
+    return merged
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        return {tuple(tokens)}
+    return {tuple(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _is_near_duplicate(
+    shingles: Set[Tuple[str, ...]], kept: List[Set[Tuple[str, ...]]], threshold: float
+) -> bool:
+    """True when most of the passage's shingles already appear in one kept passage"""
+    # containment rather than Jaccard, so a copied excerpt of a longer kept
+    # passage still counts as a duplicate
+    for other in kept:
+        if shingles and len(shingles & other) / len(shingles) >= threshold:
+            return True
+    return False
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """cut text at whitespace so it fits max_tokens"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text.rfind(" ", 0, low)
+    return text[: cut if cut > low // 2 else low]
+
+
+def pack_context(
+    docs: pd.DataFrame,
+    max_tokens: int = Config.CONTEXT_MAX_TOKENS,
+    duplicate_threshold: float = Config.CONTEXT_DUPLICATE_THRESHOLD,
+) -> Tuple[str, Dict[str, Any]]:
+    """assemble retrieved chunks into a token-budgeted context string
+
+    Chunks of the same document are merged where they overlap or are adjacent,
+    passages whose word shingles are mostly (duplicate_threshold) contained in
+    an already packed passage are dropped, and the rest fill max_tokens in
+    relevance order. Returns (context, stats).
+    """
+    naive_tokens = (
+        estimate_tokens("\n\n".join(docs["content"].tolist())) if len(docs) else 0
+    )
+
+    passages = []
+    for doc_id, chunks in docs.groupby("doc_id", sort=False):
+        for text, distance in _merge_document(chunks):
+            passages.append(Passage(str(doc_id), text, distance, estimate_tokens(text)))
+    passages.sort(key=lambda passage: passage.distance)
+
+    selected: List[Passage] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    duplicates = 0
+    used = 0
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if _is_near_duplicate(shingles, kept_shingles, duplicate_threshold):
+            duplicates += 1
+            continue
+        if used + passage.tokens > max_tokens:
+            if selected:
+                continue
+            # never return an empty context because the best passage is too long
+            text = _truncate(passage.text, max_tokens)
+            passage = passage._replace(text=text, tokens=estimate_tokens(text))
+        selected.append(passage)
+        kept_shingles.append(shingles)
+        used += passage.tokens
+
+    context = "\n\n".join(passage.text for passage in selected)
+    packed_tokens = estimate_tokens(context) if context else 0
+    stats = {
+        "chunks": len(docs),
+        "passages": len(selected),
+        "duplicates_dropped": duplicates,
+        "passages_over_budget": len(passages) - len(selected) - duplicates,
+        "naive_tokens": naive_tokens,
+        "context_tokens": packed_tokens,
+        "tokens_saved": naive_tokens - packed_tokens,
+    }
+    return context, stats
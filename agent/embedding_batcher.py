@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched calls"""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        timeout: Optional[float] = None,
+    ):
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # seconds embed() waits for its batch, None = no limit
+        self.timeout = timeout
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self._queue_delay_total = 0.0
+        self.max_queue_delay = 0.0
+        self.timeouts = 0
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def embed(self, text: str) -> List[float]:
+        """block until the batch containing text has been embedded
+
+        Raises TimeoutError after self.timeout seconds. A request still queued
+        is dropped from its batch; one already being embedded finishes unread.
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            raise
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # past the window, still take whatever queued up while busy
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # requests that timed out while queued were cancelled, skip them
+            batch = [
+                item
+                for item in self._collect()
+                if item[1].set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+            dispatched_at = time.perf_counter()
+
+            # identical texts in one window share a single slot in the call
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            try:
+                embeddings = dict(zip(texts, self.embed_fn(texts)))
+                for text, future, _ in batch:
+                    future.set_result(embeddings[text])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.items += len(batch)
+            for _, _, submitted_at in batch:
+                delay = dispatched_at - submitted_at
+                self._queue_delay_total += delay
+                self.max_queue_delay = max(self.max_queue_delay, delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "fill_ratio": (
+                self.items / (self.batches * self.max_batch_size)
+                if self.batches
+                else 0.0
+            ),
+            "avg_queue_delay_ms": (
+                self._queue_delay_total / self.items * 1000 if self.items else 0.0
+            ),
+            "max_queue_delay_ms": self.max_queue_delay * 1000,
+            "timeouts": self.timeouts,
+        }
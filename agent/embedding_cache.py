@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """collapse whitespace and fold case so trivial variants share an entry"""
+    return " ".join(query.split()).casefold()
+
+
+class EmbeddingCache:
+    """LRU + TTL cache of query embeddings with an optional SQLite tier
+
+    Every prune_every writes the SQLite tier drops its expired rows and then
+    its oldest rows beyond disk_max_size (0 = unbounded). SQLite reuses the
+    freed pages, so the file stops growing rather than shrinking.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+        disk_path: Optional[str] = None,
+        disk_max_size: int = 100000,
+        prune_every: int = 100,
+    ):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_max_size = disk_max_size
+        self.prune_every = max(prune_every, 1)
+        self._puts_since_prune = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+
+        self._disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created_at REAL, embedding TEXT)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_created_at "
+                "ON embeddings (created_at)"
+            )
+            self._prune_disk()
+            self._disk.commit()
+
+    def _key(self, query: str) -> str:
+        return f"{self.model_name}:{normalize_query(query)}"
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, embedding = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT created_at, embedding FROM embeddings WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    embedding = json.loads(row[1])
+                    self._remember(key, row[0], embedding)
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding: List[float]):
+        key = self._key(query)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, list(embedding))
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                    (key, created_at, json.dumps(list(embedding))),
+                )
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= self.prune_every:
+                    self._prune_disk()
+                self._disk.commit()
+
+    def _prune_disk(self):
+        # callers hold _lock (or are __init__); the caller commits
+        self._puts_since_prune = 0
+        removed = 0
+        if self.ttl > 0:
+            removed += self._disk.execute(
+                "DELETE FROM embeddings WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            ).rowcount
+        if self.disk_max_size > 0:
+            (rows,) = self._disk.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if rows > self.disk_max_size:
+                removed += self._disk.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                    (rows - self.disk_max_size,),
+                ).rowcount
+        self.disk_evictions += removed
+
+    def _remember(self, key: str, created_at: float, embedding: List[float]):
+        self._entries[key] = (created_at, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_evictions": self.disk_evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            # every hit is one embedding round trip to Vertex AI avoided
+            "round_trips_saved": self.hits + self.disk_hits,
+        }
@@ -0,0 +1,74 @@
+import hashlib
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from agent.lexical_index import BM25Index, tokenize
+from agent.vector_index import ROW_COLUMNS, VectorIndex, build_lexical_index
+
+SAMPLE_DOCUMENTS = [
+    (
+        "1",
+        "什麼是 Python Decorator?",
+        "Decorator 是一個接收函式並回傳新函式的函式，常用 @functools.wraps 保留原函式的名稱與 docstring。",
+    ),
+    (
+        "2",
+        "How do I read a file line by line?",
+        "Use a with statement: with open(path) as f: for line in f: print(line). "
+        "The file is closed when the block exits.",
+    ),
+    (
+        "3",
+        "list comprehension 與 generator 的差別",
+        "List comprehension 會立即建立整個 list；generator expression 以 () 包起來，逐一產生值而不佔用整塊記憶體。",
+    ),
+    (
+        "4",
+        "How to merge two dicts?",
+        "In Python 3.9+ use a | b. Earlier versions can use {**a, **b} or dict.update().",
+    ),
+    (
+        "5",
+        "async 與 await 怎麼用?",
+        "以 async def 定義協程，在協程內用 await 等待其他協程，最後用 asyncio.run(main()) 執行。",
+    ),
+]
+
+
+class FakeEmbedder:
+    """Offline stand-in for the embedding model: hashed bag of terms
+
+    Deterministic across processes, and texts sharing terms end up close, which
+    is enough for retrieval to return sensible documents in tests.
+    """
+
+    def __init__(self, dimensions: int = 64):
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in tokenize(text):
+            digest = hashlib.md5(term.encode("utf-8")).digest()
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self.embed(text) for text in texts]
+
+
+def build_sample_indexes(embedder: FakeEmbedder) -> Tuple[VectorIndex, BM25Index]:
+    """vector and BM25 indexes over SAMPLE_DOCUMENTS, one chunk per document"""
+    rows = pd.DataFrame(
+        [
+            (doc_id, title, content, 0, 0, len(content))
+            for doc_id, title, content in SAMPLE_DOCUMENTS
+        ],
+        columns=ROW_COLUMNS,
+    )
+    texts = [f"{title} {content}" for _, title, content in SAMPLE_DOCUMENTS]
+    index = VectorIndex.build(np.array(embedder.embed_batch(texts)), rows, n_lists=1)
+    return index, build_lexical_index(index)
@@ -0,0 +1,81 @@
+import time
+from typing import Any, Iterator, List, Optional, Union
+from agent.chunking import estimate_tokens
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """Just the parts of a GenerationResponse the callers read"""
+
+    def __init__(self, text: str, usage_metadata: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeStreamingModel:
+    """Offline stand-in for GenerativeModel with configurable latency
+
+    generate_content(prompt, stream=True) yields the canned answer a few words
+    at a time after first_token_delay, sleeping token_delay between pieces; the
+    last piece carries usage metadata like the real stream does. The first
+    fail_first calls raise RuntimeError, for exercising retries and escalation.
+    """
+
+    def __init__(
+        self,
+        answer: str = "這是測試用的模擬回答，根據文件內容整理出重點。",
+        first_token_delay: float = 0.2,
+        token_delay: float = 0.02,
+        words_per_chunk: int = 3,
+        fail_first: int = 0,
+    ):
+        self.answer = answer
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.words_per_chunk = words_per_chunk
+        self.fail_first = fail_first
+        self.calls = 0
+
+    def _pieces(self) -> List[str]:
+        # CJK text has no spaces, so split it into fixed-size runs instead
+        words = self.answer.split(" ")
+        if len(words) == 1:
+            size = self.words_per_chunk * 2
+            return [self.answer[i : i + size] for i in range(0, len(self.answer), size)]
+        return [
+            " ".join(words[i : i + self.words_per_chunk])
+            + (" " if i + self.words_per_chunk < len(words) else "")
+            for i in range(0, len(words), self.words_per_chunk)
+        ]
+
+    def _stream(self, prompt: str) -> Iterator[FakeResponse]:
+        pieces = self._pieces()
+        time.sleep(self.first_token_delay)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.token_delay)
+            usage = None
+            if i == len(pieces) - 1:
+                usage = FakeUsage(estimate_tokens(prompt), estimate_tokens(self.answer))
+            yield FakeResponse(piece, usage)
+
+    def generate_content(
+        self, contents: Any, stream: bool = False, **kwargs
+    ) -> Union[FakeResponse, Iterator[FakeResponse]]:
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise RuntimeError("模擬模型呼叫失敗")
+        prompt = contents if isinstance(contents, str) else str(contents)
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.first_token_delay + self.token_delay * len(self._pieces()))
+        return FakeResponse(
+            self.answer,
+            FakeUsage(estimate_tokens(prompt), estimate_tokens(self.answer)),
+        )
@@ -1,21 +1,75 @@
-from typing import List, Dict, Any
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 import vertexai
-from vertexai.generative_models import GenerativeModel, Tool, FunctionDeclaration
+from vertexai.generative_models import (
+    Content,
+    FunctionDeclaration,
+    GenerativeModel,
+    Part,
+    Tool,
+)
 from config.config import Config
-from agent.tools import execute_tool, get_available_tools
-
-vertexai.init(
-    project=Config.PROJECT_ID,
-    location=Config.LOCATION,
-    credentials=Config.get_credentials(),
+from agent.chunking import estimate_tokens
+from agent.llm_cache import CachedModel, llm_cache
+from agent.router import budget, router_from_config
+from agent.service import wait_result
+from agent.usage import usage_tracker
+from agent.sessions import SessionStore, Turn
+from agent.tools import (
+    execute_tool,
+    format_tool_result,
+    get_available_tools,
+    get_tool_timeout,
 )
+from telemetry.manager import telemetry
+
+if not Config.OFFLINE:
+    vertexai.init(
+        project=Config.PROJECT_ID,
+        location=Config.LOCATION,
+        credentials=Config.get_credentials(),
+    )
 
 
 class FunctionCaller:
     def __init__(self):
         self.available_tools = get_available_tools()
+        self.tool_names = {tool["name"] for tool in self.available_tools}
         self.tools = self._convert_to_gemini_tools()
-        self.model = GenerativeModel(Config.MODEL_NAME, tools=self.tools)
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.TOOL_MAX_WORKERS, thread_name_prefix="are-tools"
+        )
+        self._lock = threading.Lock()
+        self.direct_responses = 0
+        self.llm_responses = 0
+        self.router = router_from_config(
+            self._create_model, on_record=telemetry.monitoring.log_route_metrics
+        )
+        self.sessions = SessionStore(
+            self._summarize,
+            max_sessions=Config.CHAT_MAX_SESSIONS,
+            idle_ttl=Config.CHAT_SESSION_IDLE_TTL,
+            token_budget=Config.CHAT_SESSION_TOKEN_BUDGET,
+            keep_turns=Config.CHAT_KEEP_TURNS,
+            compaction_workers=Config.CHAT_COMPACTION_WORKERS,
+            on_compact=lambda session: telemetry.monitoring.log_session_metrics(
+                session.tokens, session.nbytes, "compaction"
+            ),
+        )
+
+    def _create_model(self, model_name: str, with_tools: bool) -> CachedModel:
+        return CachedModel(
+            GenerativeModel(model_name, tools=self.tools if with_tools else None),
+            model_name,
+            llm_cache,
+            tools=self.available_tools if with_tools else None,
+            on_lookup=telemetry.monitoring.log_llm_cache_metrics,
+            on_usage=usage_tracker.record_generation,
+        )
 
     def _convert_to_gemini_tools(self) -> List[Tool]:
         function_declarations = []
@@ -33,10 +87,13 @@ class FunctionCaller:
 
             if "properties" in parameters:
                 for param_name, param_info in parameters["properties"].items():
-                    gemini_schema["properties"][param_name] = {
+                    param_schema = {
                         "type": param_info.get("type", "string"),
                         "description": param_info.get("description", ""),
                     }
+                    if "items" in param_info:
+                        param_schema["items"] = param_info["items"]
+                    gemini_schema["properties"][param_name] = param_schema
 
             function_declaration = FunctionDeclaration(
                 name=name, description=description, parameters=gemini_schema
@@ -45,16 +102,39 @@ class FunctionCaller:
 
         return [Tool(function_declarations=function_declarations)]
 
+    @staticmethod
+    def _timed_call(
+        tool_name: str, parameters: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], float]:
+        start_time = time.time()
+        result = execute_tool(tool_name, parameters)
+        return result, time.time() - start_time
+
     def _execute_function_calls(
         self, function_calls: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
-        results = []
+        """run the calls concurrently, each bounded by its TOOLS timeout
 
+        Results keep the order of function_calls. A timed-out call (see
+        wait_result) yields an error result.
+        """
+        start_time = time.time()
+        futures: List[Optional[Future]] = []
         for call in function_calls:
+            if call.get("name") in self.tool_names:
+                futures.append(
+                    self._executor.submit(
+                        self._timed_call, call.get("name"), call.get("args", {})
+                    )
+                )
+            else:
+                futures.append(None)
+
+        results = []
+        for call, future in zip(function_calls, futures):
             tool_name = call.get("name")
-            parameters = call.get("args", {})
 
-            if tool_name not in [tool["name"] for tool in self.available_tools]:
+            if future is None:
                 results.append(
                     {
                         "tool_name": tool_name,
@@ -65,14 +145,28 @@ class FunctionCaller:
                 )
                 continue
 
+            timeout = get_tool_timeout(tool_name)
             try:
-                result = execute_tool(tool_name, parameters)
+                # every call started together, so each deadline counts from the start
+                result, duration = wait_result(future, start_time + timeout)
                 results.append(
                     {
                         "tool_name": tool_name,
                         "success": result.get("success", True),
                         "result": result,
                         "error": result.get("error"),
+                        "duration": duration,
+                    }
+                )
+            except FutureTimeoutError:
+                results.append(
+                    {
+                        "tool_name": tool_name,
+                        "success": False,
+                        "error": f"工具執行逾時（{timeout:g} 秒）",
+                        "error_type": "timeout",
+                        "result": {},
+                        "duration": time.time() - start_time,
                     }
                 )
             except Exception as e:
@@ -82,9 +176,19 @@ class FunctionCaller:
                         "success": False,
                         "error": str(e),
                         "result": {},
+                        "duration": time.time() - start_time,
                     }
                 )
 
+        for result in results:
+            if "duration" in result:
+                telemetry.monitoring.log_function_call_metrics(
+                    function_name=result["tool_name"],
+                    success=result["success"],
+                    duration=result["duration"],
+                    error_type=result.get("error_type"),
+                )
+
         return results
 
     def _format_function_calls_for_response(
@@ -97,10 +201,97 @@ class FunctionCaller:
             )
         return formatted_calls
 
-    def process_message(self, message: str) -> Dict[str, Any]:
+    def _can_answer_directly(self, message: str, results: List[Dict[str, Any]]) -> bool:
+        """short message, few calls, all succeeded and all have a formatter"""
+        return (
+            Config.TOOL_DIRECT_ANSWER
+            and len(message) <= Config.TOOL_DIRECT_MAX_MESSAGE_CHARS
+            and len(results) <= Config.TOOL_DIRECT_MAX_CALLS
+            and all(
+                result["success"]
+                and format_tool_result(result["tool_name"], result["result"])
+                is not None
+                for result in results
+            )
+        )
+
+    def _record_response_path(self, direct: bool):
+        with self._lock:
+            if direct:
+                self.direct_responses += 1
+            else:
+                self.llm_responses += 1
+        telemetry.monitoring.log_tool_response_metrics(direct)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.direct_responses + self.llm_responses
+            stats = {
+                "llm_calls_avoided": self.direct_responses,
+                "llm_calls_made": self.llm_responses,
+                "avoided_ratio": self.direct_responses / total if total else 0.0,
+            }
+        stats["router"] = self.router.stats()
+        return stats
+
+    def _summarize(self, summary: str, turns: List[Turn]) -> str:
+        transcript = "\n".join(
+            f"{'使用者' if turn.role == 'user' else '助理'}：{turn.text}"
+            for turn in turns
+        )
+        previous = f"既有摘要：\n{summary}\n\n" if summary else ""
+        prompt = (
+            f"請將以下對話濃縮成 {Config.CHAT_SUMMARY_MAX_CHARS} 字以內的摘要，"
+            f"保留使用者的需求、已確認的事實與工具結果：\n\n{previous}"
+            f"新的對話：\n{transcript}"
+        )
+        response = self.router.generate(
+            prompt,
+            prompt_tokens=estimate_tokens(prompt),
+            generation_config={"temperature": 0.1, "max_output_tokens": 1024},
+        )
+        return response.text
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.sessions.shutdown()
+
+    def process_message(
+        self, message: str, session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """answer one message; with session_id the server-side history is used"""
+        if session_id is None:
+            return self._process_message(message)
+
+        session = self.sessions.get(session_id)
+        # one exchange at a time per session keeps the history in order
+        with session.lock:
+            result = self._process_message(message, session.contents(), session.tokens)
+            if result["success"]:
+                self.sessions.append(session, message, result["response"])
+            result["session_id"] = session_id
+            result["session_tokens"] = session.tokens
+        telemetry.monitoring.log_session_metrics(
+            session.tokens, session.nbytes, "exchange"
+        )
+        return result
+
+    def _process_message(
+        self,
+        message: str,
+        history: Optional[List[Content]] = None,
+        history_tokens: int = 0,
+    ) -> Dict[str, Any]:
+        contents = message
+        if history:
+            contents = history + [Content(role="user", parts=[Part.from_text(message)])]
         try:
-            response = self.model.generate_content(
-                message,
+            response = self.router.generate(
+                contents,
+                prompt_tokens=estimate_tokens(message) + history_tokens,
+                needs_tools=True,
+                latency_budget=budget(Config.TOOL_CHAT_LATENCY_BUDGET),
+                cost_budget=budget(Config.ROUTER_COST_BUDGET),
                 generation_config={
                     "temperature": 0.1,
                     "max_output_tokens": 2048,
@@ -122,54 +313,41 @@ class FunctionCaller:
             if function_calls:
                 results = self._execute_function_calls(function_calls)
 
-                if results:
+                if results and self._can_answer_directly(message, results):
+                    # every result has a template, skip the second model call
+                    final_response_text = "\n".join(
+                        format_tool_result(result["tool_name"], result["result"])
+                        for result in results
+                    )
+                    self._record_response_path(direct=True)
+                elif results:
                     function_results_text = "函數調用結果：\n"
                     for result in results:
                         if result["success"]:
-                            tool_name = result["tool_name"]
-                            tool_result = result["result"]
-
-                            if tool_name == "get_weather":
-                                city = tool_result.get("city", "")
-                                temp = tool_result.get("temperature", "")
-                                condition = tool_result.get("condition", "")
-                                function_results_text += (
-                                    f"- {city}的天氣是{condition}，溫度{temp}\n"
-                                )
-
-                            elif tool_name == "do_math":
-                                expression = tool_result.get("expression", "")
-                                result_val = tool_result.get("result", "")
-                                function_results_text += (
-                                    f"- {expression} = {result_val}\n"
-                                )
-
-                            elif tool_name == "get_current_time":
-                                date = tool_result.get("date", "")
-                                time = tool_result.get("time", "")
-                                day = tool_result.get("day_of_week", "")
-                                function_results_text += (
-                                    f"- 今天是{date} {day}，現在時間是{time}\n"
-                                )
-
-                            elif tool_name == "calculate_distance":
-                                point1 = tool_result.get("point1", [])
-                                point2 = tool_result.get("point2", [])
-                                distance = tool_result.get("distance", 0)
-                                function_results_text += (
-                                    f"- 點{point1}到點{point2}的距離是{distance}\n"
+                            summary = format_tool_result(
+                                result["tool_name"], result["result"]
+                            )
+                            if summary is None:
+                                summary = f"{result['tool_name']}: " + json.dumps(
+                                    result["result"], ensure_ascii=False, default=str
                                 )
+                            function_results_text += f"- {summary}\n"
                         else:
                             function_results_text += f"- 執行 {result['tool_name']} 時發生錯誤：{result['error']}\n"
 
-                    final_response = self.model.generate_content(
-                        f"基於以下函數調用結果，生成一個自然友好的回應給用戶：\n\n{function_results_text}\n\n請生成一個簡潔、友好的回應，整合這些結果。",
+                    prompt = f"基於以下函數調用結果，生成一個自然友好的回應給用戶：\n\n{function_results_text}\n\n請生成一個簡潔、友好的回應，整合這些結果。"
+                    final_response = self.router.generate(
+                        prompt,
+                        prompt_tokens=estimate_tokens(prompt),
+                        latency_budget=budget(Config.TOOL_CHAT_LATENCY_BUDGET),
+                        cost_budget=budget(Config.ROUTER_COST_BUDGET),
                         generation_config={
                             "temperature": 0.3,
                             "max_output_tokens": 1024,
                         },
                     )
                     final_response_text = final_response.text
+                    self._record_response_path(direct=False)
                 else:
                     final_response_text = "執行完成，但沒有返回結果。"
             else:
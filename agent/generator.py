@@ -1,21 +1,48 @@
+import time
+from typing import Any, Dict, Iterator, Tuple
 import vertexai
-from typing import List
+from agent.chunking import estimate_tokens
+from agent.context import pack_context
+from agent.fake_model import FakeStreamingModel
+from agent.llm_cache import CachedModel, llm_cache
 from agent.retriever import retrieve
+from agent.router import budget, router_from_config
+from agent.usage import usage_tracker
 from config.config import Config
+from telemetry.manager import telemetry
 from vertexai.generative_models import GenerativeModel
 
-vertexai.init(
-    project=Config.PROJECT_ID,
-    location=Config.LOCATION,
-    credentials=Config.get_credentials(),
+if not Config.OFFLINE:
+    vertexai.init(
+        project=Config.PROJECT_ID,
+        location=Config.LOCATION,
+        credentials=Config.get_credentials(),
+    )
+
+
+def _create_model(model_name: str, with_tools: bool) -> CachedModel:
+    if Config.FAKE_MODEL:
+        base_model = FakeStreamingModel()
+    else:
+        base_model = GenerativeModel(model_name=model_name)
+    return CachedModel(
+        base_model,
+        model_name,
+        llm_cache,
+        on_lookup=telemetry.monitoring.log_llm_cache_metrics,
+        on_usage=usage_tracker.record_generation,
+    )
+
+
+router = router_from_config(
+    _create_model, on_record=telemetry.monitoring.log_route_metrics
 )
-model = GenerativeModel(model_name=Config.MODEL_NAME)
 
 
-def generate_answer(query: str, top_k: int = 5) -> str:
-    docs = retrieve(query, top_k=top_k)
-    context_text = "\n\n".join(docs["content"].tolist())
-    print(context_text)
+def build_prompt(query: str, top_k: int = 5, **retrieve_kwargs) -> Tuple[str, Dict]:
+    """retrieve, pack the context and return (prompt, context stats)"""
+    docs = retrieve(query, top_k=top_k, **retrieve_kwargs)
+    context_text, context_stats = pack_context(docs)
     prompt = f"""
     You are a helpful assistant that can answer questions and help with tasks.
     document context:
@@ -24,10 +51,115 @@ def generate_answer(query: str, top_k: int = 5) -> str:
     {query}
     Answer the question based on the document context.
     """
-    response = model.generate_content(prompt)
+    return prompt, context_stats
+
+
+def _record_generation(
+    operation: str,
+    stats: Dict[str, Any],
+    usage: Any,
+    text: str,
+    first_token_time: float,
+    duration: float,
+    user_id: str = None,
+):
+    if usage is not None:
+        stats["prompt_tokens"] = usage.prompt_token_count
+        stats["output_tokens"] = usage.candidates_token_count
+    else:
+        stats["output_tokens"] = estimate_tokens(text) if text else 0
+    stats["time_to_first_token_ms"] = first_token_time * 1000
+    # decode rate after the first token, so queueing and prefill are excluded
+    decode_time = duration - first_token_time
+    stats["tokens_per_second"] = (
+        stats["output_tokens"] / decode_time if decode_time > 0 else 0.0
+    )
+    telemetry.log_generation(operation, first_token_time, duration, stats, user_id)
+    telemetry.monitoring.log_context_metrics(
+        stats.get("context_tokens", 0), stats.get("tokens_saved", 0), duration, user_id
+    )
+
+
+def generate_answer(query: str, top_k: int = 5, user_id: str = None) -> str:
+    prompt, context_stats = build_prompt(query, top_k)
+    start_time = time.time()
+    response = router.generate(
+        prompt,
+        prompt_tokens=estimate_tokens(prompt),
+        latency_budget=budget(Config.ANSWER_LATENCY_BUDGET),
+        cost_budget=budget(Config.ROUTER_COST_BUDGET),
+        generation_config={"temperature": Config.ANSWER_TEMPERATURE},
+    )
+    duration = time.time() - start_time
+
+    _record_generation(
+        "generate_answer",
+        context_stats,
+        getattr(response, "usage_metadata", None),
+        response.text,
+        duration,
+        duration,
+        user_id,
+    )
     return response.text
 
 
+def stream_answer(
+    prompt: str, context_stats: Dict[str, Any] = None, user_id: str = None
+) -> Iterator[str]:
+    """yield answer text as the model streams it, recording TTFT and throughput
+
+    context_stats is updated in place with the generation metrics once the
+    stream is exhausted. The tier is picked up front and never escalated, text
+    already sent to the client cannot be taken back.
+    """
+    stats = context_stats if context_stats is not None else {}
+    tier = router.choose(
+        estimate_tokens(prompt),
+        latency_budget=budget(Config.ANSWER_LATENCY_BUDGET),
+        cost_budget=budget(Config.ROUTER_COST_BUDGET),
+    )
+    stats["model"] = router.tiers[tier]
+    start_time = time.time()
+    first_token_time = None
+    usage = None
+    parts = []
+    try:
+        stream = router.model(tier).generate_content(
+            prompt,
+            generation_config={"temperature": Config.ANSWER_TEMPERATURE},
+            stream=True,
+        )
+        for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                text = chunk.text
+            except ValueError:
+                # chunks without a text part (e.g. only a finish reason) raise
+                text = ""
+            if not text:
+                continue
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            parts.append(text)
+            yield text
+    except Exception:
+        router.record(tier, time.time() - start_time, False, False)
+        raise
+
+    duration = time.time() - start_time
+    router.record(tier, duration, True, False)
+    _record_generation(
+        "stream_answer",
+        stats,
+        usage,
+        "".join(parts),
+        duration if first_token_time is None else first_token_time,
+        duration,
+        user_id,
+    )
+
+
 if __name__ == "__main__":
     query = "什麼是 Python Decorator?"
     answer = generate_answer(query)
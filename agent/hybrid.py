@@ -0,0 +1,53 @@
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from config.config import Config
+from agent.lexical_index import BM25Index
+from agent.vector_index import VectorIndex
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], k: int = Config.RRF_K
+) -> List[int]:
+    """fuse ranked position lists; earlier ranks in any list weigh more"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            fused[int(position)] = fused.get(int(position), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
+
+
+def hybrid_search(
+    vector_index: VectorIndex,
+    lexical_index: BM25Index,
+    query: str,
+    query_embedding: List[float],
+    top_k: int,
+    candidates: int = Config.HYBRID_CANDIDATES,
+    narrow: bool = False,
+    n_probe: int = 0,
+) -> pd.DataFrame:
+    """fuse BM25 and vector rankings with RRF over the shared row positions
+
+    With narrow=True and lexical matches present, vectors are scored only over
+    the lexical candidates instead of probing the vector index.
+    """
+    lexical_positions, _ = lexical_index.search(query, candidates)
+
+    if narrow and len(lexical_positions):
+        distances = vector_index.distances(query_embedding, lexical_positions)
+        vector_positions = lexical_positions[np.argsort(distances)]
+    else:
+        vector_positions, _ = vector_index.search_positions(
+            query_embedding, candidates, n_probe
+        )
+
+    fused = np.array(
+        reciprocal_rank_fusion([lexical_positions, vector_positions])[:top_k],
+        dtype=np.int64,
+    )
+    result = vector_index.rows.iloc[fused].reset_index(drop=True)
+    result["distance"] = vector_index.distances(query_embedding, fused).astype(
+        np.float64
+    )
+    return result
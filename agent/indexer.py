@@ -1,109 +1,438 @@
-from typing import List
+import hashlib
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
 import pandas as pd
 import vertexai
 from config.config import Config
+from agent.bigquery_search import ensure_vector_index
+from agent.chunking import chunk_document, estimate_tokens
+from agent.pipeline import Pipeline
+from agent.quantization import encode_embedding
+from agent.usage import usage_tracker
+from agent.vector_index import build_local_indexes
+from google.api_core import exceptions as google_exceptions
 from google.cloud import bigquery
 from google.cloud.bigquery_storage import BigQueryReadClient
 from vertexai.language_models import TextEmbeddingModel
 
-vertexai.init(
-    project=Config.PROJECT_ID,
-    location=Config.LOCATION,
-    credentials=Config.get_credentials(),
+# offline there is no source table to index; jobs fail when they first query
+bq = None
+embed_model = None
+if not Config.OFFLINE:
+    vertexai.init(
+        project=Config.PROJECT_ID,
+        location=Config.LOCATION,
+        credentials=Config.get_credentials(),
+    )
+    bq = bigquery.Client(
+        project=Config.PROJECT_ID, credentials=Config.get_credentials()
+    )
+    embed_model = TextEmbeddingModel.from_pretrained(Config.EMBED_MODEL_NAME)
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
 )
 
-bq = bigquery.Client(project=Config.PROJECT_ID, credentials=Config.get_credentials())
-embed_model = TextEmbeddingModel.from_pretrained(Config.EMBED_MODEL_NAME)
 
-MAX_CHARS = 2000
+def _source_sql(limit: int) -> str:
+    return f"""
+    SELECT id, title, body, tags, creation_date, score
+    FROM `bigquery-public-data.stackoverflow.posts_questions`
+    WHERE tags LIKE '%python%'
+    LIMIT {limit}
+    """
 
 
-def chunk_text(text: str, chunk_size: int = MAX_CHARS, overlap: int = 200) -> List[str]:
-    if len(text) <= chunk_size:
-        return [text]
+def load_data(limit: int = 100) -> pd.DataFrame:
+    bqstorage = BigQueryReadClient(credentials=Config.get_credentials())
+    return bq.query(_source_sql(limit)).result().to_dataframe(bqstorage)
 
-    chunks = []
-    start = 0
 
-    while start < len(text):
-        end = start + chunk_size
-        if end < len(text):
-            period_pos = text.rfind(".", start, end)
-            space_pos = text.rfind(" ", start, end)
+def iter_data(
+    limit: int = 100, page_size: int = Config.INDEX_PAGE_SIZE
+) -> Iterator[pd.DataFrame]:
+    """stream source rows page by page through the BigQuery Storage API"""
+    bqstorage = BigQueryReadClient(credentials=Config.get_credentials())
+    rows = bq.query(_source_sql(limit)).result(page_size=page_size)
+    for page in rows.to_dataframe_iterable(bqstorage_client=bqstorage):
+        # storage streams may return larger pages; keep stage batches bounded
+        for start in range(0, len(page), page_size):
+            yield page.iloc[start : start + page_size]
 
-            if period_pos > start and period_pos > space_pos:
-                end = period_pos + 1
-            elif space_pos > start:
-                end = space_pos
 
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
+def pack_batches(
+    items: List[Tuple[Hashable, str]],
+    max_items: int = Config.EMBED_BATCH_MAX_ITEMS,
+    max_tokens: int = Config.EMBED_BATCH_MAX_TOKENS,
+) -> List[List[Tuple[Hashable, str]]]:
+    """pack (key, text) items into batches within the per-request limits"""
+    batches = []
+    batch, batch_tokens = [], 0
+    for key, text in items:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
 
-        start = end - overlap
-        if start >= len(text):
-            break
 
-    return chunks
+def embed_batch(texts: List[str]) -> List[List[float]]:
+    """embed one batch, backing off exponentially on quota and availability errors"""
+    for attempt in range(Config.EMBED_MAX_RETRIES + 1):
+        try:
+            vectors = [e.values for e in embed_model.get_embeddings(texts)]
+        except RETRYABLE_ERRORS as e:
+            if attempt == Config.EMBED_MAX_RETRIES:
+                raise
+            delay = min(60.0, 2**attempt) + random.uniform(0, 1)
+            print(f"[WARN] Embedding rate limited ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        usage_tracker.record_embedding(
+            Config.EMBED_MODEL_NAME,
+            sum(len(text) for text in texts),
+            sum(estimate_tokens(text) for text in texts),
+            endpoint="index",
+        )
+        return vectors
 
 
-def load_data(limit: int = 100) -> pd.DataFrame:
-    sql = f"""
-    SELECT id, title, body
-    FROM `bigquery-public-data.stackoverflow.posts_questions`
-    WHERE tags LIKE '%python%'
-    LIMIT {limit}
-    """
-    bqstorage = BigQueryReadClient(credentials=Config.get_credentials())
-    return bq.query(sql).result().to_dataframe(bqstorage)
+def embed_chunks(items: List[Tuple[Hashable, str]]) -> Dict[Hashable, List[float]]:
+    """embed (key, text) items in packed batches on a bounded worker pool"""
+    batches = pack_batches(items)
+    embeddings = {}
+    with ThreadPoolExecutor(max_workers=Config.EMBED_WORKERS) as executor:
+        batch_results = executor.map(
+            lambda batch: embed_batch([text for _, text in batch]), batches
+        )
+        for batch, vectors in zip(batches, batch_results):
+            for (key, _), vector in zip(batch, vectors):
+                embeddings[key] = vector
+    return embeddings
 
 
-def embed_data(data: pd.DataFrame) -> pd.DataFrame:
-    all_chunks = []
-    all_embeddings = []
-    all_metadata = []
+CHUNK_COLUMNS = [
+    "id",
+    "title",
+    "tags",
+    "primary_tag",
+    "creation_date",
+    "score",
+    "chunk_index",
+    "total_chunks",
+    "body",
+    "char_start",
+    "char_end",
+    "content_hash",
+    "fingerprint",
+    "deleted",
+]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_fingerprint(
+    doc_id: str,
+    chunk_index: int,
+    chunk_hash: str,
+    embed_model: str = Config.EMBED_MODEL_NAME,
+    storage: str = Config.EMBEDDING_STORAGE,
+) -> str:
+    """identity of an embedded chunk; any change means it must be re-embedded"""
+    key = f"{doc_id}:{chunk_index}:{chunk_hash}:{embed_model}"
+    if storage != "float64":
+        # float64 keys predate compact storage and stay valid as they are
+        key = f"{key}:{storage}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
 
-    for idx, row in data.iterrows():
-        chunks = chunk_text(str(row["body"]), chunk_size=MAX_CHARS, overlap=200)
-        embeddings = embed_model.get_embeddings(chunks)
+def chunk_data(data: pd.DataFrame) -> pd.DataFrame:
+    all_metadata = []
 
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            all_chunks.append(chunk)
-            all_embeddings.append(embedding.values)
+    for row in data.itertuples(index=False):
+        doc_id = str(row.id)
+        tags = [tag for tag in str(row.tags or "").split("|") if tag]
+        chunks = chunk_document(str(row.body))
+        for i, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk.text)
             all_metadata.append(
                 {
-                    "id": row["id"],
-                    "title": row["title"],
+                    "id": doc_id,
+                    "title": row.title,
+                    "tags": tags,
+                    "primary_tag": tags[0] if tags else None,
+                    "creation_date": row.creation_date,
+                    "score": row.score,
                     "chunk_index": i,
                     "total_chunks": len(chunks),
+                    "body": chunk.text,
+                    "char_start": chunk.start,
+                    "char_end": chunk.end,
+                    "content_hash": chunk_hash,
+                    "fingerprint": chunk_fingerprint(doc_id, i, chunk_hash),
+                    "deleted": False,
                 }
             )
 
-    result_data = pd.DataFrame(all_metadata)
-    result_data["body"] = all_chunks
-    result_data["embedding"] = all_embeddings
+    return pd.DataFrame(all_metadata, columns=CHUNK_COLUMNS)
+
+
+def fetch_live_fingerprints(doc_ids: List[str]) -> pd.DataFrame:
+    sql = f"""
+    SELECT doc_id, chunk_index, fingerprint
+    FROM `{Config.get_bigquery_table()}`
+    WHERE doc_id IN UNNEST(@doc_ids) AND deleted IS NOT TRUE
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("doc_ids", "STRING", doc_ids)]
+    )
+    return bq.query(sql, job_config=job_config).result().to_dataframe()
+
+
+def diff_chunks(chunks: pd.DataFrame) -> pd.DataFrame:
+    """keep new or changed chunks and add tombstones for chunks that disappeared"""
+    if chunks.empty:
+        return chunks
 
+    existing = fetch_live_fingerprints(chunks["id"].unique().tolist())
+    existing_fingerprints = {
+        (row.doc_id, int(row.chunk_index)): row.fingerprint
+        for row in existing.itertuples(index=False)
+    }
+    keys = list(zip(chunks["id"], chunks["chunk_index"]))
+    changed = chunks[
+        [
+            existing_fingerprints.get(key) != fingerprint
+            for key, fingerprint in zip(keys, chunks["fingerprint"])
+        ]
+    ]
+
+    current_keys = set(keys)
+    tombstones = pd.DataFrame(
+        [
+            {
+                "id": doc_id,
+                "title": None,
+                "tags": [],
+                "primary_tag": None,
+                "creation_date": None,
+                "score": None,
+                "chunk_index": chunk_index,
+                "total_chunks": 0,
+                "body": "",
+                "char_start": 0,
+                "char_end": 0,
+                "content_hash": "",
+                "fingerprint": "",
+                "deleted": True,
+            }
+            for doc_id, chunk_index in existing_fingerprints
+            if (doc_id, chunk_index) not in current_keys
+        ],
+        columns=CHUNK_COLUMNS,
+    )
+
+    skipped = len(chunks) - len(changed)
+    if skipped:
+        print(f"[INFO] Skipped {skipped} unchanged chunks")
+    return pd.concat([changed, tombstones], ignore_index=True)
+
+
+def embed_chunk_data(chunks: pd.DataFrame) -> pd.DataFrame:
+    live = chunks[~chunks["deleted"].astype(bool)]
+    keys = list(zip(live["id"], live["chunk_index"]))
+    embeddings = embed_chunks(list(zip(keys, live["body"])))
+
+    result_data = chunks.copy()
+    result_data["embedding"] = [
+        embeddings.get(key, [])
+        for key in zip(result_data["id"], result_data["chunk_index"])
+    ]
     return result_data
 
 
-def index_data(data: pd.DataFrame) -> pd.DataFrame:
-    df = data.rename(columns={"id": "doc_id", "body": "content"})[
-        ["doc_id", "title", "content", "embedding"]
+def embed_data(data: pd.DataFrame) -> pd.DataFrame:
+    return embed_chunk_data(diff_chunks(chunk_data(data)))
+
+
+STAGING_SCHEMA = [
+    bigquery.SchemaField("doc_id", "STRING"),
+    bigquery.SchemaField("chunk_index", "INT64"),
+    bigquery.SchemaField("title", "STRING"),
+    bigquery.SchemaField("content", "STRING"),
+    bigquery.SchemaField("tags", "STRING", mode="REPEATED"),
+    bigquery.SchemaField("primary_tag", "STRING"),
+    bigquery.SchemaField("creation_date", "TIMESTAMP"),
+    bigquery.SchemaField("score", "INT64"),
+    bigquery.SchemaField("char_start", "INT64"),
+    bigquery.SchemaField("char_end", "INT64"),
+    bigquery.SchemaField("embedding", "FLOAT64", mode="REPEATED"),
+    bigquery.SchemaField("embedding_q", "BYTES"),
+    bigquery.SchemaField("embedding_scale", "FLOAT64"),
+    bigquery.SchemaField("content_hash", "STRING"),
+    bigquery.SchemaField("embed_model", "STRING"),
+    bigquery.SchemaField("fingerprint", "STRING"),
+    bigquery.SchemaField("deleted", "BOOL"),
+]
+
+
+def _encode_storage(df: pd.DataFrame, storage: str) -> pd.DataFrame:
+    """move embeddings into the compact BYTES column unless storing float64"""
+    if storage == "float64":
+        df["embedding_q"] = None
+        df["embedding_scale"] = None
+        return df
+
+    encoded = [
+        encode_embedding(embedding, storage) if len(embedding) else (None, None)
+        for embedding in df["embedding"]
     ]
+    df["embedding_q"] = [payload for payload, _ in encoded]
+    df["embedding_scale"] = [scale for _, scale in encoded]
+    df["embedding"] = [[] for _ in range(len(df))]
+    return df
+
+
+def index_data(data: pd.DataFrame) -> int:
+    """upsert changed chunks and apply tombstones through a staging table MERGE"""
+    if data.empty:
+        return 0
+
+    df = data.rename(columns={"id": "doc_id", "body": "content"})
     df["doc_id"] = df["doc_id"].astype(str)
+    df["embed_model"] = Config.EMBED_MODEL_NAME
+    df = _encode_storage(df, Config.EMBEDDING_STORAGE)
+    df = df[[field.name for field in STAGING_SCHEMA]]
 
     table_id = Config.get_bigquery_table()
-    job = bq.load_table_from_dataframe(df, table_id)
+    # one staging table per batch: index jobs from other processes (the CLI,
+    # other replicas) would otherwise truncate each other's rows before MERGE
+    staging_table_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+    job_config = bigquery.LoadJobConfig(
+        schema=STAGING_SCHEMA,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    try:
+        bq.load_table_from_dataframe(
+            df, staging_table_id, job_config=job_config
+        ).result()
+        _merge_staging(table_id, staging_table_id)
+    finally:
+        bq.delete_table(staging_table_id, not_found_ok=True)
+    print(f"[INFO] Data indexed successfully - {len(df)} chunks merged")
+    return len(df)
+
+
+def _merge_staging(table_id: str, staging_table_id: str):
+    sql = f"""
+    MERGE `{table_id}` T
+    USING `{staging_table_id}` S
+    ON T.doc_id = S.doc_id AND T.chunk_index = S.chunk_index
+    WHEN MATCHED AND S.deleted THEN
+      UPDATE SET deleted = TRUE, updated_at = CURRENT_TIMESTAMP()
+    WHEN MATCHED AND NOT S.deleted THEN
+      UPDATE SET
+        title = S.title,
+        content = S.content,
+        tags = S.tags,
+        primary_tag = S.primary_tag,
+        creation_date = S.creation_date,
+        score = S.score,
+        char_start = S.char_start,
+        char_end = S.char_end,
+        embedding = S.embedding,
+        embedding_q = S.embedding_q,
+        embedding_scale = S.embedding_scale,
+        content_hash = S.content_hash,
+        embed_model = S.embed_model,
+        fingerprint = S.fingerprint,
+        deleted = FALSE,
+        updated_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED AND NOT S.deleted THEN
+      INSERT (doc_id, chunk_index, title, content, tags, primary_tag,
+              creation_date, score, char_start, char_end, embedding,
+              embedding_q, embedding_scale, content_hash, embed_model,
+              fingerprint, deleted, updated_at)
+      VALUES (S.doc_id, S.chunk_index, S.title, S.content, S.tags,
+              S.primary_tag, S.creation_date, S.score, S.char_start,
+              S.char_end, S.embedding, S.embedding_q, S.embedding_scale,
+              S.content_hash, S.embed_model, S.fingerprint, FALSE,
+              CURRENT_TIMESTAMP())
+    """
+    bq.query(sql).result()
+
+
+def tombstone_deleted_documents() -> int:
+    """tombstone chunks whose post no longer exists in the source table
+
+    This scans the whole source query, so it is opt-in rather than part of every run.
+    """
+    sql = f"""
+    UPDATE `{Config.get_bigquery_table()}`
+    SET deleted = TRUE, updated_at = CURRENT_TIMESTAMP()
+    WHERE deleted IS NOT TRUE
+      AND doc_id NOT IN (
+        SELECT CAST(id AS STRING)
+        FROM `bigquery-public-data.stackoverflow.posts_questions`
+        WHERE tags LIKE '%python%'
+      )
+    """
+    job = bq.query(sql)
     job.result()
-    print(f"[INFO] Data indexed successfully - {len(df)} chunks processed")
+    return job.num_dml_affected_rows or 0
+
+
+def main(
+    limit: int = 100,
+    pipeline: Optional[Pipeline] = None,
+    tombstone_missing: bool = False,
+) -> Dict[str, Any]:
+    """stream posts through chunk -> diff -> embed -> write and return stage counters"""
+    pipeline = pipeline or Pipeline(queue_size=Config.INDEX_QUEUE_SIZE)
 
+    def write(chunks: pd.DataFrame) -> int:
+        # tombstones go through the same MERGE, counted apart from upserts
+        if len(chunks):
+            pipeline.count("tombstones", int(chunks["deleted"].astype(bool).sum()))
+        return index_data(chunks)
 
-def main():
-    data = load_data()
-    # print(data.head())
-    data = embed_data(data)
-    data = index_data(data)
-    # print(data)
+    stats = pipeline.run(
+        iter_data(limit),
+        [
+            ("chunk", chunk_data),
+            ("diff", diff_chunks),
+            ("embed", embed_chunk_data),
+            ("write", write),
+        ],
+    )
+    for stage in stats.values():
+        print(
+            f"[INFO] {stage['stage']}: {stage['rows']} rows in {stage['batches']} "
+            f"batches, {stage['rows_per_second']:.1f} rows/s"
+        )
+    changed = stats["write"]["rows"]
+    if tombstone_missing:
+        tombstoned = tombstone_deleted_documents()
+        changed += tombstoned
+        print(f"[INFO] Tombstoned {tombstoned} deleted chunks")
+    if Config.VECTOR_SEARCH_ENABLED and Config.EMBEDDING_STORAGE == "float64":
+        ensure_vector_index(bq)
+    # once per run rather than per batch: the build re-reads the whole table
+    if Config.LOCAL_INDEX_BUILD and changed:
+        build_local_indexes(bq)
+    return stats
 
 
 if __name__ == "__main__":
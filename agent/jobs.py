@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from agent.pipeline import Pipeline, PipelineCancelled
+from config.config import Config
+
+
+class IndexJob:
+    def __init__(self, limit: int, tombstone_missing: bool = False):
+        self.job_id = str(uuid.uuid4())
+        self.limit = limit
+        self.tombstone_missing = tombstone_missing
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pipeline = Pipeline(queue_size=Config.INDEX_QUEUE_SIZE)
+
+    def _rows(self, stage: str) -> int:
+        stats = self.pipeline.stats.get(stage)
+        return stats.rows if stats else 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        rows_processed = self._rows("read")
+        tombstones = self.pipeline.counters.get("tombstones", 0)
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        rows_per_second = rows_processed / elapsed if elapsed else 0.0
+        eta_seconds = None
+        if self.status == "running" and rows_per_second:
+            eta_seconds = max(self.limit - rows_processed, 0) / rows_per_second
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": (
+                self.pipeline.current_stage if self.status == "running" else None
+            ),
+            "limit": self.limit,
+            "tombstone_missing": self.tombstone_missing,
+            "rows_processed": rows_processed,
+            "chunks_processed": self._rows("diff"),
+            "chunks_written": self._rows("write") - tombstones,
+            "chunks_tombstoned": tombstones,
+            "rows_per_second": rows_per_second,
+            "eta_seconds": eta_seconds,
+            "elapsed_seconds": elapsed,
+            "error": self.error,
+            "stages": self.pipeline.report(),
+        }
+
+
+class IndexJobManager:
+    """Runs index jobs one at a time off the request path"""
+
+    def __init__(
+        self,
+        run_job: Callable[[int, Pipeline, bool], Any],
+        on_finished: Optional[Callable[["IndexJob"], None]] = None,
+        max_history: int = 100,
+    ):
+        self.run_job = run_job
+        self.on_finished = on_finished
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="index-job"
+        )
+        self._jobs: "OrderedDict[str, IndexJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, limit: int, tombstone_missing: bool = False) -> IndexJob:
+        job = IndexJob(limit, tombstone_missing)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # forget the oldest finished jobs
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.max_history:
+                    break
+                if self._jobs[job_id].status not in ("queued", "running"):
+                    del self._jobs[job_id]
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            job.pipeline.cancel()
+            if job.status == "queued":
+                job.status = "cancelled"
+        return job
+
+    def _run(self, job: IndexJob):
+        if job.pipeline.cancelled:
+            job.status = "cancelled"
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            self.run_job(job.limit, job.pipeline, job.tombstone_missing)
+            job.status = "completed"
+        except PipelineCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if self.on_finished is not None:
+                self.on_finished(job)
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.pipeline.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,137 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# identifiers keep dots/underscores so API names like os.path.join survive intact
+_TOKEN = re.compile(r"[a-z0-9_]+(?:\.[a-z0-9_]+)*|[\u4e00-\u9fff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """lowercased terms; dotted names also emit their parts"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(part for part in token.split(".") if part)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a compact CSR inverted index (positions match the row order)"""
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        frequencies: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(doc_lengths)
+        doc_freq = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        average = float(doc_lengths.mean()) if n_docs else 0.0
+        # per-document length normalization, precomputed once
+        self._norm = (k1 * (1 - b + b * doc_lengths / max(average, 1e-9))).astype(
+            np.float32
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        term_docs: List[List[Tuple[int, int]]] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            doc_lengths[position] = sum(counts.values())
+            for term, count in counts.items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                if term_id == len(term_docs):
+                    term_docs.append([])
+                term_docs[term_id].append((position, count))
+
+        offsets = np.zeros(len(term_docs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(docs) for docs in term_docs])
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        frequencies = np.empty(offsets[-1], dtype=np.float32)
+        for term_id, docs in enumerate(term_docs):
+            start = offsets[term_id]
+            postings[start : start + len(docs)] = [position for position, _ in docs]
+            frequencies[start : start + len(docs)] = [count for _, count in docs]
+
+        return cls(vocabulary, offsets, postings, frequencies, doc_lengths, k1, b)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for query"""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings[start:end]
+            tf = self.frequencies[start:end]
+            scores[docs] += (
+                self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+            )
+        return scores
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions, scores) of the best matches with a positive score"""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return matched, scores[matched]
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(
+            os.path.join(directory, "lexical.npz"),
+            offsets=self.offsets,
+            postings=self.postings,
+            frequencies=self.frequencies,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b]),
+        )
+        with open(os.path.join(directory, "vocabulary.json"), "w") as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        arrays_path = os.path.join(directory, "lexical.npz")
+        vocabulary_path = os.path.join(directory, "vocabulary.json")
+        if not (os.path.exists(arrays_path) and os.path.exists(vocabulary_path)):
+            return None
+
+        arrays = np.load(arrays_path)
+        with open(vocabulary_path) as f:
+            vocabulary = json.load(f)
+        k1, b = arrays["params"].tolist()
+        return cls(
+            vocabulary,
+            arrays["offsets"],
+            arrays["postings"],
+            arrays["frequencies"],
+            arrays["doc_lengths"],
+            k1,
+            b,
+        )
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+from config.config import Config
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-able form of prompts, Contents, tools and generation configs"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    # vertexai Content / Part / Tool / GenerationConfig all expose to_dict
+    if hasattr(value, "to_dict"):
+        return _canonical(value.to_dict())
+    return repr(value)
+
+
+def _temperature(generation_config: Any) -> Optional[float]:
+    config = _canonical(generation_config)
+    if isinstance(config, dict) and config.get("temperature") is not None:
+        return float(config["temperature"])
+    return None
+
+
+class LLMResponseCache:
+    """LRU + TTL store of model responses shared by CachedModel wrappers"""
+
+    def __init__(
+        self, max_size: int = 512, ttl: float = 600.0, max_temperature: float = 0.2
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        # key -> (created_at, response, seconds the original call took)
+        self._entries: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.latency_saved = 0.0
+
+    def key(
+        self,
+        model_name: str,
+        contents: Any,
+        tools: Any = None,
+        generation_config: Any = None,
+    ) -> str:
+        canonical = json.dumps(
+            {
+                "model": model_name,
+                "contents": _canonical(contents),
+                "tools": _canonical(tools),
+                "generation_config": _canonical(generation_config),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def cacheable(self, generation_config: Any) -> bool:
+        """only near-deterministic calls; no temperature means the model default"""
+        if self.max_size <= 0:
+            return False
+        temperature = _temperature(generation_config)
+        return temperature is not None and temperature <= self.max_temperature
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(response, original latency) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, response, latency = entry
+                if self.ttl <= 0 or time.time() - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.latency_saved += latency
+                    return response, latency
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: Any, latency: float):
+        with self._lock:
+            self._entries[key] = (time.time(), response, latency)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": self.latency_saved,
+            }
+
+
+class CachedModel:
+    """generate_content wrapper that serves repeated low-temperature calls from cache
+
+    Works with GenerativeModel or any object exposing the same generate_content
+    (e.g. FakeStreamingModel). A cacheable stream is stored as its list of
+    chunks once it has been read to the end, and hits replay that transcript;
+    streams abandoned part way are not stored. on_usage(model_name,
+    usage_metadata) sees every response that came from the model, streams once
+    their last chunk has been read.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        model_name: str,
+        cache: LLMResponseCache,
+        tools: Any = None,
+        on_lookup=None,
+        on_usage=None,
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.tools = tools
+        # on_lookup(hit, latency_saved) for exporting metrics
+        self.on_lookup = on_lookup
+        self.on_usage = on_usage
+
+    def _record_usage(self, response: Any):
+        usage = getattr(response, "usage_metadata", None)
+        if self.on_usage is not None and usage is not None:
+            self.on_usage(self.model_name, usage)
+
+    def _stream(
+        self, chunks: Iterator[Any], key: Optional[str] = None
+    ) -> Iterator[Any]:
+        # usage metadata is cumulative, the last chunk carrying it has the totals
+        start_time = time.time()
+        transcript = []
+        usage_chunk = None
+        for chunk in chunks:
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage_chunk = chunk
+            transcript.append(chunk)
+            yield chunk
+        if usage_chunk is not None:
+            self._record_usage(usage_chunk)
+        if key is not None:
+            self.cache.put(key, transcript, time.time() - start_time)
+
+    def generate_content(
+        self,
+        contents: Any,
+        generation_config: Any = None,
+        stream: bool = False,
+        **kwargs,
+    ):
+        if kwargs or not self.cache.cacheable(generation_config):
+            self.cache.record_bypass()
+            response = self.model.generate_content(
+                contents, generation_config=generation_config, stream=stream, **kwargs
+            )
+            if stream:
+                return self._stream(response)
+            self._record_usage(response)
+            return response
+
+        key = self.cache.key(self.model_name, contents, self.tools, generation_config)
+        if stream:
+            # stream entries hold chunk lists, keep them apart from responses
+            key += ":stream"
+        cached = self.cache.get(key)
+        if cached is not None:
+            response, latency = cached
+            if self.on_lookup is not None:
+                self.on_lookup(True, latency)
+            return iter(response) if stream else response
+
+        if stream:
+            chunks = self.model.generate_content(
+                contents, generation_config=generation_config, stream=True
+            )
+            if self.on_lookup is not None:
+                self.on_lookup(False, 0.0)
+            return self._stream(chunks, key)
+
+        start_time = time.time()
+        response = self.model.generate_content(
+            contents, generation_config=generation_config
+        )
+        latency = time.time() - start_time
+        self._record_usage(response)
+        self.cache.put(key, response, latency)
+        if self.on_lookup is not None:
+            self.on_lookup(False, 0.0)
+        return response
+
+
+llm_cache = LLMResponseCache(
+    max_size=Config.LLM_CACHE_SIZE,
+    ttl=Config.LLM_CACHE_TTL,
+    max_temperature=Config.LLM_CACHE_MAX_TEMPERATURE,
+)
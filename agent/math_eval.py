@@ -0,0 +1,155 @@
+import ast
+import math
+import operator
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+from config.config import Config
+
+Number = Union[int, float]
+Instruction = Tuple[str, Any]
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+class MathError(ValueError):
+    """expression rejected by the evaluator's grammar or limits"""
+
+
+def _paren_depth(expression: str) -> int:
+    depth = deepest = 0
+    for char in expression:
+        if char == "(":
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == ")":
+            depth -= 1
+    return deepest
+
+
+def _check_int(value: Number) -> Number:
+    if isinstance(value, int) and value.bit_length() > Config.MATH_MAX_INT_BITS:
+        raise MathError(f"數值超過 {Config.MATH_MAX_INT_BITS} 位元上限")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise MathError("結果溢位")
+    return value
+
+
+@lru_cache(maxsize=Config.MATH_CACHE_SIZE)
+def compile_expression(expression: str) -> Tuple[Instruction, ...]:
+    """parse once into a postfix program of whitelisted arithmetic nodes"""
+    if len(expression) > Config.MATH_MAX_CHARS:
+        raise MathError(f"表達式超過 {Config.MATH_MAX_CHARS} 個字元")
+    # checked before parsing, the parser itself recurses on nesting
+    if _paren_depth(expression) > Config.MATH_MAX_DEPTH:
+        raise MathError(f"括號巢狀超過 {Config.MATH_MAX_DEPTH} 層")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+        raise MathError(f"無法解析表達式: {e}") from None
+
+    program: List[Instruction] = []
+    nodes = 0
+    # iterative post-order walk, long operator chains nest without parentheses
+    stack: List[Tuple[ast.AST, bool]] = [(tree.body, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            if isinstance(node, ast.BinOp):
+                program.append(("binary", type(node.op)))
+            else:
+                program.append(("unary", _UNARY[type(node.op)]))
+            continue
+
+        nodes += 1
+        if nodes > Config.MATH_MAX_NODES:
+            raise MathError(f"表達式超過 {Config.MATH_MAX_NODES} 個節點")
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            program.append(("const", _check_int(node.value)))
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            stack.append((node, True))
+            stack.append((node.operand, False))
+        else:
+            raise MathError(f"不支援的語法: {type(node).__name__}")
+    return tuple(program)
+
+
+def _binary(op: type, left: Number, right: Number) -> Number:
+    # lower bounds on the result size, checked first since the operation itself
+    # cannot be interrupted; a result that passes is at most right (pow) or one
+    # bit (mult) longer than the bound and _check_int rejects it afterwards
+    if isinstance(left, int) and isinstance(right, int):
+        if op is ast.Pow and right > 0:
+            if right > Config.MATH_MAX_EXPONENT:
+                raise MathError(f"指數超過 {Config.MATH_MAX_EXPONENT} 上限")
+            if (left.bit_length() - 1) * right + 1 > Config.MATH_MAX_INT_BITS:
+                raise MathError(f"數值超過 {Config.MATH_MAX_INT_BITS} 位元上限")
+        elif op is ast.Mult:
+            if left.bit_length() + right.bit_length() - 1 > Config.MATH_MAX_INT_BITS:
+                raise MathError(f"數值超過 {Config.MATH_MAX_INT_BITS} 位元上限")
+    elif op is ast.Pow and abs(right) > Config.MATH_MAX_EXPONENT:
+        raise MathError(f"指數超過 {Config.MATH_MAX_EXPONENT} 上限")
+
+    try:
+        result = _BINARY[op](left, right)
+    except ZeroDivisionError:
+        raise MathError("除數不能為零") from None
+    except OverflowError:
+        raise MathError("結果溢位") from None
+    if isinstance(result, complex):
+        raise MathError("結果不是實數")
+    return _check_int(result)
+
+
+def run_program(
+    program: Tuple[Instruction, ...], deadline: Optional[float] = None
+) -> Number:
+    """evaluate a compiled program, raising MathError past the perf_counter deadline"""
+    values: List[Number] = []
+    for kind, argument in program:
+        if deadline is not None and time.perf_counter() > deadline:
+            raise MathError("計算超過時間上限")
+        if kind == "const":
+            values.append(argument)
+        elif kind == "unary":
+            values.append(argument(values.pop()))
+        else:
+            right = values.pop()
+            values.append(_binary(argument, values.pop(), right))
+    return values[0]
+
+
+def evaluate(expression: str, time_budget: Optional[float] = None) -> Number:
+    """safe arithmetic: + - * / // % ** and parentheses on int/float literals"""
+    if time_budget is None:
+        time_budget = Config.MATH_TIME_BUDGET_MS / 1000
+    deadline = time.perf_counter() + time_budget if time_budget > 0 else None
+    return run_program(compile_expression(expression), deadline)
+
+
+def evaluate_many(
+    expressions: List[str], time_budget: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """evaluate each expression independently, errors reported per item"""
+    results = []
+    for expression in expressions:
+        try:
+            results.append(
+                {"expression": expression, "result": evaluate(expression, time_budget)}
+            )
+        except MathError as e:
+            results.append({"expression": expression, "error": str(e)})
+    return results
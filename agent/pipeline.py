@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+
+class PipelineCancelled(Exception):
+    """Raised when a pipeline run is cancelled"""
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.batches = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.done = False
+
+    def record(self, rows: int, seconds: float):
+        self.batches += 1
+        self.rows += rows
+        self.busy_seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "batches": self.batches,
+            "rows": self.rows,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": (
+                self.rows / self.busy_seconds if self.busy_seconds else 0.0
+            ),
+            "done": self.done,
+        }
+
+
+class Pipeline:
+    """Thread-per-stage pipeline connected by bounded (backpressured) queues
+
+    Each stage receives one batch (anything with len()) and returns the batch for
+    the next stage; the output of the last stage is discarded.
+    """
+
+    def __init__(self, queue_size: int = 4):
+        self.queue_size = queue_size
+        self.stats: Dict[str, StageStats] = {}
+        # named totals stages add to beyond their row counts
+        self.counters: Dict[str, int] = {}
+        self._counters_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def count(self, name: str, value: int):
+        with self._counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _put(self, out_queue: queue.Queue, item: Any):
+        # poll so that a cancelled run never blocks on a full queue
+        while not self._cancelled.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, in_queue: queue.Queue) -> Any:
+        while not self._cancelled.is_set():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, error: BaseException):
+        if self._error is None:
+            self._error = error
+        self._cancelled.set()
+
+    def _read(self, source: Iterable, out_queue: queue.Queue, stats: StageStats):
+        try:
+            iterator = iter(source)
+            while not self._cancelled.is_set():
+                start_time = time.perf_counter()
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    break
+                stats.record(len(batch), time.perf_counter() - start_time)
+                self._put(out_queue, batch)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            stats.done = True
+            self._put(out_queue, _DONE)
+
+    def _work(
+        self,
+        func: Callable[[Any], Any],
+        in_queue: queue.Queue,
+        out_queue: Optional[queue.Queue],
+        stats: StageStats,
+    ):
+        try:
+            while True:
+                batch = self._get(in_queue)
+                if batch is _DONE:
+                    break
+                start_time = time.perf_counter()
+                result = func(batch)
+                stats.record(len(batch), time.perf_counter() - start_time)
+                if out_queue is not None:
+                    self._put(out_queue, result)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            stats.done = True
+            if out_queue is not None:
+                self._put(out_queue, _DONE)
+
+    def run(
+        self,
+        source: Iterable,
+        stages: List[Tuple[str, Callable[[Any], Any]]],
+        source_name: str = "read",
+    ) -> Dict[str, Dict[str, Any]]:
+        """run source through stages and return per-stage counters"""
+        self.stats = {source_name: StageStats(source_name)}
+        self.counters = {}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        threads = [
+            threading.Thread(
+                target=self._read,
+                args=(source, queues[0], self.stats[source_name]),
+                name=f"pipeline-{source_name}",
+                daemon=True,
+            )
+        ]
+        for i, (name, func) in enumerate(stages):
+            self.stats[name] = StageStats(name)
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(
+                threading.Thread(
+                    target=self._work,
+                    args=(func, queues[i], out_queue, self.stats[name]),
+                    name=f"pipeline-{name}",
+                    daemon=True,
+                )
+            )
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+        if self._cancelled.is_set():
+            raise PipelineCancelled("pipeline cancelled")
+        return self.report()
+
+    @property
+    def current_stage(self) -> Optional[str]:
+        """first stage that is still working, i.e. where the run's tail is"""
+        for name, stats in self.stats.items():
+            if not stats.done:
+                return name
+        return None
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
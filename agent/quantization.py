@@ -0,0 +1,53 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+STORAGE_MODES = ("float64", "float32", "int8")
+BYTES_PER_DIMENSION = {"float64": 8, "float32": 4, "int8": 1}
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """symmetric per-vector int8 quantization, returns (codes, scales)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def int8_dot(
+    codes: np.ndarray, scales: np.ndarray, query: np.ndarray, block: int = 65536
+) -> np.ndarray:
+    """dot products against int8 codes without materializing a float copy"""
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], block):
+        part = codes[start : start + block].astype(np.float32)
+        scores[start : start + block] = (part @ query) * scales[start : start + block]
+    return scores
+
+
+def encode_embedding(values: Sequence[float], mode: str) -> Tuple[bytes, float]:
+    """pack one embedding for the BYTES column, returns (payload, scale)"""
+    vector = np.asarray(values, dtype=np.float32)
+    if mode == "float32":
+        return vector.astype("<f4").tobytes(), 1.0
+    if mode == "int8":
+        codes, scales = quantize_int8(vector)
+        return codes[0].tobytes(), float(scales[0])
+    raise ValueError(f"不支援的向量儲存格式: {mode}")
+
+
+def decode_embeddings(
+    payloads: List[bytes], scales: Optional[Sequence[float]], mode: str
+) -> np.ndarray:
+    """unpack BYTES payloads into a float32 matrix"""
+    if mode == "float32":
+        return np.stack([np.frombuffer(p, dtype="<f4") for p in payloads])
+    if mode == "int8":
+        codes = np.stack([np.frombuffer(p, dtype=np.int8) for p in payloads])
+        return dequantize_int8(codes, np.asarray(scales, dtype=np.float32))
+    raise ValueError(f"不支援的向量儲存格式: {mode}")
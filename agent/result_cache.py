@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+class SemanticResultCache:
+    """Retrieval results keyed by query embedding similarity"""
+
+    def __init__(
+        self, max_size: int = 256, threshold: float = 0.95, ttl: float = 600.0
+    ):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.invalidated_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._served_age_total = 0.0
+        self.max_served_age = 0.0
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(
+        self, query_embedding: List[float], top_k: int, scope: str = ""
+    ) -> Optional[pd.DataFrame]:
+        """return cached rows of the most similar compatible query, if close enough
+
+        Entries are compatible when they hold at least top_k rows and were stored
+        under the same scope (e.g. the same metadata filters).
+        """
+        query = self._unit(query_embedding)
+        now = time.time()
+        with self._lock:
+            expired = [
+                entry_id
+                for entry_id, entry in self._entries.items()
+                if self.ttl > 0 and now - entry["created_at"] > self.ttl
+            ]
+            for entry_id in expired:
+                del self._entries[entry_id]
+
+            candidates = [
+                (entry_id, entry)
+                for entry_id, entry in self._entries.items()
+                if entry["top_k"] >= top_k and entry["scope"] == scope
+            ]
+            if candidates:
+                matrix = np.stack([entry["embedding"] for _, entry in candidates])
+                similarities = matrix @ query
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    age = now - entry["created_at"]
+                    self.hits += 1
+                    self._served_age_total += age
+                    self.max_served_age = max(self.max_served_age, age)
+                    return entry["results"].head(top_k).copy()
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        results: pd.DataFrame,
+        generation: Optional[int] = None,
+        scope: str = "",
+    ):
+        with self._lock:
+            # results computed before an invalidation must not be cached
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[self._next_id] = {
+                "embedding": self._unit(query_embedding),
+                "top_k": top_k,
+                "scope": scope,
+                "results": results.copy(),
+                "created_at": time.time(),
+                "generation": self.generation,
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """drop every entry, called whenever the documents table changes"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidated_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_served_age_s": (
+                self._served_age_total / self.hits if self.hits else 0.0
+            ),
+            "max_served_age_s": self.max_served_age,
+            "generation": self.generation,
+            "invalidated_at": self.invalidated_at,
+        }
@@ -1,36 +1,202 @@
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
 from google.cloud import bigquery
 import vertexai
 import pandas as pd
 from vertexai.language_models import TextEmbeddingModel
 from config.config import Config
+from agent import bigquery_search
+from agent.embedding_batcher import EmbeddingBatcher
+from agent.chunking import estimate_tokens
+from agent.embedding_cache import EmbeddingCache
+from agent.hybrid import hybrid_search
+from agent.lexical_index import BM25Index
+from agent.result_cache import SemanticResultCache
+from agent.usage import usage_tracker
+from agent.vector_index import TableModifiedCheck, VectorIndex
 
-vertexai.init(
-    project=Config.PROJECT_ID,
-    location=Config.LOCATION,
-    credentials=Config.get_credentials(),
+if Config.OFFLINE:
+    from agent.fake_backends import FakeEmbedder
+
+    bq = None
+    fake_embedder = FakeEmbedder()
+    embed_texts = fake_embedder.embed_batch
+else:
+    vertexai.init(
+        project=Config.PROJECT_ID,
+        location=Config.LOCATION,
+        credentials=Config.get_credentials(),
+    )
+    bq = bigquery.Client(
+        project=Config.PROJECT_ID, credentials=Config.get_credentials()
+    )
+    embed_model = TextEmbeddingModel.from_pretrained(Config.EMBED_MODEL_NAME)
+
+    def embed_texts(texts: List[str]) -> List[List[float]]:
+        return [e.values for e in embed_model.get_embeddings(texts)]
+
+
+embedding_batcher = EmbeddingBatcher(
+    embed_texts,
+    window_ms=Config.QUERY_EMBED_BATCH_WINDOW_MS,
+    max_batch_size=Config.QUERY_EMBED_BATCH_SIZE,
+    timeout=Config.VERTEX_TIMEOUT or None,
+)
+embedding_cache = EmbeddingCache(
+    Config.EMBED_MODEL_NAME,
+    max_size=Config.EMBED_CACHE_SIZE,
+    ttl=Config.EMBED_CACHE_TTL,
+    disk_path=Config.EMBED_CACHE_PATH or None,
+    disk_max_size=Config.EMBED_CACHE_DISK_SIZE,
 )
-bq = bigquery.Client(project=Config.PROJECT_ID, credentials=Config.get_credentials())
-embed_model = TextEmbeddingModel.from_pretrained(Config.EMBED_MODEL_NAME)
-
-
-def retrieve(query: str, top_k: int = 5) -> pd.DataFrame:
-    query_embedding = embed_model.get_embeddings([query])[0].values
-    sql = f"""
-    SELECT 
-        doc_id, 
-        title, 
-        content, 
-        ML.DISTANCE(embedding, @query_embedding, 'COSINE') AS distance
-    FROM `{Config.get_bigquery_table()}`
-    ORDER BY distance ASC
-    LIMIT {top_k}
+result_cache = SemanticResultCache(
+    max_size=Config.RESULT_CACHE_SIZE,
+    threshold=Config.RESULT_CACHE_THRESHOLD,
+    ttl=Config.RESULT_CACHE_TTL,
+)
+
+vector_index: Optional[VectorIndex] = None
+lexical_index: Optional[BM25Index] = None
+table_check = TableModifiedCheck(ttl=Config.VECTOR_INDEX_CHECK_TTL)
+
+
+def reload_local_indexes():
+    """(re)load the vector and BM25 indexes saved in VECTOR_INDEX_DIR"""
+    global vector_index, lexical_index
+    if Config.OFFLINE:
+        from agent.fake_backends import build_sample_indexes
+
+        vector_index, lexical_index = build_sample_indexes(fake_embedder)
+        return
+    vectors = VectorIndex.load(Config.VECTOR_INDEX_DIR)
+    lexical = BM25Index.load(Config.VECTOR_INDEX_DIR)
+    if vectors is not None and lexical is not None and len(lexical) != len(vectors):
+        print("[WARN] Lexical index does not match the vector index, ignoring it")
+        lexical = None
+    vector_index, lexical_index = vectors, lexical
+    if vector_index is not None:
+        print(f"[INFO] Vector index loaded - {len(vector_index)} vectors")
+        if vector_index.source_modified is None:
+            print("[WARN] Vector index has no build time, rebuild it to serve it")
+    if lexical_index is not None:
+        print(f"[INFO] Lexical index loaded - {len(lexical_index.vocabulary)} terms")
+
+
+reload_local_indexes()
+
+
+def embed_query(query: str) -> List[float]:
+    embedding = embedding_cache.get(query)
+    if embedding is None:
+        embedding = embedding_batcher.embed(query)
+        embedding_cache.put(query, embedding)
+        # counted per request, the batcher may share one call between several
+        usage_tracker.record_embedding(
+            Config.EMBED_MODEL_NAME, len(query), estimate_tokens(query)
+        )
+    return embedding
+
+
+def local_indexes() -> Tuple[Optional[VectorIndex], Optional[BM25Index]]:
+    """the loaded indexes while the documents table is unchanged since their build
+
+    A stale snapshot would return chunks that were changed or tombstoned since,
+    so those queries go to BigQuery instead. Compact EMBEDDING_STORAGE leaves
+    BigQuery nothing to search, there the snapshot is served regardless.
     """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ArrayQueryParameter("query_embedding", "FLOAT64", query_embedding)
-        ]
+    # one snapshot per request, reload_local_indexes may swap them concurrently
+    vectors, lexical = vector_index, lexical_index
+    if vectors is None or bq is None or Config.EMBEDDING_STORAGE != "float64":
+        return vectors, lexical
+    if not table_check.is_current(bq, vectors):
+        return None, None
+    return vectors, lexical
+
+
+def search_bigquery(
+    query_embedding: List[float],
+    top_k: int,
+    fraction_lists_to_search: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """VECTOR_SEARCH when the BigQuery vector index is ready, exact otherwise"""
+    return bigquery_search.search(
+        bq, query_embedding, top_k, fraction_lists_to_search, filters
     )
-    return bq.query(sql, job_config=job_config).result().to_dataframe()
+
+
+def retrieve(
+    query: str,
+    top_k: int = 5,
+    fraction_lists_to_search: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    mode: str = "vector",
+    narrow: bool = False,
+) -> pd.DataFrame:
+    """top_k chunks for query; attrs carry search_path and bytes_processed
+
+    Metadata filters are pushed down to BigQuery, so filtered queries skip the
+    local indexes (which hold no metadata). mode="hybrid" fuses BM25 and vector
+    rankings from the local indexes; narrow=True scores vectors only over the
+    BM25 candidates. Without current local indexes (see local_indexes), hybrid
+    falls back to vector mode.
+    """
+    query_embedding = embed_query(query)
+    vectors, lexical = local_indexes()
+    hybrid = mode == "hybrid" and not filters
+    if hybrid and (vectors is None or lexical is None):
+        print("[WARN] Hybrid retrieval needs the local indexes, using vector mode")
+        hybrid = False
+    scope = json.dumps(
+        {
+            "filters": filters or {},
+            # approximate results differ by recall, never share them across fractions
+            "fraction_lists_to_search": fraction_lists_to_search,
+            # results from a replaced or stale snapshot are not reused
+            "snapshot": None if vectors is None else vectors.source_modified,
+            "mode": mode if hybrid else "vector",
+            "narrow": narrow and hybrid,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    cached = result_cache.get(query_embedding, top_k, scope)
+    if cached is not None:
+        cached.attrs.update(search_path="cache", bytes_processed=0)
+        return cached
+
+    generation = result_cache.generation
+    n_probe = 0
+    if vectors is not None and fraction_lists_to_search is not None:
+        n_probe = math.ceil(fraction_lists_to_search * vectors.n_lists)
+    if hybrid:
+        results = hybrid_search(
+            vectors,
+            lexical,
+            query,
+            query_embedding,
+            top_k,
+            narrow=narrow,
+            n_probe=n_probe,
+        )
+        results.attrs.update(
+            search_path="hybrid_narrow" if narrow else "hybrid", bytes_processed=0
+        )
+    elif vectors is not None and not filters:
+        results = vectors.search(query_embedding, top_k, n_probe=n_probe)
+        results.attrs.update(search_path="local_index", bytes_processed=0)
+    elif Config.EMBEDDING_STORAGE != "float64":
+        raise RuntimeError(
+            f"{Config.EMBEDDING_STORAGE} 向量儲存只能由本地向量索引查詢（不支援篩選），"
+            "請先執行 python -m agent.vector_index"
+        )
+    else:
+        results = search_bigquery(
+            query_embedding, top_k, fraction_lists_to_search, filters
+        )
+    result_cache.put(query_embedding, top_k, results, generation, scope)
+    return results
 
 
 def main():
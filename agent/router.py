@@ -0,0 +1,249 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.config import Config
+
+# model_factory(model_name, with_tools) -> object with generate_content
+ModelFactory = Callable[[str, bool], Any]
+# on_record(route, latency, success, escalated)
+RouteRecorder = Callable[[str, float, bool, bool], None]
+
+# finish reasons that mean the answer was cut off or withheld
+_INCOMPLETE_FINISH_REASONS = {"MAX_TOKENS", "SAFETY", "RECITATION", "OTHER"}
+
+
+def is_low_confidence(response: Any, min_avg_logprob: float = -1.0) -> bool:
+    """True for empty, truncated or blocked outputs, or very low average log-probs
+
+    Works on GenerationResponse objects and on fakes that only have .text.
+    """
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        try:
+            return not response.text
+        except (AttributeError, ValueError):
+            return True
+
+    candidate = candidates[0]
+    finish_reason = getattr(getattr(candidate, "finish_reason", None), "name", "")
+    if finish_reason in _INCOMPLETE_FINISH_REASONS:
+        return True
+    avg_logprobs = getattr(candidate, "avg_logprobs", None)
+    if avg_logprobs and avg_logprobs < min_avg_logprob:
+        return True
+    parts = getattr(getattr(candidate, "content", None), "parts", None) or []
+    return not any(
+        getattr(part, "function_call", None) or getattr(part, "text", "")
+        for part in parts
+    )
+
+
+class RouteStats:
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.calls = 0
+        self.failures = 0
+        self.escalations = 0
+        self.total_latency = 0.0
+        # exponentially weighted latency, None until the first call
+        self.latency_ewma: Optional[float] = None
+        # last call, or last time a request was sent to probe this tier
+        self.last_used = 0.0
+
+    def record(self, latency: float, success: bool, escalated: bool, alpha: float):
+        self.calls += 1
+        self.failures += 0 if success else 1
+        self.escalations += 1 if escalated else 0
+        self.total_latency += latency
+        self.last_used = time.time()
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += alpha * (latency - self.latency_ewma)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / self.calls if self.calls else 0.0,
+            "mean_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "latency_ewma": self.latency_ewma,
+        }
+
+
+class ModelRouter:
+    """Picks a model tier per request and escalates to larger tiers when needed
+
+    tiers are model names ordered from smallest/fastest to largest. Prompts up to
+    small_tool_tokens (tool routing) or small_text_tokens (plain generation)
+    start on the first tier, longer ones on the second; a latency budget steps
+    down to a tier whose observed latency fits and a cost budget caps the tier's
+    relative cost. A failed call or a low-confidence output moves one tier up.
+    A tier skipped for latency gets one probe request every probe_interval
+    seconds, so its latency estimate recovers once the tier is fast again.
+    """
+
+    def __init__(
+        self,
+        tiers: List[str],
+        model_factory: ModelFactory,
+        small_tool_tokens: int = 2000,
+        small_text_tokens: int = 300,
+        tier_costs: Optional[List[float]] = None,
+        low_confidence: Callable[[Any], bool] = is_low_confidence,
+        on_record: Optional[RouteRecorder] = None,
+        alpha: float = 0.2,
+        probe_interval: float = 30.0,
+    ):
+        if not tiers:
+            raise ValueError("至少需要一個模型層級")
+        self.tiers = tiers
+        self.model_factory = model_factory
+        self.small_tool_tokens = small_tool_tokens
+        self.small_text_tokens = small_text_tokens
+        if tier_costs and len(tier_costs) != len(tiers):
+            raise ValueError("模型層級與成本數量不一致")
+        self.tier_costs = tier_costs or [float(2**i) for i in range(len(tiers))]
+        self.low_confidence = low_confidence
+        self.on_record = on_record
+        self.alpha = alpha
+        self.probe_interval = probe_interval
+        self._models: Dict[Tuple[str, bool], Any] = {}
+        self._stats = {name: RouteStats(name) for name in tiers}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.escalated_requests = 0
+
+    def model(self, tier: int, with_tools: bool = False) -> Any:
+        key = (self.tiers[tier], with_tools)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self.model_factory(*key)
+            return self._models[key]
+
+    def choose(
+        self,
+        prompt_tokens: int,
+        needs_tools: bool = False,
+        latency_budget: Optional[float] = None,
+        cost_budget: Optional[float] = None,
+    ) -> int:
+        """tier index for a request"""
+        top = len(self.tiers) - 1
+        # picking a function is easy; writing an answer from context is not
+        small_limit = self.small_tool_tokens if needs_tools else self.small_text_tokens
+        if prompt_tokens <= small_limit:
+            tier = 0
+        else:
+            tier = min(1, top)
+
+        if cost_budget is not None:
+            while tier > 0 and self.tier_costs[tier] > cost_budget:
+                tier -= 1
+        if latency_budget:
+            now = time.time()
+            with self._lock:
+                while tier > 0:
+                    stats = self._stats[self.tiers[tier]]
+                    if (
+                        stats.latency_ewma is None
+                        or stats.latency_ewma <= latency_budget
+                    ):
+                        break
+                    if now - stats.last_used >= self.probe_interval:
+                        # claimed here so concurrent requests do not all probe
+                        stats.last_used = now
+                        break
+                    tier -= 1
+        return tier
+
+    def record(self, tier: int, latency: float, success: bool, escalated: bool):
+        name = self.tiers[tier]
+        with self._lock:
+            self._stats[name].record(latency, success, escalated, self.alpha)
+        if self.on_record is not None:
+            self.on_record(name, latency, success, escalated)
+
+    def generate(
+        self,
+        contents: Any,
+        prompt_tokens: int,
+        needs_tools: bool = False,
+        latency_budget: Optional[float] = None,
+        cost_budget: Optional[float] = None,
+        **kwargs,
+    ) -> Any:
+        """generate_content on the chosen tier, escalating on failure/low confidence"""
+        tier = self.choose(prompt_tokens, needs_tools, latency_budget, cost_budget)
+        top = len(self.tiers) - 1
+        escalated = False
+        try:
+            while True:
+                start_time = time.time()
+                try:
+                    response = self.model(tier, needs_tools).generate_content(
+                        contents, **kwargs
+                    )
+                except Exception:
+                    self.record(tier, time.time() - start_time, False, tier < top)
+                    if tier >= top:
+                        raise
+                    tier, escalated = tier + 1, True
+                    continue
+
+                weak = tier < top and self.low_confidence(response)
+                self.record(tier, time.time() - start_time, True, weak)
+                if not weak:
+                    return response
+                tier, escalated = tier + 1, True
+        finally:
+            with self._lock:
+                self.requests += 1
+                self.escalated_requests += 1 if escalated else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "escalated_requests": self.escalated_requests,
+                "escalation_rate": (
+                    self.escalated_requests / self.requests if self.requests else 0.0
+                ),
+                "routes": {
+                    name: stats.to_dict() for name, stats in self._stats.items()
+                },
+            }
+
+
+def parse_tiers(value: str) -> List[str]:
+    """comma separated model names, duplicates removed in order"""
+    tiers: List[str] = []
+    for name in value.split(","):
+        name = name.strip()
+        if name and name not in tiers:
+            tiers.append(name)
+    return tiers
+
+
+def budget(value: float) -> Optional[float]:
+    """Config budgets use 0 for no limit"""
+    return value if value > 0 else None
+
+
+def router_from_config(
+    model_factory: ModelFactory, on_record: Optional[RouteRecorder] = None
+) -> ModelRouter:
+    tier_costs = None
+    if Config.MODEL_TIER_COSTS:
+        tier_costs = [float(cost) for cost in Config.MODEL_TIER_COSTS.split(",")]
+    return ModelRouter(
+        parse_tiers(Config.MODEL_TIERS),
+        model_factory,
+        small_tool_tokens=Config.ROUTER_SMALL_TOOL_TOKENS,
+        small_text_tokens=Config.ROUTER_SMALL_TEXT_TOKENS,
+        tier_costs=tier_costs,
+        on_record=on_record,
+        probe_interval=Config.ROUTER_PROBE_INTERVAL,
+    )
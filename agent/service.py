@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+from config.config import Config
+
+
+def wait_result(future: Future, deadline: float) -> Any:
+    """future's result, waiting until deadline (a time.time() value) at most
+
+    Raises concurrent.futures.TimeoutError once the deadline passes. A call
+    still queued is cancelled; one already running cannot be interrupted, so
+    its thread finishes in the background and the result is discarded. Both
+    AsyncService.run and the tool calls of FunctionCaller time out this way.
+    """
+    try:
+        return future.result(timeout=max(0.0, deadline - time.time()))
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+
+
+class AsyncService:
+    """Runs blocking client calls off the event loop with per-dependency limits"""
+
+    def __init__(
+        self,
+        max_workers: int,
+        limits: Dict[str, int],
+        timeouts: Dict[str, float],
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="are-service"
+        )
+        self._limits = limits
+        self._timeouts = timeouts
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight: Dict[str, int] = {name: 0 for name in limits}
+        self.timeouts_count: Dict[str, int] = {name: 0 for name in limits}
+
+    def _semaphore(self, dependency: str) -> asyncio.Semaphore:
+        if dependency not in self._semaphores:
+            self._semaphores[dependency] = asyncio.Semaphore(
+                self._limits.get(dependency, 1)
+            )
+        return self._semaphores[dependency]
+
+    async def run(
+        self,
+        dependency: str,
+        func: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> Any:
+        """await func(*args, **kwargs) on the worker pool
+
+        Raises asyncio.TimeoutError when the dependency's deadline passes (see
+        wait_result); the call keeps its slot of the dependency's limit until
+        its worker thread is done.
+        """
+        if timeout is None:
+            timeout = self._timeouts.get(dependency) or None
+
+        semaphore = self._semaphore(dependency)
+        await semaphore.acquire()
+        self.in_flight[dependency] = self.in_flight.get(dependency, 0) + 1
+        loop = asyncio.get_running_loop()
+
+        def release():
+            self.in_flight[dependency] -= 1
+            semaphore.release()
+
+        def on_done(_):
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:
+                # the event loop is already closed (shutdown)
+                pass
+
+        try:
+            # worker threads do not inherit context variables (usage scope)
+            context = contextvars.copy_context()
+            work = self._executor.submit(context.run, func, *args, **kwargs)
+        except BaseException:
+            release()
+            raise
+        work.add_done_callback(on_done)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(work), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts_count[dependency] = self.timeouts_count.get(dependency, 0) + 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limits": dict(self._limits),
+            "in_flight": dict(self.in_flight),
+            "timeouts": dict(self.timeouts_count),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+service = AsyncService(
+    max_workers=Config.SERVICE_MAX_WORKERS,
+    limits={
+        "bigquery": Config.BIGQUERY_CONCURRENCY,
+        "vertex_ai": Config.VERTEX_CONCURRENCY,
+    },
+    timeouts={
+        "bigquery": Config.BIGQUERY_TIMEOUT,
+        "vertex_ai": Config.VERTEX_TIMEOUT,
+    },
+)
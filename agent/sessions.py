@@ -0,0 +1,238 @@
+import contextvars
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from vertexai.generative_models import Content, Part
+from agent.chunking import estimate_tokens
+
+# summarize(previous_summary, turns) -> new summary
+Summarizer = Callable[[str, List["Turn"]], str]
+
+
+class Turn(NamedTuple):
+    role: str  # "user" or "model"
+    text: str
+    tokens: int
+
+
+class ChatSession:
+    """One conversation: a running summary plus the most recent turns"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns: List[Turn] = []
+        self.compactions = 0
+        # set while a background compaction of this session is running
+        self.compacting = False
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.lock = threading.Lock()
+
+    @property
+    def tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.summary) + sum(
+            sys.getsizeof(turn.text) for turn in self.turns
+        )
+
+    def contents(self) -> List[Content]:
+        """history in Gemini chat form, the summary standing in for older turns"""
+        history = []
+        if self.summary:
+            history.append(
+                Content(
+                    role="user",
+                    parts=[Part.from_text(f"先前對話的摘要：\n{self.summary}")],
+                )
+            )
+            history.append(
+                Content(
+                    role="model", parts=[Part.from_text("好的，我會參考這份摘要。")]
+                )
+            )
+        for turn in self.turns:
+            history.append(Content(role=turn.role, parts=[Part.from_text(turn.text)]))
+        return history
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "turns": len(self.turns),
+            "tokens": self.tokens,
+            "summary_tokens": self.summary_tokens,
+            "bytes": self.nbytes,
+            "compactions": self.compactions,
+            "idle_seconds": time.time() - self.last_active,
+        }
+
+
+class SessionStore:
+    """In-memory LRU of chat sessions with idle eviction and a token budget
+
+    Once a session's history exceeds token_budget, every turn except the last
+    keep_turns is folded into the summary by summarize. With compaction_workers
+    > 0 that happens on a background pool after the exchange, without holding
+    session.lock during the summarize call; 0 compacts inline. on_compact(session)
+    is called after each compaction.
+    """
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        max_sessions: int = 1000,
+        idle_ttl: float = 1800.0,
+        token_budget: int = 4000,
+        keep_turns: int = 4,
+        compaction_workers: int = 1,
+        on_compact=None,
+    ):
+        self.summarize = summarize
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.on_compact = on_compact
+        self._executor = (
+            ThreadPoolExecutor(
+                max_workers=compaction_workers, thread_name_prefix="session-compact"
+            )
+            if compaction_workers > 0
+            else None
+        )
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lru_evictions = 0
+        self.idle_evictions = 0
+        self.compactions = 0
+        self.pending_compactions = 0
+
+    def _evict_idle(self, now: float):
+        # least recently used first, so expired sessions are all at the front
+        while self._sessions and self.idle_ttl > 0:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.idle_evictions += 1
+
+    def get(self, session_id: str, create: bool = True) -> Optional[ChatSession]:
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = ChatSession(session_id)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.lru_evictions += 1
+            self._sessions.move_to_end(session_id)
+            session.last_active = now
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def append(self, session: ChatSession, user_text: str, model_text: str):
+        """record one exchange and compact the session if it is over budget
+
+        Callers hold session.lock for the whole exchange.
+        """
+        session.turns.append(Turn("user", user_text, estimate_tokens(user_text)))
+        session.turns.append(Turn("model", model_text, estimate_tokens(model_text)))
+        session.last_active = time.time()
+        if (
+            session.compacting
+            or session.tokens <= self.token_budget
+            or len(session.turns) <= self.keep_turns
+        ):
+            return
+        if self._executor is None:
+            end = len(session.turns) - self.keep_turns
+            self._apply(session, self._summary(session, end), end)
+            return
+        session.compacting = True
+        with self._lock:
+            self.pending_compactions += 1
+        try:
+            # the summary's model usage is billed to the request's usage scope
+            context = contextvars.copy_context()
+            self._executor.submit(context.run, self._compact, session)
+        except RuntimeError:
+            # the pool is shut down; the session stays over budget for now
+            self._compact_done(session)
+
+    def _compact(self, session: ChatSession):
+        """background compaction, summarizing without holding session.lock
+
+        Only the turns snapshotted here are folded; exchanges appended while the
+        summary is generated stay in session.turns.
+        """
+        try:
+            with session.lock:
+                end = len(session.turns) - self.keep_turns
+            summary = self._summary(session, end)
+            with session.lock:
+                self._apply(session, summary, end)
+        finally:
+            self._compact_done(session)
+
+    def _compact_done(self, session: ChatSession):
+        session.compacting = False
+        with self._lock:
+            self.pending_compactions -= 1
+
+    def _summary(self, session: ChatSession, end: int) -> str:
+        # turns before end and the summary only change in _apply, never
+        # concurrently with a compaction of the same session
+        try:
+            return self.summarize(session.summary, session.turns[:end])
+        except Exception as e:
+            # without a summary the older turns are dropped rather than kept
+            print(f"[WARN] Session summary failed, dropping older turns: {e}")
+            return session.summary
+
+    def _apply(self, session: ChatSession, summary: str, end: int):
+        session.summary = summary
+        session.summary_tokens = estimate_tokens(summary) if summary else 0
+        session.turns = session.turns[end:]
+        session.compactions += 1
+        with self._lock:
+            self.compactions += 1
+        if self.on_compact is not None:
+            self.on_compact(session)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            counters = {
+                "lru_evictions": self.lru_evictions,
+                "idle_evictions": self.idle_evictions,
+                "compactions": self.compactions,
+                "pending_compactions": self.pending_compactions,
+            }
+        largest = sorted(sessions, key=lambda session: session.tokens, reverse=True)
+        return {
+            "sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "token_budget": self.token_budget,
+            "tokens": sum(session.tokens for session in sessions),
+            "bytes": sum(session.nbytes for session in sessions),
+            **counters,
+            "largest": [session.to_dict() for session in largest[:top]],
+        }
@@ -0,0 +1,80 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_POLICIES = ("none", "memoize", "ttl")
+
+
+def argument_key(parameters: Dict[str, Any]) -> str:
+    """hash of the canonical JSON form, so argument order and spacing don't matter"""
+    canonical = json.dumps(
+        parameters,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ToolResultCache:
+    """Bounded LRU cache of one tool's results, optionally expiring after ttl"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 0.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_policy(
+        cls, policy: Optional[Dict[str, Any]]
+    ) -> Optional["ToolResultCache"]:
+        """cache for a TOOLS "cache" entry, None when the tool opts out"""
+        policy = policy or {"policy": "none"}
+        name = policy.get("policy", "none")
+        if name not in CACHE_POLICIES:
+            raise ValueError(f"未知的快取策略: {name}")
+        if name == "none":
+            return None
+        ttl = float(policy.get("ttl", 0)) if name == "ttl" else 0.0
+        return cls(max_size=int(policy.get("max_size", 1024)), ttl=ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if not self.ttl or time.time() - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    # callers may mutate results, keep the cached copy pristine
+                    return copy.deepcopy(result)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,7 +1,10 @@
 import math
 import random
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+from config.config import Config
+from agent.math_eval import evaluate, evaluate_many
+from agent.tool_cache import ToolResultCache, argument_key
 
 
 def get_weather(city: str, country: str = "Taiwan") -> Dict[str, Any]:
@@ -23,11 +26,7 @@ def get_weather(city: str, country: str = "Taiwan") -> Dict[str, Any]:
 
 def do_math(expression: str) -> Dict[str, Any]:
     try:
-        allowed_chars = set("0123456789+-*/.() ")
-        if not all(c in allowed_chars for c in expression):
-            raise ValueError("表達式包含不允許的字符")
-
-        result = eval(expression)
+        result = evaluate(expression)
 
         return {
             "expression": expression,
@@ -44,6 +43,15 @@ def do_math(expression: str) -> Dict[str, Any]:
         }
 
 
+def do_math_batch(expressions: List[str]) -> Dict[str, Any]:
+    # the call succeeds as a whole, failed expressions carry their own error
+    return {
+        "results": evaluate_many(list(expressions)),
+        "success": True,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
 def get_current_time(timezone: str = "Asia/Taipei") -> Dict[str, Any]:
     now = datetime.now()
 
@@ -83,9 +91,44 @@ def calculate_distance(point1: List[float], point2: List[float]) -> Dict[str, An
         }
 
 
+def format_weather(result: Dict[str, Any]) -> str:
+    return (
+        f"{result.get('city', '')}的天氣是{result.get('condition', '')}，"
+        f"溫度{result.get('temperature', '')}"
+    )
+
+
+def format_math(result: Dict[str, Any]) -> str:
+    return f"{result.get('expression', '')} = {result.get('result', '')}"
+
+
+def format_math_batch(result: Dict[str, Any]) -> str:
+    return "\n".join(
+        f"{item['expression']} = {item.get('result', item.get('error'))}"
+        for item in result.get("results", [])
+    )
+
+
+def format_time(result: Dict[str, Any]) -> str:
+    return (
+        f"今天是{result.get('date', '')} {result.get('day_of_week', '')}，"
+        f"現在時間是{result.get('time', '')}"
+    )
+
+
+def format_distance(result: Dict[str, Any]) -> str:
+    return (
+        f"點{result.get('point1', [])}到點{result.get('point2', [])}"
+        f"的距離是{result.get('distance', 0)}"
+    )
+
+
 TOOLS = {
     "get_weather": {
         "function": get_weather,
+        "timeout": 5.0,
+        "cache": {"policy": "ttl", "ttl": 60, "max_size": 256},
+        "formatter": format_weather,
         "description": "獲取指定城市的天氣資訊",
         "parameters": {
             "type": "object",
@@ -98,6 +141,9 @@ TOOLS = {
     },
     "do_math": {
         "function": do_math,
+        "timeout": 2.0,
+        "cache": {"policy": "memoize", "max_size": 1024},
+        "formatter": format_math,
         "description": "執行數學運算",
         "parameters": {
             "type": "object",
@@ -107,8 +153,29 @@ TOOLS = {
             "required": ["expression"],
         },
     },
+    "do_math_batch": {
+        "function": do_math_batch,
+        "timeout": 5.0,
+        "cache": {"policy": "memoize", "max_size": 256},
+        "formatter": format_math_batch,
+        "description": "一次執行多個數學運算",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "expressions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "數學表達式列表",
+                }
+            },
+            "required": ["expressions"],
+        },
+    },
     "get_current_time": {
         "function": get_current_time,
+        "timeout": 1.0,
+        "cache": {"policy": "none"},
+        "formatter": format_time,
         "description": "獲取當前時間",
         "parameters": {
             "type": "object",
@@ -120,6 +187,9 @@ TOOLS = {
     },
     "calculate_distance": {
         "function": calculate_distance,
+        "timeout": 1.0,
+        "cache": {"policy": "memoize", "max_size": 1024},
+        "formatter": format_distance,
         "description": "計算兩點之間的距離",
         "parameters": {
             "type": "object",
@@ -141,6 +211,15 @@ TOOLS = {
 }
 
 
+# built from each TOOLS entry's "cache" policy: none (default), memoize for
+# pure functions, or ttl for results that go stale
+_caches: Dict[str, ToolResultCache] = {}
+for _name, _tool in TOOLS.items():
+    _cache = ToolResultCache.from_policy(_tool.get("cache"))
+    if _cache is not None:
+        _caches[_name] = _cache
+
+
 def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
     if tool_name not in TOOLS:
         return {
@@ -149,9 +228,27 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
             "timestamp": datetime.now().isoformat(),
         }
 
+    cache = _caches.get(tool_name)
+    key = argument_key(parameters) if cache is not None else None
+    # memoized results are stored without their call time and stamped on every
+    # return; ttl results keep the time they were observed at
+    memoized = cache is not None and not cache.ttl
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            if memoized:
+                cached["timestamp"] = datetime.now().isoformat()
+            return cached
+
     try:
         tool_func = TOOLS[tool_name]["function"]
         result = tool_func(**parameters)
+        # failures are not cached so transient errors are retried
+        if cache is not None and result.get("success", True):
+            if memoized:
+                cache.put(key, {k: v for k, v in result.items() if k != "timestamp"})
+            else:
+                cache.put(key, result)
         return result
     except Exception as e:
         return {
@@ -161,6 +258,24 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+def get_tool_timeout(tool_name: str) -> float:
+    """deadline in seconds for one call of tool_name"""
+    return TOOLS.get(tool_name, {}).get("timeout", Config.TOOL_DEFAULT_TIMEOUT)
+
+
+def format_tool_result(tool_name: str, result: Dict[str, Any]) -> Optional[str]:
+    """one-line summary from the tool's registered formatter, None without one"""
+    formatter = TOOLS.get(tool_name, {}).get("formatter")
+    if formatter is None:
+        return None
+    return formatter(result)
+
+
+def get_tool_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """hit/miss counters of every cached tool"""
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
 def get_available_tools() -> List[Dict[str, Any]]:
     return [
         {
@@ -0,0 +1,228 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+from config.config import Config
+
+# (endpoint, user_id) the current request is billed to
+_scope: ContextVar[Tuple[str, str]] = ContextVar(
+    "usage_scope", default=("unknown", "anonymous")
+)
+COUNTERS = (
+    "calls",
+    "prompt_tokens",
+    "output_tokens",
+    "cached_tokens",
+    "characters",
+    "cost_usd",
+)
+
+
+def set_usage_scope(endpoint: str, user_id: Optional[str] = None):
+    """attribute usage in the current context (one request task) to endpoint/user
+
+    FastAPI runs each request in its own task, so the value does not leak
+    between requests; service.run copies it onto the worker thread.
+    """
+    _scope.set((endpoint, user_id or "anonymous"))
+
+
+@contextmanager
+def usage_scope(endpoint: str, user_id: Optional[str] = None) -> Iterator[None]:
+    token = _scope.set((endpoint, user_id or "anonymous"))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def parse_prices(value: str) -> Dict[str, Tuple[float, float, float]]:
+    """prices from model=input/output/cached,... in USD per 1M tokens"""
+    prices = {}
+    for entry in value.split(","):
+        if "=" not in entry:
+            continue
+        model_name, rates = entry.split("=", 1)
+        parts = [float(rate) for rate in rates.split("/")]
+        # cached input defaults to the full input price
+        parts += [parts[0]] * (3 - len(parts))
+        prices[model_name.strip()] = (parts[0], parts[1], parts[2])
+    return prices
+
+
+def usage_counts(usage_metadata: Any) -> Tuple[int, int, int]:
+    """(prompt, output, cached) tokens from a Gemini usage_metadata
+
+    Thinking tokens are billed as output, so they are counted with it.
+    """
+    prompt = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    output = (getattr(usage_metadata, "candidates_token_count", 0) or 0) + (
+        getattr(usage_metadata, "thoughts_token_count", 0) or 0
+    )
+    cached = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+    return prompt, output, cached
+
+
+def _empty() -> Dict[str, float]:
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def _add(totals: Dict[str, float], record: Dict[str, Any]):
+    totals["calls"] += 1
+    for name in COUNTERS[1:]:
+        totals[name] += record[name]
+
+
+class UsageTracker:
+    """Token, character and cost totals per endpoint, model and user
+
+    Keeps lifetime totals plus bucket_seconds buckets covering the last
+    window_seconds for rolling totals. on_record(record) receives every call
+    for export to monitoring and logs.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[Dict[str, Tuple[float, float, float]]] = None,
+        embed_price_per_m_chars: float = 0.0,
+        window_seconds: float = 3600.0,
+        bucket_seconds: float = 60.0,
+        on_record: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.prices = prices or {}
+        self.embed_price_per_m_chars = embed_price_per_m_chars
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.on_record = on_record
+        # (bucket start, {(endpoint, model, user): counters}), oldest first
+        self._buckets: Deque[Tuple[float, Dict[Tuple[str, str, str], Dict]]] = deque()
+        self._totals = _empty()
+        self._lock = threading.Lock()
+
+    def cost(
+        self,
+        model_name: str,
+        prompt_tokens: int,
+        output_tokens: int,
+        cached_tokens: int,
+    ) -> float:
+        if model_name not in self.prices:
+            return 0.0
+        input_rate, output_rate, cached_rate = self.prices[model_name]
+        # cached tokens are part of the prompt count but billed at the cached rate
+        return (
+            (prompt_tokens - cached_tokens) * input_rate
+            + cached_tokens * cached_rate
+            + output_tokens * output_rate
+        ) / 1e6
+
+    def record_generation(self, model_name: str, usage_metadata: Any):
+        prompt, output, cached = usage_counts(usage_metadata)
+        self._record(
+            "generate",
+            model_name,
+            prompt,
+            output,
+            cached,
+            0,
+            self.cost(model_name, prompt, output, cached),
+        )
+
+    def record_embedding(
+        self,
+        model_name: str,
+        characters: int,
+        tokens: int = 0,
+        endpoint: Optional[str] = None,
+    ):
+        cost = characters * self.embed_price_per_m_chars / 1e6
+        self._record("embed", model_name, tokens, 0, 0, characters, cost, endpoint)
+
+    def _record(
+        self,
+        kind: str,
+        model_name: str,
+        prompt_tokens: int,
+        output_tokens: int,
+        cached_tokens: int,
+        characters: int,
+        cost: float,
+        endpoint: Optional[str] = None,
+    ):
+        scope_endpoint, user_id = _scope.get()
+        record = {
+            "kind": kind,
+            "endpoint": endpoint or scope_endpoint,
+            "model": model_name,
+            "user_id": user_id,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens,
+            "characters": characters,
+            "cost_usd": cost,
+        }
+        key = (record["endpoint"], model_name, user_id)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            start = now - now % self.bucket_seconds
+            if not self._buckets or self._buckets[-1][0] != start:
+                self._buckets.append((start, {}))
+            bucket = self._buckets[-1][1]
+            if key not in bucket:
+                bucket[key] = _empty()
+            _add(bucket[key], record)
+            _add(self._totals, record)
+        if self.on_record is not None:
+            try:
+                self.on_record(record)
+            except Exception as e:
+                print(f"[WARN] Failed to export usage: {e}")
+
+    def _expire(self, now: float):
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        """rolling totals by endpoint, model and user (top users by cost)"""
+        with self._lock:
+            self._expire(time.time())
+            entries = [
+                (key, dict(counters))
+                for _, bucket in self._buckets
+                for key, counters in bucket.items()
+            ]
+            lifetime = dict(self._totals)
+
+        window = _empty()
+        dimensions = {"by_endpoint": {}, "by_model": {}, "by_user": {}}
+        for key, counters in entries:
+            for name in COUNTERS:
+                window[name] += counters[name]
+            for dimension, value in zip(dimensions.values(), key):
+                totals = dimension.setdefault(value, _empty())
+                for name in COUNTERS:
+                    totals[name] += counters[name]
+        users = sorted(
+            dimensions["by_user"].items(),
+            key=lambda item: item[1]["cost_usd"],
+            reverse=True,
+        )
+        dimensions["by_user"] = dict(users[:top])
+        return {
+            "window_seconds": self.window_seconds,
+            "window": window,
+            **dimensions,
+            "users": len(users),
+            "lifetime": lifetime,
+        }
+
+
+usage_tracker = UsageTracker(
+    prices=parse_prices(Config.MODEL_PRICES),
+    embed_price_per_m_chars=Config.EMBED_PRICE_PER_M_CHARS,
+    window_seconds=Config.USAGE_WINDOW_SECONDS,
+    bucket_seconds=Config.USAGE_BUCKET_SECONDS,
+)
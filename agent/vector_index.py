@@ -0,0 +1,316 @@
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from config.config import Config
+from agent.lexical_index import BM25Index
+from agent.quantization import decode_embeddings, int8_dot, quantize_int8
+
+# chunk position columns let the context packer merge overlapping neighbours
+ROW_COLUMNS = ["doc_id", "title", "content", "chunk_index", "char_start", "char_end"]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """IVF-flat cosine index over a contiguous float32 or int8 matrix"""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: pd.DataFrame,
+        scales: Optional[np.ndarray] = None,
+        source_modified: Optional[float] = None,
+    ):
+        # vectors are grouped by list so that each list is one contiguous slice;
+        # with scales they are int8 codes scored directly in compact form
+        if scales is None:
+            self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            self.scales = None
+        else:
+            self.vectors = np.ascontiguousarray(vectors, dtype=np.int8)
+            self.scales = np.ascontiguousarray(scales, dtype=np.float32)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.offsets = offsets
+        self.rows = rows.reset_index(drop=True)
+        # last modification time of the documents table the rows were read at
+        self.source_modified = source_modified
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dtype(self) -> str:
+        return "float32" if self.scales is None else "int8"
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        rows: pd.DataFrame,
+        n_lists: int = 0,
+        iterations: int = 10,
+        seed: int = 0,
+        dtype: str = "float32",
+    ) -> "VectorIndex":
+        """cluster embeddings with spherical k-means and lay them out per list"""
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        n = vectors.shape[0]
+        if n == 0:
+            raise ValueError("無法以空資料建立向量索引")
+        if n_lists <= 0:
+            n_lists = max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, size=n_lists, replace=False)].copy()
+        assignments = np.zeros(n, dtype=np.int64)
+        for _ in range(iterations):
+            assignments = cls._assign(vectors, centroids)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignments = cls._assign(vectors, centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        if dtype == "int8":
+            codes, scales = quantize_int8(vectors[order])
+            return cls(codes, centroids, offsets, rows.iloc[order], scales)
+        return cls(vectors[order], centroids, offsets, rows.iloc[order])
+
+    @staticmethod
+    def _assign(
+        vectors: np.ndarray, centroids: np.ndarray, block: int = 8192
+    ) -> np.ndarray:
+        assignments = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], block):
+            scores = vectors[start : start + block] @ centroids.T
+            assignments[start : start + block] = scores.argmax(axis=1)
+        return assignments
+
+    def search_positions(
+        self, query_embedding: List[float], top_k: int, n_probe: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """return (positions, cosine distances) of the approximate top_k"""
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        n_probe = n_probe or Config.VECTOR_INDEX_PROBES
+        n_probe = min(max(n_probe, 1), self.n_lists)
+
+        if n_probe >= self.n_lists:
+            candidates = np.arange(len(self))
+        else:
+            centroid_scores = self.centroids @ query
+            probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+            candidates = np.concatenate(
+                [
+                    np.arange(self.offsets[list_id], self.offsets[list_id + 1])
+                    for list_id in probed
+                ]
+            )
+
+        if self.scales is None:
+            scores = self.vectors[candidates] @ query
+        else:
+            scores = int8_dot(self.vectors[candidates], self.scales[candidates], query)
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return candidates[best], 1.0 - scores[best]
+
+    def distances(
+        self, query_embedding: List[float], positions: np.ndarray
+    ) -> np.ndarray:
+        """exact cosine distances for the given positions only"""
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        if self.scales is None:
+            scores = self.vectors[positions] @ query
+        else:
+            scores = int8_dot(self.vectors[positions], self.scales[positions], query)
+        return 1.0 - scores
+
+    def search(
+        self, query_embedding: List[float], top_k: int, n_probe: int = 0
+    ) -> pd.DataFrame:
+        """return rows shaped like the BigQuery retrieval result"""
+        positions, distances = self.search_positions(query_embedding, top_k, n_probe)
+        result = self.rows.iloc[positions].reset_index(drop=True)
+        result["distance"] = distances.astype(np.float64)
+        return result
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "vectors": self.vectors,
+            "centroids": self.centroids,
+            "offsets": self.offsets,
+        }
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        if self.source_modified is not None:
+            arrays["source_modified"] = np.array([self.source_modified])
+        np.savez(os.path.join(directory, "vectors.npz"), **arrays)
+        self.rows.to_parquet(os.path.join(directory, "rows.parquet"), index=False)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["VectorIndex"]:
+        vectors_path = os.path.join(directory, "vectors.npz")
+        rows_path = os.path.join(directory, "rows.parquet")
+        if not (os.path.exists(vectors_path) and os.path.exists(rows_path)):
+            return None
+
+        arrays = np.load(vectors_path)
+        return cls(
+            arrays["vectors"],
+            arrays["centroids"],
+            arrays["offsets"],
+            pd.read_parquet(rows_path),
+            arrays["scales"] if "scales" in arrays.files else None,
+            (
+                float(arrays["source_modified"][0])
+                if "source_modified" in arrays.files
+                else None
+            ),
+        )
+
+
+def table_modified(bq) -> float:
+    """last modification time of the documents table (loads, DML) as a timestamp"""
+    return bq.get_table(Config.get_bigquery_table()).modified.timestamp()
+
+
+class TableModifiedCheck:
+    """Cached table_modified, read at most once per ttl seconds"""
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._checked_at = 0.0
+        self._modified: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self, bq) -> Optional[float]:
+        # one caller refreshes outside the lock, the others keep the cached value
+        with self._lock:
+            if self._refreshing or time.time() - self._checked_at <= self.ttl:
+                return self._modified
+            self._refreshing = True
+        try:
+            modified = table_modified(bq)
+        except Exception as e:
+            print(f"[WARN] Failed to read documents table metadata: {e}")
+            modified = None
+        with self._lock:
+            self._modified = modified
+            self._checked_at = time.time()
+            self._refreshing = False
+        return modified
+
+    def is_current(self, bq, index: "VectorIndex") -> bool:
+        """True when the table has not changed since index was built from it"""
+        modified = self.get(bq)
+        return (
+            modified is not None
+            and index.source_modified is not None
+            and modified <= index.source_modified
+        )
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+
+def load_documents(bq, storage: str = Config.EMBEDDING_STORAGE) -> pd.DataFrame:
+    if storage == "float64":
+        embedding_columns = "embedding"
+    else:
+        embedding_columns = "embedding_q, embedding_scale"
+    sql = f"""
+    SELECT {", ".join(ROW_COLUMNS)}, {embedding_columns}
+    FROM `{Config.get_bigquery_table()}`
+    WHERE deleted IS NOT TRUE
+    """
+    return bq.query(sql).result().to_dataframe()
+
+
+def document_embeddings(
+    data: pd.DataFrame, storage: str = Config.EMBEDDING_STORAGE
+) -> np.ndarray:
+    """float32 matrix of the embeddings returned by load_documents"""
+    if storage == "float64":
+        return np.array(data["embedding"].tolist(), dtype=np.float32)
+    return decode_embeddings(
+        data["embedding_q"].tolist(), data["embedding_scale"].tolist(), storage
+    )
+
+
+def build_from_bigquery(
+    bq, n_lists: int = 0, dtype: str = Config.VECTOR_INDEX_DTYPE
+) -> VectorIndex:
+    """build an index from the documents table"""
+    # read first, so a write landing during the load marks the index as stale
+    modified = table_modified(bq)
+    data = load_documents(bq)
+    index = VectorIndex.build(
+        document_embeddings(data), data[ROW_COLUMNS], n_lists=n_lists, dtype=dtype
+    )
+    index.source_modified = modified
+    return index
+
+
+def build_lexical_index(index: VectorIndex) -> BM25Index:
+    """BM25 index over the vector index's rows"""
+    # built from the index's own row order so positions are shared between them
+    return BM25Index.build(index.rows["content"].tolist())
+
+
+def build_local_indexes(
+    bq, directory: str = Config.VECTOR_INDEX_DIR
+) -> Tuple[VectorIndex, BM25Index]:
+    """build the vector and BM25 indexes over the same rows and save them together"""
+    start_time = time.time()
+    index = build_from_bigquery(bq, n_lists=Config.VECTOR_INDEX_LISTS)
+    index.save(directory)
+    print(
+        f"[INFO] Vector index built - {len(index)} {index.dtype} vectors "
+        f"({index.nbytes / 1e6:.1f} MB), {index.n_lists} lists, "
+        f"{time.time() - start_time:.2f}s"
+    )
+
+    start_time = time.time()
+    lexical = build_lexical_index(index)
+    lexical.save(directory)
+    print(
+        f"[INFO] Lexical index built - {len(lexical.vocabulary)} terms, "
+        f"{len(lexical.postings)} postings, {time.time() - start_time:.2f}s"
+    )
+    return index, lexical
+
+
+def main():
+    from agent.retriever import bq
+
+    build_local_indexes(bq)
+
+
+if __name__ == "__main__":
+    main()
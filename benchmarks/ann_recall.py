@@ -0,0 +1,72 @@
+"""Recall@k and latency of the in-process vector index against exact BigQuery search.
+
+Usage: python -m benchmarks.ann_recall [--queries 50] [--top-k 10] [--probes 8]
+"""
+
+import argparse
+import time
+import numpy as np
+from agent.bigquery_search import exact_search
+from agent.retriever import bq
+from agent.vector_index import (
+    ROW_COLUMNS,
+    VectorIndex,
+    document_embeddings,
+    load_documents,
+)
+from config.config import Config
+
+
+def _keys(df) -> set:
+    return set(zip(df["doc_id"].astype(str), df["content"]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--probes", type=int, default=Config.VECTOR_INDEX_PROBES)
+    args = parser.parse_args()
+
+    data = load_documents(bq)
+    embeddings = document_embeddings(data)
+    index = VectorIndex.build(
+        embeddings,
+        data[ROW_COLUMNS],
+        n_lists=Config.VECTOR_INDEX_LISTS,
+        dtype=Config.VECTOR_INDEX_DTYPE,
+    )
+
+    # stored chunk embeddings stand in for query embeddings
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(data), size=min(args.queries, len(data)), replace=False)
+
+    recalls, ann_ms, exact_ms = [], [], []
+    for position in sample:
+        query_embedding = embeddings[position].tolist()
+
+        start_time = time.perf_counter()
+        approximate = index.search(query_embedding, args.top_k, n_probe=args.probes)
+        ann_ms.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        exact = exact_search(bq, query_embedding, args.top_k)
+        exact_ms.append((time.perf_counter() - start_time) * 1000)
+
+        expected = _keys(exact)
+        recalls.append(len(_keys(approximate) & expected) / max(len(expected), 1))
+
+    print(f"vectors: {len(index)}, lists: {index.n_lists}, probes: {args.probes}")
+    print(f"recall@{args.top_k}: {np.mean(recalls):.4f}")
+    print(
+        f"ann latency p50/p95: {np.percentile(ann_ms, 50):.2f} / "
+        f"{np.percentile(ann_ms, 95):.2f} ms"
+    )
+    print(
+        f"bigquery latency p50/p95: {np.percentile(exact_ms, 50):.2f} / "
+        f"{np.percentile(exact_ms, 95):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
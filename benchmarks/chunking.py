@@ -0,0 +1,73 @@
+"""Chunking throughput on a synthetic StackOverflow-like HTML corpus.
+
+Usage: python -m benchmarks.chunking [--docs 20000] [--max-tokens 512]
+"""
+
+import argparse
+import random
+import time
+from agent.chunking import chunk_document, estimate_tokens, strip_markup
+from config.config import Config
+
+WORDS = (
+    "python list dict decorator function class import module error exception "
+    "return value loop iterator generator async await pandas numpy dataframe "
+    "index column string format file path open read write test assert"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 24))
+    return " ".join(words).capitalize() + rng.choice([".", "?", "!"])
+
+
+def _document(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 12)):
+        if rng.random() < 0.3:
+            lines = [
+                f"    {rng.choice(WORDS)} = {rng.choice(WORDS)}({i})"
+                for i in range(rng.randint(2, 20))
+            ]
+            code = "\n".join(["def example():"] + lines)
+            parts.append(f"<pre><code>{code}\n</code></pre>")
+        else:
+            sentences = " ".join(_sentence(rng) for _ in range(rng.randint(1, 8)))
+            parts.append(f"<p>{sentences} <code>{rng.choice(WORDS)}()</code></p>")
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--max-tokens", type=int, default=Config.CHUNK_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=Config.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = [_document(rng) for _ in range(args.docs)]
+    raw_chars = sum(len(doc) for doc in corpus)
+
+    start_time = time.perf_counter()
+    chunks = [chunk_document(doc, args.max_tokens, args.overlap) for doc in corpus]
+    elapsed = time.perf_counter() - start_time
+
+    chunk_count = sum(len(doc_chunks) for doc_chunks in chunks)
+    chunk_tokens = sum(chunk.tokens for doc_chunks in chunks for chunk in doc_chunks)
+    clean_tokens = sum(estimate_tokens(strip_markup(doc)) for doc in corpus)
+    raw_tokens = sum(estimate_tokens(doc) for doc in corpus)
+
+    print(f"documents: {args.docs}, raw size: {raw_chars / 1e6:.1f} MB")
+    print(
+        f"throughput: {args.docs / elapsed:.0f} docs/s, "
+        f"{raw_chars / elapsed / 1e6:.2f} MB/s"
+    )
+    print(f"chunks: {chunk_count} ({chunk_count / args.docs:.2f} per document)")
+    print(
+        f"tokens: raw {raw_tokens}, stripped {clean_tokens}, "
+        f"embedded {chunk_tokens} (overlap {chunk_tokens - clean_tokens})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Prompt tokens of the naive "\\n\\n" join vs. the packed answer context.
+
+Chunks synthetic posts with the real chunker (so neighbours overlap), retrieves
+runs of adjacent chunks plus near-duplicate copies from other posts, and
+compares the context sizes and packing time.
+
+Usage: python -m benchmarks.context [--queries 200] [--top-k 10] [--budget 2048]
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from agent.chunking import chunk_document
+from agent.context import pack_context
+
+WORDS = (
+    "decorator function wrapper closure argument return value call stack frame "
+    "generator iterator yield context manager exception class instance method"
+).split()
+
+
+def _post(rng, sentences: int) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS, size=rng.integers(8, 20))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def _retrieved(rng, top_k: int, max_tokens: int, overlap: int) -> pd.DataFrame:
+    text = _post(rng, 120)
+    chunks = chunk_document(text, max_tokens, overlap, html=False)
+    first = rng.integers(0, max(len(chunks) - top_k // 2, 1))
+    rows = [
+        {
+            "doc_id": "post",
+            "title": "",
+            "content": chunk.text,
+            "chunk_index": first + i,
+            "char_start": chunk.start,
+            "char_end": chunk.end,
+        }
+        for i, chunk in enumerate(chunks[first : first + top_k // 2])
+    ]
+    # near-identical answers copied into other posts
+    for i, row in enumerate(list(rows)[: top_k - len(rows)]):
+        rows.append(
+            dict(
+                row,
+                doc_id=f"copy{i}",
+                chunk_index=0,
+                content=row["content"] + " Thanks!",
+            )
+        )
+    data = pd.DataFrame(rows)
+    data["distance"] = np.sort(rng.uniform(0.1, 0.5, len(data)))
+    return data.sample(frac=1, random_state=int(rng.integers(1 << 31)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--chunk-tokens", type=int, default=128)
+    parser.add_argument("--overlap-tokens", type=int, default=48)
+    parser.add_argument("--budget", type=int, default=2048)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    naive, packed, elapsed = [], [], []
+    for _ in range(args.queries):
+        docs = _retrieved(rng, args.top_k, args.chunk_tokens, args.overlap_tokens)
+        start = time.perf_counter()
+        _, stats = pack_context(docs, max_tokens=args.budget)
+        elapsed.append(time.perf_counter() - start)
+        naive.append(stats["naive_tokens"])
+        packed.append(stats["context_tokens"])
+
+    naive, packed = np.array(naive), np.array(packed)
+    print(f"queries: {args.queries}, top_k={args.top_k}, budget={args.budget}")
+    print(f"  naive join     mean tokens={naive.mean():.0f}")
+    print(
+        f"  packed context mean tokens={packed.mean():.0f} "
+        f"({1 - packed.sum() / naive.sum():.1%} saved), "
+        f"p50 pack time={np.percentile(elapsed, 50) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Recall and latency of vector, lexical and hybrid retrieval on exact-term queries.
+
+Builds a synthetic corpus where every document mentions a unique error code and
+API name on top of a topic shared with its cluster. Queries ask for one code:
+the query embedding only knows the topic (as a real embedding model blurs rare
+identifiers), so vector search alone finds the cluster but not the document.
+
+Usage: python -m benchmarks.hybrid [--documents 50000] [--queries 500] [--top-k 5]
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from agent.hybrid import hybrid_search
+from agent.lexical_index import BM25Index
+from agent.vector_index import VectorIndex
+
+WORDS = (
+    "python error exception traceback module import function class list dict "
+    "string value file path install version loop thread request response"
+).split()
+
+
+def _corpus(documents: int, dimensions: int, rng):
+    topics = max(documents // 200, 1)
+    centers = rng.normal(size=(topics, dimensions))
+    labels = rng.integers(0, topics, documents)
+    embeddings = centers[labels] + 0.5 * rng.normal(size=(documents, dimensions))
+    texts = [
+        " ".join(rng.choice(WORDS, size=40))
+        + f" raised E{i:06d} in pkg{labels[i]}.mod.call_{i}()"
+        for i in range(documents)
+    ]
+    rows = pd.DataFrame(
+        {"doc_id": [str(i) for i in range(documents)], "title": "", "content": texts}
+    )
+    return centers, labels, embeddings, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers, labels, embeddings, rows = _corpus(args.documents, args.dimensions, rng)
+
+    start = time.perf_counter()
+    vector_index = VectorIndex.build(embeddings, rows)
+    vector_build = time.perf_counter() - start
+    # the vector index reorders rows; lexical positions must follow that order
+    start = time.perf_counter()
+    lexical_index = BM25Index.build(vector_index.rows["content"].tolist())
+    lexical_build = time.perf_counter() - start
+    lexical_bytes = sum(
+        array.nbytes
+        for array in (
+            lexical_index.offsets,
+            lexical_index.postings,
+            lexical_index.frequencies,
+        )
+    )
+
+    modes = {
+        "vector": lambda q, e: vector_index.search(e, args.top_k),
+        "lexical": lambda q, e: vector_index.rows.iloc[
+            lexical_index.search(q, args.top_k)[0]
+        ],
+        "hybrid": lambda q, e: hybrid_search(
+            vector_index, lexical_index, q, e, args.top_k, args.candidates
+        ),
+        "hybrid_narrow": lambda q, e: hybrid_search(
+            vector_index, lexical_index, q, e, args.top_k, args.candidates, True
+        ),
+    }
+    hits = {name: 0 for name in modes}
+    latencies = {name: [] for name in modes}
+    targets = rng.choice(args.documents, size=args.queries, replace=False)
+    for target in targets:
+        query = f"how to fix E{target:06d} error"
+        embedding = centers[labels[target]] + 0.5 * rng.normal(size=args.dimensions)
+        for name, search in modes.items():
+            start = time.perf_counter()
+            results = search(query, embedding)
+            latencies[name].append(time.perf_counter() - start)
+            hits[name] += str(target) in set(results["doc_id"])
+
+    print(
+        f"documents: {args.documents}, vector build {vector_build:.2f}s, "
+        f"lexical build {lexical_build:.2f}s "
+        f"({len(lexical_index.vocabulary)} terms, {lexical_bytes / 1e6:.1f} MB)"
+    )
+    for name in modes:
+        latency = np.array(latencies[name]) * 1000
+        print(
+            f"  {name:<14} recall@{args.top_k}={hits[name] / args.queries:.3f}  "
+            f"p50={np.percentile(latency, 50):.2f}ms  "
+            f"p95={np.percentile(latency, 95):.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
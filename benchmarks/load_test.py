@@ -0,0 +1,76 @@
+"""Throughput of a running API at increasing client concurrency.
+
+Usage: python -m benchmarks.load_test [--url http://localhost:8000] [--requests 64]
+"""
+
+import argparse
+import asyncio
+import time
+import httpx
+
+QUERIES = [
+    "什麼是 Python Decorator?",
+    "How do I merge two dictionaries in Python?",
+    "Why does my list comprehension raise NameError?",
+    "How to read a CSV file with pandas?",
+]
+
+
+async def _run_level(
+    client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def _one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start_time = time.perf_counter()
+            if endpoint == "/query":
+                payload = {"query": QUERIES[i % len(QUERIES)], "top_k": 5}
+            else:
+                payload = {"message": f"請計算 {i} * 3 + 1"}
+            response = await client.post(endpoint, json=payload)
+            latencies.append(time.perf_counter() - start_time)
+            if response.status_code != 200:
+                errors += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*[_one(i) for i in range(total)])
+    elapsed = time.perf_counter() - start_time
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def _main(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        for concurrency in args.levels:
+            stats = await _run_level(client, args.endpoint, concurrency, args.requests)
+            print(
+                f"concurrency={stats['concurrency']:>3}  "
+                f"throughput={stats['throughput_rps']:.2f} req/s  "
+                f"p50={stats['p50_ms']:.0f} ms  p95={stats['p95_ms']:.0f} ms  "
+                f"errors={stats['errors']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--endpoint", default="/query", choices=["/query", "/tools/chat"]
+    )
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
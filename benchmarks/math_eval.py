@@ -0,0 +1,88 @@
+"""Throughput of the bounded math evaluator vs. the previous filter + eval path.
+
+Times random arithmetic expressions through eval, the evaluator with a cold
+compile cache and with a warm one, then the batch form. Pathological inputs are
+only sent to the evaluator (eval would not return for 9**9**9). Keep
+--expressions within MATH_CACHE_SIZE, or the cached pass measures misses.
+
+Usage: python -m benchmarks.math_eval [--expressions 1000] [--repeat 5]
+"""
+
+import argparse
+import time
+import numpy as np
+from agent.math_eval import MathError, compile_expression, evaluate, evaluate_many
+
+ALLOWED_CHARS = set("0123456789+-*/.() ")
+PATHOLOGICAL = [
+    "9**9**9",
+    "2**99999999",
+    "(" * 5000 + "1" + ")" * 5000,
+    "-" * 5000 + "1",
+]
+
+
+def _eval_path(expression: str):
+    if not all(c in ALLOWED_CHARS for c in expression):
+        raise ValueError("表達式包含不允許的字符")
+    return eval(expression)
+
+
+def _expression(rng) -> str:
+    terms = [str(int(rng.integers(1, 1000))) for _ in range(int(rng.integers(2, 8)))]
+    expression = terms[0]
+    for term in terms[1:]:
+        expression += str(rng.choice(["+", "-", "*", "/"])) + term
+    return f"({expression})*{int(rng.integers(1, 10))}"
+
+
+def _time(func, expressions, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for expression in expressions:
+            try:
+                func(expression)
+            except (MathError, ZeroDivisionError):
+                pass
+    return (time.perf_counter() - start) / (repeat * len(expressions))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--expressions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    expressions = [_expression(rng) for _ in range(args.expressions)]
+
+    eval_time = _time(_eval_path, expressions, args.repeat)
+    compile_expression.cache_clear()
+    cold_time = _time(evaluate, expressions, 1)
+    warm_time = _time(evaluate, expressions, args.repeat)
+    start = time.perf_counter()
+    evaluate_many(expressions)
+    batch_time = (time.perf_counter() - start) / len(expressions)
+
+    print(f"expressions: {len(expressions)}, per expression")
+    print(f"  eval             {eval_time * 1e6:8.1f}us")
+    print(f"  evaluator cold   {cold_time * 1e6:8.1f}us")
+    print(
+        f"  evaluator cached {warm_time * 1e6:8.1f}us  ({compile_expression.cache_info()})"
+    )
+    print(f"  evaluate_many    {batch_time * 1e6:8.1f}us")
+    for expression in PATHOLOGICAL:
+        start = time.perf_counter()
+        try:
+            evaluate(expression)
+            outcome = "evaluated"
+        except MathError as e:
+            outcome = f"rejected: {e}"
+        print(
+            f"  {expression[:16]!r:<20} {(time.perf_counter() - start) * 1e6:8.1f}us  "
+            f"{outcome}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Request-thread cost and RPC count of buffered vs. per-point metric writes.
+
+Simulates /query and /tools/chat traffic (3 and 2 points per request over a
+few hundred label sets) against FakeMetricClient. The per-point path makes one
+create_time_series call per point on the calling thread; the exporter only
+enqueues and writes aggregated series in batches from its own thread. The fake
+client rejects requests over the API's series limit or with duplicate series,
+so a clean run also checks the batching.
+
+Usage: python -m benchmarks.metrics_exporter [--requests 2000] [--users 300]
+"""
+
+import argparse
+import time
+from google.cloud import monitoring_v3
+from telemetry.exporter import MetricExporter
+from telemetry.fake_metric_client import FakeMetricClient
+
+
+def _points(requests: int, users: int):
+    for i in range(requests):
+        labels = {"user_id": f"user-{i % users}"}
+        if i % 2:
+            yield "custom.googleapis.com/rag/queries/count", 1.0, labels, "sum"
+            yield "custom.googleapis.com/rag/documents_found", 5.0, labels, "mean"
+            yield "custom.googleapis.com/rag/response_time", 0.2, labels, "mean"
+        else:
+            labels["function_name"] = "chat_with_tools"
+            yield "custom.googleapis.com/function_calls/count", 1.0, labels, "sum"
+            yield "custom.googleapis.com/function_calls/duration", 0.5, labels, "mean"
+
+
+def _single(metric_type: str, labels: dict):
+    series = monitoring_v3.TimeSeries()
+    series.metric.type = metric_type
+    for key, value in labels.items():
+        series.metric.labels[key] = value
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    points = list(_points(args.requests, args.users))
+
+    client = FakeMetricClient(latency=args.latency_ms / 1000)
+    start = time.perf_counter()
+    for metric_type, value, labels, _ in points:
+        client.create_time_series("projects/fake", [_single(metric_type, labels)])
+    sync_time = time.perf_counter() - start
+    print(f"points: {len(points)} from {args.requests} requests")
+    print(
+        f"  per point  {sync_time / len(points) * 1e6:9.1f}us/point on the caller, "
+        f"{len(client.requests)} RPCs"
+    )
+
+    client = FakeMetricClient(latency=args.latency_ms / 1000)
+    exporter = MetricExporter(client, "projects/fake", flush_interval=3600)
+    start = time.perf_counter()
+    for metric_type, value, labels, aggregate in points:
+        exporter.add(metric_type, value, labels, aggregate)
+    enqueue_time = time.perf_counter() - start
+    exporter.shutdown()
+    stats = exporter.stats()
+    sizes = [len(batch) for batch in client.requests]
+    print(
+        f"  exporter   {enqueue_time / len(points) * 1e6:9.1f}us/point on the caller, "
+        f"{len(client.requests)} RPCs of up to {max(sizes, default=0)} series, "
+        f"flush {stats['last_flush_duration'] * 1000:.1f}ms"
+    )
+    print(
+        f"  aggregated {stats['points']} points into {stats['series_written']} series, "
+        f"dropped {stats['dropped_points']} points / {stats['dropped_series']} series, "
+        f"failed requests {stats['failed_requests']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Recall@k loss of compact embedding formats against full precision.
+
+Scores every sampled query exhaustively in float64, float32 and int8 so only the
+storage format differs. Reads float64 embeddings from the documents table, or
+generates clustered vectors with --synthetic.
+
+Usage: python -m benchmarks.quantization [--synthetic 50000] [--top-k 10]
+"""
+
+import argparse
+import numpy as np
+from agent.quantization import BYTES_PER_DIMENSION, int8_dot, quantize_int8
+
+
+def _load_embeddings(synthetic: int, dimensions: int) -> np.ndarray:
+    if synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(synthetic // 500, 1), dimensions))
+        labels = rng.integers(0, len(centers), synthetic)
+        return centers[labels] + 0.6 * rng.normal(size=(synthetic, dimensions))
+
+    from agent.retriever import bq
+    from agent.vector_index import document_embeddings, load_documents
+
+    data = load_documents(bq, storage="float64")
+    return document_embeddings(data, storage="float64").astype(np.float64)
+
+
+def _top_k(scores: np.ndarray, k: int) -> set:
+    return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    full = _load_embeddings(args.synthetic, args.dimensions)
+    full = full / np.maximum(np.linalg.norm(full, axis=1, keepdims=True), 1e-12)
+    half = full.astype(np.float32)
+    codes, scales = quantize_int8(half)
+
+    rng = np.random.default_rng(1)
+    sample = rng.choice(len(full), size=min(args.queries, len(full)), replace=False)
+    recalls = {"float32": [], "int8": []}
+    for position in sample:
+        # perturb stored vectors so queries are not exact duplicates
+        query = full[position] + 0.1 * rng.normal(size=full.shape[1])
+        expected = _top_k(full @ query, args.top_k)
+        query32 = query.astype(np.float32)
+        for name, scores in (
+            ("float32", half @ query32),
+            ("int8", int8_dot(codes, scales, query32)),
+        ):
+            found = _top_k(scores, args.top_k)
+            recalls[name].append(len(found & expected) / args.top_k)
+
+    print(f"vectors: {len(full)} x {full.shape[1]}, recall@{args.top_k} vs float64")
+    for name in ("float64", "float32", "int8"):
+        recall = np.mean(recalls[name]) if name in recalls else 1.0
+        size = len(full) * full.shape[1] * BYTES_PER_DIMENSION[name]
+        if name == "int8":
+            size += scales.nbytes
+        print(f"  {name:<8} recall={recall:.4f}  storage={size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
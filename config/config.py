@@ -14,6 +14,162 @@ class Config:
     TABLE_ID = os.getenv("TABLE_ID", "documents")
     CREDENTIALS_FILE = os.getenv("CREDENTIALS_FILE", "")
     API_KEY = os.getenv("API_KEY")
+    # model tiers for routing, smallest/fastest first (see agent.router), e.g.
+    # "gemini-2.5-flash-lite,gemini-2.5-flash,gemini-2.5-pro"; the default of
+    # MODEL_NAME alone disables routing. Relative tier costs default to
+    # 1, 2, 4, ... and budgets of 0 mean none. A tier skipped for latency is
+    # probed once every ROUTER_PROBE_INTERVAL seconds
+    MODEL_TIERS = os.getenv("MODEL_TIERS", MODEL_NAME)
+    MODEL_TIER_COSTS = os.getenv("MODEL_TIER_COSTS", "")
+    ROUTER_SMALL_TOOL_TOKENS = int(os.getenv("ROUTER_SMALL_TOOL_TOKENS", "2000"))
+    ROUTER_SMALL_TEXT_TOKENS = int(os.getenv("ROUTER_SMALL_TEXT_TOKENS", "300"))
+    ROUTER_COST_BUDGET = float(os.getenv("ROUTER_COST_BUDGET", "0"))
+    TOOL_CHAT_LATENCY_BUDGET = float(os.getenv("TOOL_CHAT_LATENCY_BUDGET", "0"))
+    ANSWER_LATENCY_BUDGET = float(os.getenv("ANSWER_LATENCY_BUDGET", "0"))
+    ROUTER_PROBE_INTERVAL = float(os.getenv("ROUTER_PROBE_INTERVAL", "30"))
+    # run without Google Cloud (tests, local development): no clients are
+    # created at import, queries are embedded by agent.fake_backends.FakeEmbedder
+    # and answered from its sample corpus, metrics go to FakeMetricClient
+    OFFLINE = os.getenv("OFFLINE", "false").lower() == "true"
+    # offline generation with agent.fake_model.FakeStreamingModel
+    FAKE_MODEL = os.getenv("FAKE_MODEL", str(OFFLINE)).lower() == "true"
+
+    # in-process vector index
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "data/vector_index")
+    VECTOR_INDEX_LISTS = int(os.getenv("VECTOR_INDEX_LISTS", "0"))
+    VECTOR_INDEX_PROBES = int(os.getenv("VECTOR_INDEX_PROBES", "8"))
+    # the index is only served while the documents table is unchanged since it
+    # was built; the table's modification time is re-read every this many seconds
+    VECTOR_INDEX_CHECK_TTL = float(os.getenv("VECTOR_INDEX_CHECK_TTL", "30"))
+
+    # BM25 index saved next to the vector index. Every index run that changed
+    # chunks rebuilds both once it finishes (python -m agent.vector_index does
+    # it by hand); LOCAL_INDEX_BUILD=false skips that and queries then go to
+    # BigQuery once the table has changed. Hybrid retrieval fuses the top
+    # HYBRID_CANDIDATES of each with reciprocal rank fusion (RRF_K dampens the
+    # weight of top ranks)
+    LOCAL_INDEX_BUILD = os.getenv("LOCAL_INDEX_BUILD", "true").lower() == "true"
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "100"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+
+    # BigQuery VECTOR_SEARCH (used once the vector index is ACTIVE with enough
+    # coverage; BigQuery needs at least 5000 rows to build the index)
+    VECTOR_SEARCH_ENABLED = os.getenv("VECTOR_SEARCH_ENABLED", "true").lower() == "true"
+    VECTOR_SEARCH_INDEX_NAME = os.getenv(
+        "VECTOR_SEARCH_INDEX_NAME", "documents_embedding_index"
+    )
+    VECTOR_SEARCH_INDEX_TYPE = os.getenv("VECTOR_SEARCH_INDEX_TYPE", "IVF")
+    VECTOR_SEARCH_MIN_ROWS = int(os.getenv("VECTOR_SEARCH_MIN_ROWS", "5000"))
+    VECTOR_SEARCH_MIN_COVERAGE = float(os.getenv("VECTOR_SEARCH_MIN_COVERAGE", "100"))
+    VECTOR_SEARCH_STATUS_TTL = float(os.getenv("VECTOR_SEARCH_STATUS_TTL", "300"))
+
+    # embedding storage: float64 (ARRAY<FLOAT64>, searchable in BigQuery) or the
+    # compact float32 / int8 BYTES forms served by the in-process index
+    EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float64")
+    VECTOR_INDEX_DTYPE = os.getenv(
+        "VECTOR_INDEX_DTYPE", "int8" if EMBEDDING_STORAGE == "int8" else "float32"
+    )
+
+    # query embedding cache (EMBED_CACHE_PATH empty = memory only; the SQLite
+    # tier keeps at most EMBED_CACHE_DISK_SIZE rows, 0 = unbounded)
+    EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+    EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "86400"))
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+    EMBED_CACHE_DISK_SIZE = int(os.getenv("EMBED_CACHE_DISK_SIZE", "100000"))
+
+    # micro-batching of concurrent query embeddings
+    QUERY_EMBED_BATCH_WINDOW_MS = float(os.getenv("QUERY_EMBED_BATCH_WINDOW_MS", "5"))
+    QUERY_EMBED_BATCH_SIZE = int(os.getenv("QUERY_EMBED_BATCH_SIZE", "32"))
+
+    # indexer embedding batches (per-request API limits) and worker pool
+    EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "250"))
+    EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "20000"))
+    EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "8"))
+    EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+    # chunking (estimated tokens per chunk and overlap between neighbours)
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+
+    # streaming indexer pipeline (rows per page, batches buffered between stages)
+    INDEX_PAGE_SIZE = int(os.getenv("INDEX_PAGE_SIZE", "100"))
+    INDEX_QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", "4"))
+
+    # answer context packing (estimated tokens; a passage whose word shingles are
+    # this much contained in an already packed passage is a duplicate)
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2048"))
+    CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+    # semantic result cache (cosine similarity threshold between query embeddings)
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+    RESULT_CACHE_THRESHOLD = float(os.getenv("RESULT_CACHE_THRESHOLD", "0.95"))
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+
+    # generate_content response cache (0 size disables; calls above the
+    # temperature threshold or without an explicit temperature always go through)
+    LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "600"))
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+    ANSWER_TEMPERATURE = float(os.getenv("ANSWER_TEMPERATURE", "0.2"))
+
+    # usage accounting: USD per 1M tokens as model=input/output/cached-input
+    # (unlisted models are counted at no cost), embeddings per 1M characters;
+    # rolling totals cover USAGE_WINDOW_SECONDS in USAGE_BUCKET_SECONDS buckets
+    MODEL_PRICES = os.getenv(
+        "MODEL_PRICES",
+        "gemini-2.5-flash-lite=0.10/0.40/0.025,"
+        "gemini-2.5-flash=0.30/2.50/0.075,"
+        "gemini-2.5-pro=1.25/10.00/0.31",
+    )
+    EMBED_PRICE_PER_M_CHARS = float(os.getenv("EMBED_PRICE_PER_M_CHARS", "0.025"))
+    USAGE_WINDOW_SECONDS = float(os.getenv("USAGE_WINDOW_SECONDS", "3600"))
+    USAGE_BUCKET_SECONDS = float(os.getenv("USAGE_BUCKET_SECONDS", "60"))
+
+    # Cloud Monitoring points are buffered and aggregated per series, then
+    # written every METRICS_FLUSH_INTERVAL seconds (the API rejects writing a
+    # series more often than every 5s); points beyond METRICS_MAX_QUEUE queued
+    # or METRICS_MAX_SERIES distinct series per interval are dropped and counted
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "10"))
+    METRICS_MAX_QUEUE = int(os.getenv("METRICS_MAX_QUEUE", "10000"))
+    METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "5000"))
+
+    # async service layer (timeouts in seconds, 0 = no timeout)
+    SERVICE_MAX_WORKERS = int(os.getenv("SERVICE_MAX_WORKERS", "32"))
+    BIGQUERY_CONCURRENCY = int(os.getenv("BIGQUERY_CONCURRENCY", "16"))
+    VERTEX_CONCURRENCY = int(os.getenv("VERTEX_CONCURRENCY", "16"))
+    BIGQUERY_TIMEOUT = float(os.getenv("BIGQUERY_TIMEOUT", "30"))
+    VERTEX_TIMEOUT = float(os.getenv("VERTEX_TIMEOUT", "60"))
+
+    # tool calls run concurrently on this pool; TOOLS entries may set "timeout"
+    TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+    TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", "10"))
+
+    # do_math evaluator limits (time budget per expression, 0 = none)
+    MATH_MAX_CHARS = int(os.getenv("MATH_MAX_CHARS", "1000"))
+    MATH_MAX_DEPTH = int(os.getenv("MATH_MAX_DEPTH", "32"))
+    MATH_MAX_NODES = int(os.getenv("MATH_MAX_NODES", "256"))
+    MATH_MAX_EXPONENT = int(os.getenv("MATH_MAX_EXPONENT", "10000"))
+    MATH_MAX_INT_BITS = int(os.getenv("MATH_MAX_INT_BITS", "4096"))
+    MATH_TIME_BUDGET_MS = float(os.getenv("MATH_TIME_BUDGET_MS", "50"))
+    MATH_CACHE_SIZE = int(os.getenv("MATH_CACHE_SIZE", "1024"))
+
+    # answer tool calls from the registered formatters (no second model call)
+    # when every call succeeded and the message is short with few calls
+    TOOL_DIRECT_ANSWER = os.getenv("TOOL_DIRECT_ANSWER", "true").lower() == "true"
+    TOOL_DIRECT_MAX_MESSAGE_CHARS = int(
+        os.getenv("TOOL_DIRECT_MAX_MESSAGE_CHARS", "80")
+    )
+    TOOL_DIRECT_MAX_CALLS = int(os.getenv("TOOL_DIRECT_MAX_CALLS", "2"))
+
+    # server-side chat sessions (LRU + idle eviction; history over the token
+    # budget is compacted into a summary, keeping the last CHAT_KEEP_TURNS turns)
+    CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+    CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+    CHAT_SESSION_TOKEN_BUDGET = int(os.getenv("CHAT_SESSION_TOKEN_BUDGET", "4000"))
+    CHAT_KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "4"))
+    CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "500"))
+    # threads summarizing over-budget sessions after the response (0 = inline)
+    CHAT_COMPACTION_WORKERS = int(os.getenv("CHAT_COMPACTION_WORKERS", "1"))
 
     def __init__(self):
         self.PROJECT_ID = os.getenv("PROJECT_ID")
@@ -1,19 +1,32 @@
+import asyncio
+import json
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from datetime import datetime
 
-from schemas.rag import QueryRequest, IndexRequest, IndexResponse
+from schemas.rag import QueryRequest, IndexRequest, IndexResponse, IndexJobResponse
 from schemas.tools import AvailableToolsResponse
 from schemas.function_calling import FunctionCallRequest
 from schemas.common import ErrorResponse, HealthResponse, SuccessResponse
 from schemas.response import FunctionCallResponse, RAGResponse
 
-from agent.retriever import retrieve
+from agent.retriever import (
+    retrieve,
+    reload_local_indexes,
+    embedding_batcher,
+    embedding_cache,
+    result_cache,
+)
+from agent.generator import build_prompt, router as answer_router, stream_answer
+from agent.llm_cache import llm_cache
 from agent.indexer import main as index_main
-from agent.tools import get_available_tools
+from agent.jobs import IndexJobManager
+from agent.tools import get_available_tools, get_tool_cache_stats
 from agent.function_caller import function_caller
+from agent.service import service
+from agent.usage import set_usage_scope, usage_tracker
 from telemetry.manager import telemetry
 
 app = FastAPI(
@@ -33,6 +46,26 @@ app.add_middleware(
 )
 
 
+def _on_index_job_finished(job):
+    # the job rebuilt the local indexes on disk after writing (LOCAL_INDEX_BUILD)
+    progress = job.to_dict()
+    if progress["chunks_written"] or progress["chunks_tombstoned"]:
+        reload_local_indexes()
+        result_cache.invalidate()
+
+
+index_jobs = IndexJobManager(index_main, on_finished=_on_index_job_finished)
+usage_tracker.on_record = telemetry.log_usage
+
+
+@app.on_event("shutdown")
+async def shutdown_service():
+    index_jobs.shutdown()
+    function_caller.shutdown()
+    service.shutdown()
+    telemetry.monitoring.shutdown()
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     return JSONResponse(
@@ -63,15 +96,51 @@ async def health_check():
     )
 
 
+@app.get("/stats", response_model=SuccessResponse)
+async def get_stats():
+    """In-process cache statistics"""
+    return SuccessResponse(
+        message="快取統計資料",
+        data={
+            "embedding_batcher": embedding_batcher.stats(),
+            "embedding_cache": embedding_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "service": service.stats(),
+            "tool_cache": get_tool_cache_stats(),
+            "function_caller": function_caller.stats(),
+            "answer_router": answer_router.stats(),
+            "chat_sessions": function_caller.sessions.stats(),
+            "llm_cache": llm_cache.stats(),
+            "metrics_exporter": telemetry.monitoring.exporter.stats(),
+        },
+    )
+
+
+@app.get("/usage", response_model=SuccessResponse)
+async def get_usage(top: int = 10):
+    """Rolling token, character and cost totals by endpoint, model and user"""
+    return SuccessResponse(message="用量統計資料", data=usage_tracker.stats(top))
+
+
 # ===== RAG =====
 @app.post("/query", response_model=RAGResponse)
 async def query_documents(request: QueryRequest, user_id: str = "anonymous"):
     """Query relevant documents"""
+    set_usage_scope("/query", user_id)
     try:
 
         @telemetry.track_rag_query(user_id=user_id)
-        def _query_with_telemetry(query: str, top_k: int):
-            results_df = retrieve(query, top_k)
+        def _query_with_telemetry(
+            query: str,
+            top_k: int,
+            fraction_lists_to_search: float = None,
+            filters: dict = None,
+            mode: str = "vector",
+            narrow: bool = False,
+        ):
+            results_df = retrieve(
+                query, top_k, fraction_lists_to_search, filters, mode, narrow
+            )
             documents = []
             for _, row in results_df.iterrows():
                 documents.append(
@@ -82,16 +151,35 @@ async def query_documents(request: QueryRequest, user_id: str = "anonymous"):
                         "distance": float(row["distance"]),
                     }
                 )
-            return {"documents": documents, "total_found": len(documents)}
+            return {
+                "documents": documents,
+                "total_found": len(documents),
+                "bytes_processed": results_df.attrs.get("bytes_processed"),
+                "search_path": results_df.attrs.get("search_path"),
+            }
 
-        result = _query_with_telemetry(request.query, request.top_k)
+        result = await service.run(
+            "bigquery",
+            _query_with_telemetry,
+            query=request.query,
+            top_k=request.top_k,
+            fraction_lists_to_search=request.fraction_lists_to_search,
+            filters=(
+                request.filters.dict(exclude_none=True) if request.filters else None
+            ),
+            mode=request.mode,
+            narrow=request.narrow,
+        )
 
         return RAGResponse(
             message=f"找到 {result['total_found']} 個相關文檔",
             success=True,
             documents_count=result["total_found"],
+            bytes_processed=result["bytes_processed"],
         )
 
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="查詢逾時，請稍後再試")
     except Exception as e:
         telemetry.logger.log_error(
             e, {"operation": "rag_query", "query": request.query}, user_id
@@ -99,21 +187,89 @@ async def query_documents(request: QueryRequest, user_id: str = "anonymous"):
         raise HTTPException(status_code=500, detail="查詢失敗，請稍後再試")
 
 
-@app.post("/index", response_model=IndexResponse)
-async def index_documents(request: IndexRequest):
-    """Index documents"""
-    try:
-        index_main()
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        return IndexResponse(
-            success=True,
-            message="文檔索引建立成功",
-            documents_processed=request.limit,
-            chunks_created=request.limit,
-        )
 
+@app.post("/query/answer")
+async def answer_query(request: QueryRequest, user_id: str = "anonymous"):
+    """Retrieve documents and stream the answer as Server-Sent Events
+
+    Events: context (packing stats), token ({"text": ...}) per model chunk,
+    then done (generation metrics) or error.
+    """
+    # the response stream runs in this request's context too, so it is covered
+    set_usage_scope("/query/answer", user_id)
+    try:
+        prompt, context_stats = await service.run(
+            "bigquery",
+            build_prompt,
+            request.query,
+            request.top_k,
+            fraction_lists_to_search=request.fraction_lists_to_search,
+            filters=(
+                request.filters.dict(exclude_none=True) if request.filters else None
+            ),
+            mode=request.mode,
+            narrow=request.narrow,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="查詢逾時，請稍後再試")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"索引建立失敗: {str(e)}")
+        telemetry.logger.log_error(
+            e, {"operation": "answer_query", "query": request.query}, user_id
+        )
+        raise HTTPException(status_code=500, detail="查詢失敗，請稍後再試")
+
+    def events():
+        yield _sse("context", dict(context_stats))
+        try:
+            # a sync generator: Starlette pulls each chunk on its thread pool
+            for text in stream_answer(prompt, context_stats, user_id):
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            telemetry.logger.log_error(
+                e, {"operation": "answer_query", "query": request.query}, user_id
+            )
+            yield _sse("error", {"error": "生成回答失敗，請稍後再試"})
+            return
+        yield _sse("done", context_stats)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/index", response_model=IndexResponse, status_code=202)
+async def index_documents(request: IndexRequest):
+    """Enqueue an index job"""
+    job = index_jobs.submit(request.limit, request.tombstone_missing)
+    return IndexResponse(
+        success=True,
+        message="索引工作已排入佇列",
+        job_id=job.job_id,
+        status=job.status,
+    )
+
+
+@app.get("/index/{job_id}", response_model=IndexJobResponse)
+async def get_index_job(job_id: str):
+    """Index job progress"""
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到索引工作: {job_id}")
+    return IndexJobResponse(**job.to_dict())
+
+
+@app.delete("/index/{job_id}", response_model=IndexJobResponse)
+async def cancel_index_job(job_id: str):
+    """Cancel an index job"""
+    job = index_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到索引工作: {job_id}")
+    return IndexJobResponse(**job.to_dict())
 
 
 # ===== Tools =====
@@ -127,13 +283,21 @@ async def get_tools():
 @app.post("/tools/chat", response_model=FunctionCallResponse)
 async def chat_with_tools(request: FunctionCallRequest, user_id: str = "anonymous"):
     """Natural language tool calling"""
+    set_usage_scope("/tools/chat", user_id)
     try:
 
         @telemetry.track_function_call("chat_with_tools", user_id=user_id)
-        def _chat_with_telemetry(message: str):
-            return function_caller.process_message(message)
+        def _chat_with_telemetry(message: str, session_id: str = None):
+            return function_caller.process_message(message, session_id)
 
-        result = _chat_with_telemetry(request.message)
+        # sessions are scoped per user so ids cannot reach another user's history
+        session_id = f"{user_id}:{request.session_id}" if request.session_id else None
+        result = await service.run(
+            "vertex_ai",
+            _chat_with_telemetry,
+            message=request.message,
+            session_id=session_id,
+        )
 
         telemetry.log_user_interaction(
             user_id=user_id,
@@ -147,6 +311,8 @@ async def chat_with_tools(request: FunctionCallRequest, user_id: str = "anonymou
         return FunctionCallResponse(
             message=result.get("response", "處理完成"),
             success=result.get("success", True),
+            session_id=request.session_id,
+            session_tokens=result.get("session_tokens"),
         )
 
     except Exception as e:
@@ -158,5 +324,13 @@ async def chat_with_tools(request: FunctionCallRequest, user_id: str = "anonymou
         )
 
 
+@app.delete("/tools/chat/sessions/{session_id}", response_model=SuccessResponse)
+async def delete_chat_session(session_id: str, user_id: str = "anonymous"):
+    """Drop a chat session's server-side history"""
+    if not function_caller.sessions.delete(f"{user_id}:{session_id}"):
+        raise HTTPException(status_code=404, detail=f"找不到對話: {session_id}")
+    return SuccessResponse(message="對話已刪除", data={"session_id": session_id})
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_level="info")
@@ -9,3 +9,8 @@ class FunctionCallRequest(BaseModel):
         ..., description="User's natural language message", min_length=1, max_length=1000
     )
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context information")
+    session_id: Optional[str] = Field(
+        None,
+        description="Continue a server-side chat session (created on first use)",
+        max_length=128,
+    )
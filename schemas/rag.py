@@ -1,12 +1,40 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
+class QueryFilters(BaseModel):
+    """Metadata filters pushed down to BigQuery"""
+
+    tags: Optional[List[str]] = Field(None, description="Match documents with any of these tags")
+    primary_tag: Optional[List[str]] = Field(
+        None,
+        description="Match documents whose first tag is one of these (prunes clustered blocks, unlike tags)",
+    )
+    created_after: Optional[datetime] = Field(None, description="Earliest post creation time")
+    created_before: Optional[datetime] = Field(None, description="Latest post creation time (exclusive)")
+    min_score: Optional[int] = Field(None, description="Minimum post score")
+
+
 class QueryRequest(BaseModel):
     """Query request model"""
 
     query: str = Field(..., description="Query text", min_length=1, max_length=1000)
     top_k: int = Field(default=5, description="Number of documents to return", ge=1, le=20)
+    fraction_lists_to_search: Optional[float] = Field(
+        None,
+        description="Fraction of vector index lists to probe (recall vs. latency)",
+        gt=0,
+        le=1,
+    )
+    filters: Optional[QueryFilters] = Field(None, description="Metadata filters")
+    mode: Literal["vector", "hybrid"] = Field(
+        default="vector", description="vector, or hybrid BM25 + vector fusion"
+    )
+    narrow: bool = Field(
+        default=False,
+        description="Hybrid only: score vectors over the BM25 candidates only",
+    )
 
 
 class DocumentChunk(BaseModel):
@@ -34,6 +62,10 @@ class IndexRequest(BaseModel):
     """Index request model"""
 
     limit: int = Field(default=100, description="Number of documents to index", ge=1, le=1000)
+    tombstone_missing: bool = Field(
+        default=False,
+        description="Also tombstone chunks whose post is gone from the source (scans the whole source table)",
+    )
 
 
 class IndexResponse(BaseModel):
@@ -41,5 +73,26 @@ class IndexResponse(BaseModel):
 
     success: bool = Field(..., description="Whether indexing was successful")
     message: str = Field(..., description="Response message")
-    documents_processed: int = Field(..., description="Number of documents processed")
-    chunks_created: int = Field(..., description="Number of chunks created")
+    job_id: str = Field(..., description="Index job ID")
+    status: str = Field(..., description="Index job status")
+
+
+class IndexJobResponse(BaseModel):
+    """Index job status response model"""
+
+    job_id: str = Field(..., description="Index job ID")
+    status: str = Field(
+        ..., description="queued, running, completed, failed or cancelled"
+    )
+    stage: Optional[str] = Field(None, description="Pipeline stage currently running")
+    limit: int = Field(..., description="Number of documents requested")
+    tombstone_missing: bool = Field(..., description="Whether deleted posts are tombstoned")
+    rows_processed: int = Field(..., description="Number of source rows read")
+    chunks_processed: int = Field(..., description="Number of chunks produced")
+    chunks_written: int = Field(..., description="Number of new or changed chunks merged into the table")
+    chunks_tombstoned: int = Field(..., description="Number of chunks marked deleted")
+    rows_per_second: float = Field(..., description="Source rows read per second")
+    eta_seconds: Optional[float] = Field(None, description="Estimated seconds remaining")
+    elapsed_seconds: float = Field(..., description="Seconds since the job started")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    stages: Dict[str, Dict[str, Any]] = Field(..., description="Per-stage counters")
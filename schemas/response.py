@@ -12,10 +12,12 @@ class UserResponse(BaseModel):
 class FunctionCallResponse(UserResponse):
     """Function call response"""
 
-    pass
+    session_id: Optional[str] = Field(None, description="Chat session ID")
+    session_tokens: Optional[int] = Field(None, description="Estimated tokens in the session history")
 
 
 class RAGResponse(UserResponse):
     """RAG query response"""
 
     documents_count: Optional[int] = Field(None, description="Number of documents found")
+    bytes_processed: Optional[int] = Field(None, description="BigQuery bytes processed by the query")
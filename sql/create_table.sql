@@ -2,7 +2,31 @@ CREATE SCHEMA IF NOT EXISTS `are_rag`;
 
 CREATE OR REPLACE TABLE `are_rag.documents` (
   doc_id STRING,
+  chunk_index INT64,
   title STRING,
   content STRING,
-  embedding ARRAY<FLOAT64>
-);
\ No newline at end of file
+  -- post metadata from posts_questions, used for filtered retrieval
+  tags ARRAY<STRING>,
+  primary_tag STRING,
+  creation_date TIMESTAMP,
+  score INT64,
+  -- chunk offsets into the markup-stripped post body
+  char_start INT64,
+  char_end INT64,
+  embedding ARRAY<FLOAT64>,
+  -- compact storage (EMBEDDING_STORAGE=float32|int8): little-endian float32 or
+  -- int8 codes, with the per-vector scale for int8; embedding is then empty
+  embedding_q BYTES,
+  embedding_scale FLOAT64,
+  -- sha256 of content; fingerprint = sha256(doc_id, chunk_index, content_hash, embed_model)
+  content_hash STRING,
+  embed_model STRING,
+  fingerprint STRING,
+  -- tombstone for chunks of changed or deleted documents
+  deleted BOOL,
+  updated_at TIMESTAMP
+)
+-- monthly partitions stay under the 4000-partition limit for the whole dataset
+PARTITION BY TIMESTAMP_TRUNC(creation_date, MONTH)
+-- only filters on primary_tag prune blocks; the any-of tags filter scans them all
+CLUSTER BY primary_tag, doc_id;
@@ -0,0 +1,20 @@
+-- Vector index for VECTOR_SEARCH on are_rag.documents.
+-- BigQuery only builds the index once the table has at least 5000 rows; until
+-- it is ACTIVE with full coverage the retriever keeps using exact ML.DISTANCE.
+-- index_type can be 'IVF' or 'TREE_AH'.
+-- STORING covers every column VECTOR_SEARCH returns. Indexes created with an
+-- older column list keep it: DROP VECTOR INDEX and re-run this to update them.
+
+CREATE VECTOR INDEX IF NOT EXISTS `documents_embedding_index`
+ON `are_rag.documents`(embedding)
+STORING (doc_id, title, content, chunk_index, char_start, char_end, tags, primary_tag,
+         creation_date, score, deleted)
+OPTIONS (
+  index_type = 'IVF',
+  distance_type = 'COSINE'
+);
+
+-- Check build progress:
+-- SELECT index_name, index_status, coverage_percentage
+-- FROM `are_rag.INFORMATION_SCHEMA.VECTOR_INDEXES`
+-- WHERE table_name = 'documents';
@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from google.cloud import monitoring_v3
+
+# create_time_series accepts at most this many series per request, and one
+# point per series every MIN_WRITE_INTERVAL seconds
+MAX_SERIES_PER_REQUEST = 200
+MIN_WRITE_INTERVAL = 5.0
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...], str]
+
+
+class MetricExporter:
+    """Buffers metric points and writes them in batched create_time_series calls
+
+    add() only enqueues, so it never blocks a request on the Monitoring API. A
+    background thread aggregates points per (metric, labels) — summed for
+    counters, averaged otherwise — and every flush_interval writes one point
+    per series, batch_size series per request. Points arriving while the
+    queue holds max_queue are dropped and counted, as are new series once
+    max_series are pending. A flush within min_write_interval of the previous
+    one (e.g. at shutdown) waits out the rest of that interval first.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        project_name: str,
+        flush_interval: float = 10.0,
+        max_queue: int = 10000,
+        max_series: int = 5000,
+        batch_size: int = MAX_SERIES_PER_REQUEST,
+        min_write_interval: float = MIN_WRITE_INTERVAL,
+    ):
+        self.client = client
+        self.project_name = project_name
+        self.flush_interval = flush_interval
+        self.max_series = max_series
+        self.batch_size = min(batch_size, MAX_SERIES_PER_REQUEST)
+        self.min_write_interval = min_write_interval
+        self._last_write: Optional[float] = None
+        self._queue: "queue.Queue[Tuple[SeriesKey, float]]" = queue.Queue(max_queue)
+        # series key -> [total, count]
+        self._pending: Dict[SeriesKey, List[float]] = {}
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        # _pending_lock guards the aggregates, _flush_lock keeps writes in order
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.points = 0
+        self.dropped_points = 0
+        self.dropped_series = 0
+        self.flushes = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.series_written = 0
+        self.series_failed = 0
+        self.last_flush_duration = 0.0
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="metric-exporter", daemon=True
+                )
+                self._worker.start()
+
+    def add(
+        self,
+        metric_type: str,
+        value: float,
+        labels: Optional[Dict[str, Any]] = None,
+        aggregate: str = "mean",
+    ):
+        """queue one point; aggregate is "sum" for counters, "mean" otherwise"""
+        if self._stop.is_set():
+            self._count_drop()
+            return
+        self._ensure_worker()
+        key = (
+            metric_type,
+            tuple(sorted((k, str(v)) for k, v in (labels or {}).items())),
+            aggregate,
+        )
+        try:
+            self._queue.put_nowait((key, value))
+        except queue.Full:
+            self._count_drop()
+
+    def _count_drop(self):
+        with self._start_lock:
+            self.dropped_points += 1
+
+    def _aggregate(self, key: SeriesKey, value: float):
+        # callers hold _pending_lock
+        entry = self._pending.get(key)
+        if entry is None:
+            if len(self._pending) >= self.max_series:
+                self.dropped_series += 1
+                return
+            entry = self._pending[key] = [0.0, 0]
+        entry[0] += value
+        entry[1] += 1
+        self.points += 1
+
+    def _drain(self):
+        while True:
+            try:
+                key, value = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._aggregate(key, value)
+
+    def _series(self, key: SeriesKey, total: float, count: int, now: datetime):
+        metric_type, labels, aggregate = key
+        series = monitoring_v3.TimeSeries()
+        series.metric.type = metric_type
+        series.resource.type = "global"
+        for name, value in labels:
+            series.metric.labels[name] = value
+
+        point = monitoring_v3.Point()
+        point.value.double_value = total if aggregate == "sum" else total / count
+        point.interval = monitoring_v3.TimeInterval(start_time=now, end_time=now)
+        series.points = [point]
+        return series
+
+    def flush(self):
+        """write every pending series now"""
+        with self._flush_lock:
+            # the worker keeps aggregating new points while this batch is sent
+            with self._pending_lock:
+                self._drain()
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            if self._last_write is not None:
+                wait = self._last_write + self.min_write_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            self._last_write = time.monotonic()
+            start_time = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            series = [
+                self._series(key, total, count, now)
+                for key, (total, count) in pending.items()
+            ]
+            for i in range(0, len(series), self.batch_size):
+                batch = series[i : i + self.batch_size]
+                self.requests += 1
+                try:
+                    self.client.create_time_series(
+                        name=self.project_name, time_series=batch
+                    )
+                    self.series_written += len(batch)
+                except Exception as e:
+                    self.failed_requests += 1
+                    self.series_failed += len(batch)
+                    print(f"[WARN] Failed to write {len(batch)} time series: {e}")
+            self.flushes += 1
+            self.last_flush_duration = time.perf_counter() - start_time
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            # wake at least once a second so shutdown does not wait an interval
+            timeout = min(max(next_flush - time.monotonic(), 0.01), 1.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            with self._pending_lock:
+                if item is not None:
+                    self._aggregate(*item)
+                self._drain()
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def shutdown(self, timeout: float = 5.0):
+        """stop accepting points and write whatever is still buffered"""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "pending_series": len(self._pending),
+            "points": self.points,
+            "dropped_points": self.dropped_points,
+            "dropped_series": self.dropped_series,
+            "flushes": self.flushes,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "series_written": self.series_written,
+            "series_failed": self.series_failed,
+            "last_flush_duration": self.last_flush_duration,
+            "flush_interval": self.flush_interval,
+        }
@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+from .exporter import MAX_SERIES_PER_REQUEST
+
+
+class FakeMetricClient:
+    """Offline stand-in for MetricServiceClient.create_time_series
+
+    Sleeps latency per call and enforces the API rules the exporter relies on:
+    at most MAX_SERIES_PER_REQUEST series per request, each series (metric
+    type + labels) at most once per request and, with min_interval, at most
+    once per min_interval seconds. Every request's series are kept in
+    .requests for inspection.
+    """
+
+    def __init__(self, latency: float = 0.05, min_interval: float = 0.0):
+        self.latency = latency
+        self.min_interval = min_interval
+        self.requests: List[List[Any]] = []
+        self._written_at: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def create_time_series(self, name: str, time_series: List[Any]):
+        time.sleep(self.latency)
+        if len(time_series) > MAX_SERIES_PER_REQUEST:
+            raise ValueError(
+                f"{len(time_series)} series in one request, "
+                f"limit is {MAX_SERIES_PER_REQUEST}"
+            )
+        keys = [
+            (series.metric.type, tuple(sorted(series.metric.labels.items())))
+            for series in time_series
+        ]
+        if len(set(keys)) != len(keys):
+            raise ValueError("the same series was written twice in one request")
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if (
+                    now - self._written_at.get(key, -self.min_interval)
+                    < self.min_interval
+                ):
+                    raise ValueError(
+                        f"{key[0]} was written less than {self.min_interval}s ago"
+                    )
+            for key in keys:
+                self._written_at[key] = now
+            self.requests.append(list(time_series))
+
+    @property
+    def series_written(self) -> int:
+        with self._lock:
+            return sum(len(batch) for batch in self.requests)
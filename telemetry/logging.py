@@ -15,6 +15,9 @@ class CloudLogger:
         self.logger = logging.getLogger(__name__)
 
         # initialize Cloud Logging
+        if Config.OFFLINE:
+            self.cloud_logger = None
+            return
         try:
             self.cloud_client = cloud_logging.Client(project=Config.PROJECT_ID, credentials=Config.get_credentials())
             self.cloud_client.setup_logging()
@@ -186,6 +189,24 @@ class CloudLogger:
             except Exception as e:
                 print(f"Failed to log to Cloud Logging: {e}")
 
+    def log_token_usage(self, record: Dict[str, Any]):
+        """log token usage and estimated cost of one model call"""
+        log_data = {"event_type": "token_usage", **record}
+
+        log_entry = self._create_log_entry(
+            "INFO", f"Token usage: {record['model']}", log_data
+        )
+
+        # local log
+        self.logger.info(json.dumps(log_entry, ensure_ascii=False))
+
+        # Cloud Logging
+        if self.cloud_logger:
+            try:
+                self.cloud_logger.log_struct(log_entry, severity="INFO")
+            except Exception as e:
+                print(f"Failed to log to Cloud Logging: {e}")
+
 
 # 創建全局實例
 cloud_logger = CloudLogger()
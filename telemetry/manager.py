@@ -153,6 +153,30 @@ class TelemetryManager:
         """記錄性能指標"""
         self.logger.log_performance_metrics(operation, duration, metrics, user_id)
 
+    def log_generation(
+        self,
+        operation: str,
+        time_to_first_token: float,
+        duration: float,
+        metrics: Dict[str, Any] = None,
+        user_id: str = None,
+    ):
+        """記錄生成延遲（首個 token 時間、吞吐量與總時間）"""
+        metrics = metrics or {}
+        self.monitoring.log_generation_metrics(
+            operation,
+            time_to_first_token,
+            duration,
+            metrics.get("tokens_per_second", 0.0),
+            user_id,
+        )
+        self.logger.log_performance_metrics(operation, duration, metrics, user_id)
+
+    def log_usage(self, record: Dict[str, Any]):
+        """記錄模型與嵌入呼叫的 token 用量與估計成本"""
+        self.monitoring.log_usage_metrics(record)
+        self.logger.log_token_usage(record)
+
 
 # 創建全局實例
 telemetry = TelemetryManager()
@@ -7,12 +7,26 @@ from google.cloud.monitoring_v3 import query
 from google.protobuf.timestamp_pb2 import Timestamp
 from datetime import timezone
 from config.config import Config
+from .exporter import MetricExporter
+from .fake_metric_client import FakeMetricClient
 
 
 class CloudMonitoring:
     def __init__(self):
-        self.client = monitoring_v3.MetricServiceClient(credentials=Config.get_credentials())
+        if Config.OFFLINE:
+            self.client = FakeMetricClient(latency=0.0)
+        else:
+            self.client = monitoring_v3.MetricServiceClient(
+                credentials=Config.get_credentials()
+            )
         self.project_name = f"projects/{Config.PROJECT_ID}"
+        self.exporter = MetricExporter(
+            self.client,
+            self.project_name,
+            flush_interval=Config.METRICS_FLUSH_INTERVAL,
+            max_queue=Config.METRICS_MAX_QUEUE,
+            max_series=Config.METRICS_MAX_SERIES,
+        )
 
     def create_custom_metric(
         self, metric_type: str, display_name: str, description: str
@@ -52,34 +66,22 @@ class CloudMonitoring:
             return 0.0
 
     def write_time_series(
-        self, metric_type: str, value: float, labels: Dict[str, str] = None
+        self,
+        metric_type: str,
+        value: float,
+        labels: Dict[str, str] = None,
+        aggregate: str = "mean",
     ):
-        """write time series data"""
-        if labels is None:
-            labels = {}
-
-        series = monitoring_v3.TimeSeries()
-        series.metric.type = metric_type
-        series.resource.type = "global"
+        """queue a data point for the background exporter
 
-        # add labels
-        for key, value in labels.items():
-            series.metric.labels[key] = str(value)
+        Points of the same metric and labels are combined until the next flush:
+        aggregate="sum" for counts and other additive values, "mean" otherwise.
+        """
+        self.exporter.add(metric_type, self._safe_float(value), labels, aggregate)
 
-        # create data point
-        point = monitoring_v3.Point()
-        num_value = self._safe_float(value)
-        point.value.double_value = num_value
-
-        now = datetime.now(timezone.utc)
-        point.interval = monitoring_v3.TimeInterval(start_time=now, end_time=now)
-        
-        series.points = [point]
-
-        try:
-            self.client.create_time_series(name=self.project_name, time_series=[series])
-        except Exception as e:
-            print(f"Failed to write time series: {e}")
+    def shutdown(self):
+        """write buffered points before the process exits"""
+        self.exporter.shutdown()
 
     def log_function_call_metrics(
         self,
@@ -101,7 +103,7 @@ class CloudMonitoring:
 
         # log call count
         self.write_time_series(
-            "custom.googleapis.com/function_calls/count", 1.0, labels
+            "custom.googleapis.com/function_calls/count", 1.0, labels, "sum"
         )
 
         # log execution time
@@ -120,7 +122,9 @@ class CloudMonitoring:
         labels = {"user_id": user_id or "anonymous", "query_length": str(len(query))}
 
         # 記錄查詢次數
-        self.write_time_series("custom.googleapis.com/rag/queries/count", 1.0, labels)
+        self.write_time_series(
+            "custom.googleapis.com/rag/queries/count", 1.0, labels, "sum"
+        )
 
         # 記錄找到的文檔數量
         self.write_time_series(
@@ -132,6 +136,129 @@ class CloudMonitoring:
             "custom.googleapis.com/rag/response_time", response_time, labels
         )
 
+    def log_context_metrics(
+        self,
+        context_tokens: int,
+        tokens_saved: int,
+        generation_time: float,
+        user_id: str = None,
+    ):
+        """log answer context size, tokens saved by packing and generation time"""
+        labels = {"user_id": user_id or "anonymous"}
+
+        self.write_time_series(
+            "custom.googleapis.com/rag/context/tokens", float(context_tokens), labels
+        )
+        self.write_time_series(
+            "custom.googleapis.com/rag/context/tokens_saved",
+            float(tokens_saved),
+            labels,
+            "sum",
+        )
+        self.write_time_series(
+            "custom.googleapis.com/rag/generation_time", generation_time, labels
+        )
+
+    def log_generation_metrics(
+        self,
+        operation: str,
+        time_to_first_token: float,
+        total_latency: float,
+        tokens_per_second: float,
+        user_id: str = None,
+    ):
+        """log answer generation latency and throughput"""
+        labels = {"operation": operation, "user_id": user_id or "anonymous"}
+
+        self.write_time_series(
+            "custom.googleapis.com/generation/time_to_first_token",
+            time_to_first_token,
+            labels,
+        )
+        self.write_time_series(
+            "custom.googleapis.com/generation/tokens_per_second",
+            tokens_per_second,
+            labels,
+        )
+        self.write_time_series(
+            "custom.googleapis.com/generation/latency", total_latency, labels
+        )
+
+    def log_tool_response_metrics(self, direct: bool):
+        """log whether a tool answer came from templates or a second model call"""
+        self.write_time_series(
+            "custom.googleapis.com/function_calls/llm_calls_avoided",
+            1.0 if direct else 0.0,
+            {"response_path": "template" if direct else "llm"},
+        )
+
+    def log_session_metrics(
+        self, tokens: int, memory_bytes: int, stage: str = "exchange"
+    ):
+        """log the history size of a chat session after an exchange or compaction"""
+        labels = {"stage": stage}
+        self.write_time_series(
+            "custom.googleapis.com/chat_sessions/tokens", float(tokens), labels
+        )
+        self.write_time_series(
+            "custom.googleapis.com/chat_sessions/bytes", float(memory_bytes), labels
+        )
+
+    def log_llm_cache_metrics(self, hit: bool, latency_saved: float):
+        """log a generate_content cache lookup and the model latency it saved"""
+        labels = {"result": "hit" if hit else "miss"}
+        self.write_time_series(
+            "custom.googleapis.com/llm_cache/lookups", 1.0, labels, "sum"
+        )
+        if hit:
+            self.write_time_series(
+                "custom.googleapis.com/llm_cache/latency_saved",
+                latency_saved,
+                labels,
+                "sum",
+            )
+
+    def log_route_metrics(
+        self, route: str, latency: float, success: bool, escalated: bool
+    ):
+        """log one model call made by the router on the given tier"""
+        labels = {
+            "route": route,
+            "status": "success" if success else "error",
+            "escalated": str(escalated).lower(),
+        }
+        self.write_time_series("custom.googleapis.com/router/calls", 1.0, labels, "sum")
+        self.write_time_series("custom.googleapis.com/router/latency", latency, labels)
+
+    def log_usage_metrics(self, record: Dict[str, Any]):
+        """log the tokens, characters and estimated cost of one model call"""
+        # user_id would make one series per user; per-user cost stays in the
+        # log entries and /usage
+        labels = {
+            "endpoint": record["endpoint"],
+            "model": record["model"],
+            "kind": record["kind"],
+        }
+        for token_type in ("prompt", "output", "cached"):
+            count = record[f"{token_type}_tokens"]
+            if count:
+                self.write_time_series(
+                    "custom.googleapis.com/usage/tokens",
+                    float(count),
+                    {**labels, "token_type": token_type},
+                    "sum",
+                )
+        if record["characters"]:
+            self.write_time_series(
+                "custom.googleapis.com/usage/characters",
+                float(record["characters"]),
+                labels,
+                "sum",
+            )
+        self.write_time_series(
+            "custom.googleapis.com/usage/cost_usd", record["cost_usd"], labels, "sum"
+        )
+
 
 # 創建全局實例
 monitoring = CloudMonitoring()
@@ -0,0 +1,4 @@
+import os
+
+# the app and its clients are built at import; keep every test off Google Cloud
+os.environ.setdefault("OFFLINE", "true")
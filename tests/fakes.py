@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from agent.vector_index import ROW_COLUMNS
+
+
+class _FakeQueryJob:
+    def __init__(self, frame: pd.DataFrame, bytes_processed: int):
+        self._frame = frame
+        self.total_bytes_processed = bytes_processed
+
+    def result(self):
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self._frame.copy()
+
+
+class FakeBigQueryClient:
+    """Offline stand-in for bigquery.Client.query in the search path
+
+    Answers the vector index status lookup from index_status/coverage, the
+    VECTOR_SEARCH and exact queries from rows, and COUNT(*) with len(rows).
+    get_table reports modified as the table's last modification time. Every
+    query's SQL and job config is kept in .queries for inspection.
+    """
+
+    def __init__(
+        self,
+        rows: Optional[pd.DataFrame] = None,
+        index_status: Optional[str] = None,
+        coverage: float = 100.0,
+        fail_vector_search: bool = False,
+        status_delay: float = 0.0,
+    ):
+        self.rows = rows if rows is not None else pd.DataFrame(columns=ROW_COLUMNS)
+        self.index_status = index_status
+        self.coverage = coverage
+        self.fail_vector_search = fail_vector_search
+        self.status_delay = status_delay
+        self.modified = datetime.now(timezone.utc)
+        self.queries: List[Tuple[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def get_table(self, table_id: str) -> SimpleNamespace:
+        return SimpleNamespace(table_id=table_id, modified=self.modified)
+
+    def query(self, sql: str, job_config=None) -> _FakeQueryJob:
+        with self._lock:
+            self.queries.append((sql, job_config))
+        if "INFORMATION_SCHEMA.VECTOR_INDEXES" in sql:
+            time.sleep(self.status_delay)
+            if self.index_status is None:
+                return _FakeQueryJob(pd.DataFrame(), 0)
+            frame = pd.DataFrame(
+                {
+                    "index_status": [self.index_status],
+                    "coverage_percentage": [self.coverage],
+                }
+            )
+            return _FakeQueryJob(frame, 0)
+        if "VECTOR_SEARCH(" in sql:
+            if self.fail_vector_search:
+                raise RuntimeError("vector index is not usable")
+            return _FakeQueryJob(self._results(), 10 * 1024**2)
+        if "COUNT(*)" in sql:
+            return _FakeQueryJob(pd.DataFrame({"row_count": [len(self.rows)]}), 0)
+        return _FakeQueryJob(self._results(), 100 * 1024**2)
+
+    def _results(self) -> pd.DataFrame:
+        results = self.rows.copy()
+        results["distance"] = np.linspace(0.1, 0.9, len(results))
+        return results
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from agent.generator import router
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_answer_streams_context_tokens_then_done(client):
+    response = client.post("/query/answer", json={"query": "How to merge two dicts?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "context"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+
+    context, done = events[0][1], events[-1][1]
+    assert context["passages"] > 0 and context["context_tokens"] > 0
+    text = "".join(data["text"] for name, data in events if name == "token")
+    model = router.model(0)
+    assert text == model.model.answer
+    # FakeStreamingModel holds the first chunk back for first_token_delay
+    assert done["time_to_first_token_ms"] >= model.model.first_token_delay * 1000
+    assert done["tokens_per_second"] > 0
+    assert done["output_tokens"] > 0
+    assert done["model"] == router.tiers[0]
+
+
+def test_answer_records_usage_for_the_endpoint(client):
+    client.post(
+        "/query/answer", json={"query": "async await"}, params={"user_id": "u1"}
+    )
+
+    usage = client.get("/usage").json()["data"]
+    assert usage["by_endpoint"]["/query/answer"]["output_tokens"] > 0
+    assert "u1" in usage["by_user"]
@@ -0,0 +1,174 @@
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from agent import bigquery_search
+from agent.bigquery_search import (
+    VectorIndexStatus,
+    build_exact_query,
+    build_vector_index_ddl,
+    build_filter_clause,
+    build_vector_search_query,
+    search,
+)
+from agent.vector_index import ROW_COLUMNS
+from config.config import Config
+from fakes import FakeBigQueryClient
+
+ROOT = Path(__file__).resolve().parent.parent
+ROWS = pd.DataFrame(
+    [("1", "title", "content", 0, 0, 7), ("2", "other", "text", 1, 7, 11)],
+    columns=ROW_COLUMNS,
+)
+
+
+def _params(job_config):
+    return {param.name: param for param in job_config.query_parameters}
+
+
+def test_filter_clause_predicates_and_parameters():
+    after = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    where, params = build_filter_clause(
+        {"tags": ["python"], "created_after": after, "min_score": "3"}
+    )
+
+    assert where.startswith("deleted IS NOT TRUE AND ")
+    assert "IN UNNEST(@filter_tags)" in where
+    assert "creation_date >= @created_after" in where
+    assert "score >= @min_score" in where
+    assert "created_before" not in where
+    values = {param.name: param for param in params}
+    assert values["filter_tags"].values == ["python"]
+    assert values["min_score"].value == 3
+    assert build_filter_clause(None) == ("deleted IS NOT TRUE", [])
+
+
+def test_primary_tag_filter_uses_the_clustering_column():
+    where, params = build_filter_clause({"primary_tag": ["python", "django"]})
+
+    assert where == (
+        "deleted IS NOT TRUE AND primary_tag IN UNNEST(@filter_primary_tags)"
+    )
+    assert params[0].name == "filter_primary_tags"
+    assert params[0].values == ["python", "django"]
+
+
+def test_query_builders():
+    exact = build_exact_query(5, {"min_score": 1})
+    assert "ML.DISTANCE(embedding, @query_embedding, 'COSINE')" in exact
+    assert "LIMIT 5" in exact
+    assert "score >= @min_score" in exact
+
+    vector = build_vector_search_query(7, 0.05, {"min_score": 1})
+    assert "VECTOR_SEARCH(" in vector
+    assert "top_k => 7" in vector
+    assert """options => '{"fraction_lists_to_search": 0.05}'""" in vector
+    assert "WHERE deleted IS NOT TRUE AND score >= @min_score" in vector
+    assert "options =>" not in build_vector_search_query(7)
+
+
+def test_vector_index_stores_every_returned_column():
+    ddl = build_vector_index_ddl()
+    script = (ROOT / "sql" / "create_vector_index.sql").read_text()
+
+    for column in ROW_COLUMNS + ["tags", "primary_tag", "creation_date", "score"]:
+        assert column in ddl.split("STORING (")[1].split(")")[0]
+        assert column in script.split("STORING (")[1].split(")")[0]
+
+
+def test_active_index_uses_vector_search():
+    client = FakeBigQueryClient(ROWS, index_status="ACTIVE")
+
+    results = search(
+        client, [0.1, 0.2], 2, filters={"min_score": 1}, status=VectorIndexStatus()
+    )
+
+    assert results.attrs["search_path"] == "vector_search"
+    assert results.attrs["bytes_processed"] == 10 * 1024**2
+    assert results["doc_id"].tolist() == ["1", "2"]
+    sql, job_config = client.queries[-1]
+    assert "VECTOR_SEARCH(" in sql
+    params = _params(job_config)
+    assert params["query_embedding"].values == [0.1, 0.2]
+    assert params["min_score"].value == 1
+
+
+def test_missing_or_partial_index_uses_exact_search():
+    for client in (
+        FakeBigQueryClient(ROWS),
+        FakeBigQueryClient(ROWS, index_status="PENDING DISABLEMENT"),
+        FakeBigQueryClient(ROWS, index_status="ACTIVE", coverage=40.0),
+    ):
+        results = search(client, [0.1], 2, status=VectorIndexStatus())
+        assert results.attrs["search_path"] == "exact"
+        assert not any("VECTOR_SEARCH(" in sql for sql, _ in client.queries)
+
+
+def test_disabled_vector_search_skips_status_lookup(monkeypatch):
+    monkeypatch.setattr(Config, "VECTOR_SEARCH_ENABLED", False)
+    client = FakeBigQueryClient(ROWS, index_status="ACTIVE")
+
+    results = search(client, [0.1], 2, status=VectorIndexStatus())
+
+    assert results.attrs["search_path"] == "exact"
+    assert len(client.queries) == 1
+
+
+def test_vector_search_failure_falls_back_and_rechecks_status():
+    client = FakeBigQueryClient(ROWS, index_status="ACTIVE", fail_vector_search=True)
+    status = VectorIndexStatus(ttl=300)
+
+    results = search(client, [0.1], 2, status=status)
+
+    assert results.attrs["search_path"] == "exact"
+    assert len(results) == 2
+    # the failure drops the cached status so the next search reads it again
+    client.fail_vector_search = False
+    assert search(client, [0.1], 2, status=status).attrs["search_path"] == (
+        "vector_search"
+    )
+    lookups = [sql for sql, _ in client.queries if "INFORMATION_SCHEMA" in sql]
+    assert len(lookups) == 2
+
+
+def test_status_is_cached_for_the_ttl():
+    client = FakeBigQueryClient(index_status="ACTIVE")
+    status = VectorIndexStatus(ttl=300)
+
+    assert status.is_ready(client)
+    client.index_status = None
+    assert status.is_ready(client)
+    assert len(client.queries) == 1
+
+
+def test_status_refresh_does_not_block_other_callers():
+    client = FakeBigQueryClient(index_status="ACTIVE", status_delay=0.3)
+    status = VectorIndexStatus(ttl=0)
+    status._status = {"index_status": "ACTIVE", "coverage_percentage": 100.0}
+    refresher = threading.Thread(target=status.get, args=(client,))
+    refresher.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    cached = status.get(client)
+    elapsed = time.perf_counter() - start
+    refresher.join()
+
+    assert cached["index_status"] == "ACTIVE"
+    assert elapsed < 0.1
+    assert len(client.queries) == 1
+
+
+def test_ensure_vector_index_waits_for_enough_rows(monkeypatch):
+    monkeypatch.setattr(bigquery_search, "index_status", VectorIndexStatus())
+    monkeypatch.setattr(Config, "VECTOR_SEARCH_MIN_ROWS", 3)
+    client = FakeBigQueryClient(ROWS)
+
+    assert not bigquery_search.ensure_vector_index(client)
+    client.rows = pd.concat([ROWS, ROWS])
+    bigquery_search.index_status.reset()
+    assert bigquery_search.ensure_vector_index(client)
+    assert "CREATE VECTOR INDEX" in client.queries[-1][0]
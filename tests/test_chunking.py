@@ -0,0 +1,42 @@
+import random
+
+from agent.chunking import chunk_document, estimate_tokens
+from benchmarks.chunking import _document
+
+
+def _assert_no_contained_chunks(chunks):
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.end > previous.end, (previous, chunk)
+        assert chunk.start > previous.start, (previous, chunk)
+
+
+def test_large_code_block_does_not_repeat_overlap():
+    prose = " ".join(f"Sentence number {i} explains the code below." for i in range(40))
+    code = "\n".join(f"    value_{i} = compute({i})" for i in range(60))
+    text = f"{prose}\n```\ndef example():\n{code}\n```\nA closing sentence."
+
+    chunks = chunk_document(text, max_tokens=100, overlap_tokens=30, html=False)
+
+    _assert_no_contained_chunks(chunks)
+    assert chunks[-1].end == len(text.rstrip())
+    assert all(chunk.tokens <= 100 for chunk in chunks)
+
+
+def test_overlap_kept_when_next_chunk_fits():
+    text = " ".join(f"Sentence {i} has a few words in it." for i in range(60))
+
+    chunks = chunk_document(text, max_tokens=64, overlap_tokens=16, html=False)
+
+    _assert_no_contained_chunks(chunks)
+    assert any(
+        chunk.start < previous.end for previous, chunk in zip(chunks, chunks[1:])
+    )
+
+
+def test_synthetic_corpus_chunks_never_contained_in_predecessor():
+    rng = random.Random(0)
+    for _ in range(300):
+        document = _document(rng)
+        chunks = chunk_document(document, max_tokens=64, overlap_tokens=24)
+        _assert_no_contained_chunks(chunks)
+        assert all(chunk.tokens == estimate_tokens(chunk.text) for chunk in chunks)
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from agent.embedding_batcher import EmbeddingBatcher
+
+
+def test_embed_times_out_and_drops_queued_requests():
+    release = threading.Event()
+    calls = []
+
+    def embed_fn(texts):
+        calls.append(list(texts))
+        release.wait(5)
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_fn, window_ms=0, timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        batcher.embed("in flight")
+    # queued behind the stuck call, cancelled before it is dispatched
+    with pytest.raises(TimeoutError):
+        batcher.embed("queued")
+    release.set()
+
+    batcher.timeout = 5
+    assert batcher.embed("abc") == [3.0]
+    assert calls == [["in flight"], ["abc"]]
+    assert batcher.stats()["timeouts"] == 2
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def embed_fn(texts):
+        raise RuntimeError("quota exceeded")
+
+    batcher = EmbeddingBatcher(embed_fn, window_ms=0, timeout=5)
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        batcher.embed("text")
@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from agent.embedding_cache import EmbeddingCache
+
+
+def _disk_keys(path):
+    with sqlite3.connect(path) as db:
+        return {key for (key,) in db.execute("SELECT key FROM embeddings")}
+
+
+def test_disk_tier_keeps_the_newest_rows_up_to_its_cap(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(
+        "model", max_size=2, ttl=0, disk_path=path, disk_max_size=3, prune_every=1
+    )
+
+    for i in range(6):
+        cache.put(f"query {i}", [float(i)])
+
+    assert _disk_keys(path) == {f"model:query {i}" for i in (3, 4, 5)}
+    assert cache.stats()["disk_evictions"] == 3
+    # evicted from memory, still served from disk
+    assert cache.get("query 3") == [3.0]
+
+
+def test_expired_disk_rows_are_deleted(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache("model", ttl=0.05, disk_path=path, prune_every=2)
+
+    cache.put("old", [1.0])
+    time.sleep(0.06)
+    cache.put("new", [2.0])
+
+    assert _disk_keys(path) == {"model:new"}
+    assert cache.get("old") is None
+
+
+def test_reopening_prunes_an_oversized_file(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache("model", ttl=0, disk_path=path, disk_max_size=0)
+    for i in range(5):
+        cache.put(f"query {i}", [float(i)])
+
+    EmbeddingCache("model", ttl=0, disk_path=path, disk_max_size=2)
+
+    assert _disk_keys(path) == {"model:query 3", "model:query 4"}
@@ -0,0 +1,141 @@
+import threading
+
+import pandas as pd
+
+from agent import indexer
+from agent.jobs import IndexJobManager
+
+
+class _Job:
+    def result(self):
+        return self
+
+
+class _RecordingClient:
+    """records the staging tables each index_data call loads, merges and drops"""
+
+    def __init__(self):
+        self.loaded, self.merged, self.deleted = [], [], []
+        self._lock = threading.Lock()
+
+    def load_table_from_dataframe(self, df, table_id, job_config=None):
+        with self._lock:
+            self.loaded.append(table_id)
+        return _Job()
+
+    def query(self, sql):
+        with self._lock:
+            self.merged.append(sql.split("USING `")[1].split("`")[0])
+        return _Job()
+
+    def delete_table(self, table_id, not_found_ok=False):
+        with self._lock:
+            self.deleted.append(table_id)
+
+
+def _batch(doc_id):
+    return pd.DataFrame(
+        [
+            {
+                "id": doc_id,
+                "chunk_index": 0,
+                "title": "title",
+                "body": "content",
+                "tags": ["python"],
+                "primary_tag": "python",
+                "creation_date": pd.Timestamp("2020-01-01", tz="UTC"),
+                "score": 1,
+                "char_start": 0,
+                "char_end": 7,
+                "embedding": [0.1, 0.2],
+                "content_hash": "hash",
+                "fingerprint": "fingerprint",
+                "deleted": False,
+            }
+        ]
+    )
+
+
+def test_concurrent_batches_use_their_own_staging_tables(monkeypatch):
+    client = _RecordingClient()
+    monkeypatch.setattr(indexer, "bq", client)
+    monkeypatch.setattr(indexer.Config, "EMBEDDING_STORAGE", "float64")
+
+    threads = [
+        threading.Thread(target=indexer.index_data, args=(_batch(str(i)),))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(client.loaded)) == 4
+    assert sorted(client.merged) == sorted(client.loaded)
+    assert sorted(client.deleted) == sorted(client.loaded)
+
+
+class _Pipeline:
+    def __init__(self, written):
+        self.written = written
+
+    def run(self, source, stages):
+        return {
+            "write": {
+                "stage": "write",
+                "rows": self.written,
+                "batches": 1,
+                "rows_per_second": 1.0,
+            }
+        }
+
+
+def test_finished_run_rebuilds_local_indexes_once_when_it_wrote(monkeypatch):
+    builds = []
+    monkeypatch.setattr(indexer, "iter_data", lambda limit: iter(()))
+    monkeypatch.setattr(indexer, "ensure_vector_index", lambda client: False)
+    monkeypatch.setattr(indexer, "build_local_indexes", builds.append)
+
+    indexer.main(10, pipeline=_Pipeline(written=0))
+    assert builds == []
+
+    indexer.main(10, pipeline=_Pipeline(written=25))
+    assert builds == [indexer.bq]
+
+
+def test_job_reports_tombstones_apart_from_written_chunks(monkeypatch):
+    batch = pd.DataFrame({"id": ["1", "1", "2"], "deleted": [False, True, True]})
+    monkeypatch.setattr(indexer, "iter_data", lambda limit: iter([batch]))
+    for stage in ("chunk_data", "diff_chunks", "embed_chunk_data"):
+        monkeypatch.setattr(indexer, stage, lambda chunks: chunks)
+    monkeypatch.setattr(indexer, "index_data", len)
+    monkeypatch.setattr(indexer, "ensure_vector_index", lambda client: False)
+    monkeypatch.setattr(indexer, "build_local_indexes", lambda client: None)
+    finished = threading.Event()
+    jobs = IndexJobManager(indexer.main, on_finished=lambda job: finished.set())
+
+    job = jobs.submit(10)
+    assert finished.wait(5)
+    jobs.shutdown()
+
+    progress = job.to_dict()
+    assert progress["status"] == "completed"
+    assert (progress["chunks_written"], progress["chunks_tombstoned"]) == (1, 2)
+
+
+def test_tombstone_missing_reaches_the_index_run():
+    calls = []
+    finished = threading.Event()
+    jobs = IndexJobManager(
+        lambda limit, pipeline, tombstone_missing: calls.append(
+            (limit, tombstone_missing)
+        ),
+        on_finished=lambda job: finished.set(),
+    )
+
+    job = jobs.submit(5, tombstone_missing=True)
+    assert finished.wait(5)
+    jobs.shutdown()
+
+    assert calls == [(5, True)]
+    assert job.to_dict()["tombstone_missing"] is True
@@ -0,0 +1,129 @@
+import time
+
+from agent.fake_model import FakeStreamingModel
+from agent.llm_cache import CachedModel, LLMResponseCache
+
+LOW = {"temperature": 0.0}
+
+
+def _model(cache, **kwargs):
+    fake = FakeStreamingModel(answer="one two three four five six seven", **kwargs)
+    usage = []
+    cached = CachedModel(
+        fake,
+        "fake",
+        cache,
+        on_usage=lambda name, metadata: usage.append(metadata.total_token_count),
+    )
+    return cached, fake, usage
+
+
+def _text(chunks):
+    return "".join(chunk.text for chunk in chunks)
+
+
+def test_repeated_call_is_a_hit():
+    cache = LLMResponseCache()
+    model, fake, usage = _model(cache, first_token_delay=0.05, token_delay=0)
+
+    first = model.generate_content("prompt", generation_config=LOW)
+    start = time.perf_counter()
+    second = model.generate_content("prompt", generation_config=LOW)
+
+    assert time.perf_counter() - start < 0.05
+    assert second is first
+    assert fake.calls == 1
+    # hits are not billed
+    assert len(usage) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["latency_saved_seconds"] >= 0.05
+
+
+def test_different_prompt_or_config_is_a_miss():
+    cache = LLMResponseCache()
+    model, fake, _ = _model(cache, first_token_delay=0, token_delay=0)
+
+    model.generate_content("prompt", generation_config=LOW)
+    model.generate_content("other prompt", generation_config=LOW)
+    model.generate_content("prompt", generation_config={"temperature": 0.1})
+
+    assert fake.calls == 3
+    assert cache.stats()["misses"] == 3
+
+
+def test_sampled_calls_bypass_the_cache():
+    cache = LLMResponseCache(max_temperature=0.2)
+    model, fake, usage = _model(cache, first_token_delay=0, token_delay=0)
+
+    for config in ({"temperature": 0.7}, None, {"temperature": 0.7}):
+        model.generate_content("prompt", generation_config=config)
+    model.generate_content("prompt", generation_config=LOW, tools=["tool"])
+    chunks = model.generate_content(
+        "prompt", generation_config={"temperature": 0.7}, stream=True
+    )
+    _text(chunks)
+
+    assert fake.calls == 5
+    assert len(usage) == 5
+    stats = cache.stats()
+    assert (stats["bypassed"], stats["size"]) == (5, 0)
+
+
+def test_entries_expire_after_the_ttl():
+    cache = LLMResponseCache(ttl=0.05)
+    model, fake, _ = _model(cache, first_token_delay=0, token_delay=0)
+
+    model.generate_content("prompt", generation_config=LOW)
+    time.sleep(0.06)
+    model.generate_content("prompt", generation_config=LOW)
+
+    assert fake.calls == 2
+    assert cache.stats()["hits"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LLMResponseCache(max_size=2)
+    model, fake, _ = _model(cache, first_token_delay=0, token_delay=0)
+
+    for prompt in ("a", "b", "a", "c"):
+        model.generate_content(prompt, generation_config=LOW)
+    assert fake.calls == 3
+
+    model.generate_content("a", generation_config=LOW)
+    assert fake.calls == 3
+    model.generate_content("b", generation_config=LOW)
+    assert fake.calls == 4
+    assert cache.stats()["size"] == 2
+
+
+def test_completed_stream_is_replayed():
+    cache = LLMResponseCache()
+    model, fake, usage = _model(cache, first_token_delay=0.05, token_delay=0)
+
+    first = list(model.generate_content("prompt", generation_config=LOW, stream=True))
+    start = time.perf_counter()
+    second = list(model.generate_content("prompt", generation_config=LOW, stream=True))
+
+    assert time.perf_counter() - start < 0.05
+    assert _text(second) == _text(first) == fake.answer
+    assert len(second) == len(first) > 1
+    assert second[-1].usage_metadata is not None
+    assert fake.calls == 1
+    assert len(usage) == 1
+    # a stream transcript never answers a non-streaming call
+    model.generate_content("prompt", generation_config=LOW)
+    assert fake.calls == 2
+
+
+def test_abandoned_stream_is_not_cached():
+    cache = LLMResponseCache()
+    model, fake, _ = _model(cache, first_token_delay=0, token_delay=0)
+
+    stream = model.generate_content("prompt", generation_config=LOW, stream=True)
+    next(stream)
+    stream.close()
+    list(model.generate_content("prompt", generation_config=LOW, stream=True))
+
+    assert fake.calls == 2
+    assert cache.stats()["size"] == 1
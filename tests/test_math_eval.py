@@ -0,0 +1,28 @@
+import pytest
+
+from agent.math_eval import MathError, evaluate
+from config.config import Config
+
+
+def test_results_up_to_the_bit_limit_are_allowed():
+    limit = Config.MATH_MAX_INT_BITS
+
+    assert evaluate(f"2**{limit - 1}") == 2 ** (limit - 1)
+    assert evaluate(f"-2**{limit - 1}") == -(2 ** (limit - 1))
+    assert evaluate(f"2**{limit // 2} * 2**{limit // 2 - 1}") == 2 ** (limit - 1)
+    assert evaluate("3**2584").bit_length() == limit
+    assert evaluate("1**10000") == 1
+    assert evaluate("0**10000") == 0
+
+
+def test_results_over_the_bit_limit_are_rejected():
+    limit = Config.MATH_MAX_INT_BITS
+
+    for expression in (
+        f"2**{limit}",
+        "3**2585",
+        f"2**{limit // 2} * 2**{limit // 2}",
+        "(10**1000)**10",
+    ):
+        with pytest.raises(MathError):
+            evaluate(expression)
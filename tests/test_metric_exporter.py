@@ -0,0 +1,88 @@
+import time
+
+from telemetry.exporter import MAX_SERIES_PER_REQUEST, MetricExporter
+from telemetry.fake_metric_client import FakeMetricClient
+
+
+def _exporter(client, **kwargs):
+    kwargs.setdefault("flush_interval", 3600)
+    return MetricExporter(client, "projects/test", **kwargs)
+
+
+def _values(client):
+    return {
+        (
+            series.metric.type,
+            tuple(sorted(series.metric.labels.items())),
+        ): series.points[0].value.double_value
+        for batch in client.requests
+        for series in batch
+    }
+
+
+def test_series_are_written_in_batches_of_at_most_the_api_limit():
+    client = FakeMetricClient(latency=0)
+    exporter = _exporter(client)
+
+    for i in range(450):
+        exporter.add("custom.googleapis.com/test/count", 1.0, {"i": i}, "sum")
+    exporter.shutdown()
+
+    assert [len(batch) for batch in client.requests] == [
+        MAX_SERIES_PER_REQUEST,
+        MAX_SERIES_PER_REQUEST,
+        50,
+    ]
+    stats = exporter.stats()
+    assert (stats["series_written"], stats["failed_requests"]) == (450, 0)
+
+
+def test_points_are_aggregated_per_metric_labels_and_aggregate():
+    client = FakeMetricClient(latency=0)
+    exporter = _exporter(client)
+
+    for value in (1.0, 2.0, 3.0):
+        exporter.add("custom.googleapis.com/test/count", value, {"a": "x"}, "sum")
+        exporter.add("custom.googleapis.com/test/latency", value, {"a": "x"})
+        exporter.add("custom.googleapis.com/test/latency", value * 10, {"a": "y"})
+    exporter.shutdown()
+
+    assert _values(client) == {
+        ("custom.googleapis.com/test/count", (("a", "x"),)): 6.0,
+        ("custom.googleapis.com/test/latency", (("a", "x"),)): 2.0,
+        ("custom.googleapis.com/test/latency", (("a", "y"),)): 20.0,
+    }
+    assert exporter.stats()["points"] == 9
+
+
+def test_points_beyond_the_bounded_queue_are_dropped(monkeypatch):
+    client = FakeMetricClient(latency=0)
+    exporter = _exporter(client, max_queue=5)
+    # no worker draining the queue, so it fills up
+    monkeypatch.setattr(exporter, "_ensure_worker", lambda: None)
+
+    for _ in range(8):
+        exporter.add("custom.googleapis.com/test/count", 1.0, aggregate="sum")
+
+    assert exporter.stats()["dropped_points"] == 3
+    exporter.shutdown()
+    assert _values(client) == {("custom.googleapis.com/test/count", ()): 5.0}
+    # nothing is accepted after shutdown
+    exporter.add("custom.googleapis.com/test/count", 1.0, aggregate="sum")
+    assert exporter.stats()["dropped_points"] == 4
+
+
+def test_shutdown_flushes_pending_series_after_the_minimum_interval():
+    client = FakeMetricClient(latency=0, min_interval=0.3)
+    exporter = _exporter(client, min_write_interval=0.3)
+
+    exporter.add("custom.googleapis.com/test/count", 1.0, aggregate="sum")
+    exporter.flush()
+    start = time.monotonic()
+    exporter.add("custom.googleapis.com/test/count", 1.0, aggregate="sum")
+    exporter.shutdown()
+
+    assert time.monotonic() - start >= 0.25
+    assert len(client.requests) == 2
+    stats = exporter.stats()
+    assert (stats["series_written"], stats["failed_requests"]) == (2, 0)
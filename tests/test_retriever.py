@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from agent import retriever
+from agent.vector_index import TableModifiedCheck
+from fakes import FakeBigQueryClient
+
+
+def test_result_cache_is_scoped_by_fraction_lists_to_search(monkeypatch):
+    calls = []
+    real_search = retriever.vector_index.search
+
+    def search(query_embedding, top_k, n_probe=0):
+        calls.append(n_probe)
+        return real_search(query_embedding, top_k, n_probe=n_probe)
+
+    monkeypatch.setattr(retriever.vector_index, "search", search)
+    retriever.result_cache.invalidate()
+
+    retriever.retrieve("merge two dicts", top_k=2, fraction_lists_to_search=0.5)
+    retriever.retrieve("merge two dicts", top_k=2, fraction_lists_to_search=1.0)
+    cached = retriever.retrieve(
+        "merge two dicts", top_k=2, fraction_lists_to_search=1.0
+    )
+
+    assert calls == [1, 1]
+    assert cached.attrs["search_path"] == "cache"
+
+
+def test_stale_snapshot_falls_back_to_bigquery(monkeypatch):
+    rows = retriever.vector_index.rows.head(2)
+    client = FakeBigQueryClient(rows)
+    built_at = client.modified.timestamp()
+    monkeypatch.setattr(retriever, "bq", client)
+    monkeypatch.setattr(retriever, "table_check", TableModifiedCheck(ttl=0))
+    monkeypatch.setattr(retriever.vector_index, "source_modified", built_at)
+    retriever.result_cache.invalidate()
+
+    fresh = retriever.retrieve("merge two dicts", top_k=2)
+    assert fresh.attrs["search_path"] == "local_index"
+
+    # a later index job or tombstone run changed the table
+    client.modified += timedelta(seconds=5)
+    retriever.result_cache.invalidate()
+    stale = retriever.retrieve("merge two dicts", top_k=2, mode="hybrid")
+    assert stale.attrs["search_path"] == "exact"
+    assert retriever.local_indexes() == (None, None)
+
+
+def test_snapshot_without_build_time_is_not_served(monkeypatch):
+    client = FakeBigQueryClient()
+    monkeypatch.setattr(retriever, "bq", client)
+    monkeypatch.setattr(retriever, "table_check", TableModifiedCheck(ttl=0))
+    monkeypatch.setattr(retriever.vector_index, "source_modified", None)
+
+    assert retriever.local_indexes() == (None, None)
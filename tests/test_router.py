@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from agent.fake_model import FakeStreamingModel
+from agent.router import ModelRouter, parse_tiers
+
+
+def _router(**kwargs):
+    models = {}
+
+    def factory(name, with_tools):
+        models[name] = FakeStreamingModel(
+            answer=f"{name} answer", first_token_delay=0, token_delay=0
+        )
+        return models[name]
+
+    return ModelRouter(["small", "medium", "large"], factory, **kwargs), models
+
+
+def test_prompt_length_and_tools_pick_the_tier():
+    router, _ = _router(small_tool_tokens=2000, small_text_tokens=300)
+
+    assert router.choose(100) == 0
+    assert router.choose(1000) == 1
+    assert router.choose(1000, needs_tools=True) == 0
+    assert router.choose(5000, needs_tools=True) == 1
+    assert router.choose(1000, cost_budget=1.0) == 0
+
+
+def test_failure_escalates_one_tier():
+    router, _ = _router()
+    failing = FakeStreamingModel(first_token_delay=0, token_delay=0, fail_first=1)
+    router._models[("small", False)] = failing
+
+    response = router.generate("hi", prompt_tokens=10)
+
+    assert response.text == "medium answer"
+    stats = router.stats()
+    assert stats["escalated_requests"] == 1
+    assert stats["routes"]["small"]["failures"] == 1
+
+
+def test_low_confidence_output_escalates():
+    router, _ = _router()
+    router._models[("small", False)] = FakeStreamingModel(
+        answer="", first_token_delay=0, token_delay=0
+    )
+
+    assert router.generate("hi", prompt_tokens=10).text == "medium answer"
+
+
+def test_error_on_top_tier_is_raised():
+    router = ModelRouter(
+        ["only"],
+        lambda name, tools: FakeStreamingModel(
+            first_token_delay=0, token_delay=0, fail_first=1
+        ),
+    )
+    with pytest.raises(RuntimeError):
+        router.generate("hi", prompt_tokens=10)
+
+
+def test_slow_tier_is_probed_again_after_the_interval():
+    router, _ = _router(probe_interval=0.05)
+    router.record(1, 10.0, True, False)
+
+    assert router.choose(5000, latency_budget=2.0) == 0
+    time.sleep(0.06)
+    # one request probes the slow tier, the next ones keep avoiding it
+    assert router.choose(5000, latency_budget=2.0) == 1
+    assert router.choose(5000, latency_budget=2.0) == 0
+
+    # fast probe results bring the estimate back under the budget
+    for _ in range(20):
+        router.record(1, 0.5, True, False)
+    assert router.choose(5000, latency_budget=2.0) == 1
+
+
+def test_parse_tiers_drops_duplicates():
+    assert parse_tiers("a, b,a,,c") == ["a", "b", "c"]
+    assert parse_tiers("gemini-2.5-flash") == ["gemini-2.5-flash"]
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from agent.service import AsyncService, wait_result
+
+
+def test_timed_out_call_holds_its_slot_until_the_worker_finishes():
+    service = AsyncService(max_workers=4, limits={"slow": 1}, timeouts={"slow": 0.05})
+    started = []
+
+    def work(seconds):
+        started.append(time.perf_counter())
+        time.sleep(seconds)
+        return seconds
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await service.run("slow", work, 0.3)
+        assert service.stats()["in_flight"]["slow"] == 1
+        assert await service.run("slow", work, 0, timeout=5) == 0
+        assert service.stats()["in_flight"]["slow"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        service.shutdown()
+
+    # the second call only started once the timed-out one was done
+    assert started[1] - started[0] >= 0.29
+    assert service.stats()["timeouts"] == {"slow": 1}
+
+
+def test_errors_release_the_slot():
+    service = AsyncService(max_workers=2, limits={"dep": 1}, timeouts={})
+
+    def fail():
+        raise ValueError("boom")
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await service.run("dep", fail)
+        await asyncio.sleep(0)
+        assert service.stats()["in_flight"]["dep"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        service.shutdown()
+
+
+def test_wait_result_cancels_queued_work_past_the_deadline():
+    executor = ThreadPoolExecutor(max_workers=1)
+    running = executor.submit(time.sleep, 0.2)
+    queued = executor.submit(lambda: "never")
+
+    for future in (running, queued):
+        with pytest.raises(FutureTimeoutError):
+            wait_result(future, time.time() + 0.01)
+
+    assert queued.cancelled()
+    assert not running.cancelled()
+    assert wait_result(executor.submit(lambda: 1), time.time() + 1) == 1
+    executor.shutdown()
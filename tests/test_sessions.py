@@ -0,0 +1,109 @@
+import threading
+import time
+
+from agent.fake_model import FakeUsage
+from agent.sessions import SessionStore
+from agent.usage import UsageTracker, usage_scope
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_compaction_runs_after_the_exchange_without_the_session_lock():
+    started, release = threading.Event(), threading.Event()
+    compacted = []
+
+    def summarize(previous, turns):
+        started.set()
+        release.wait(5)
+        return f"summary of {len(turns)} turns"
+
+    store = SessionStore(
+        summarize, token_budget=20, keep_turns=2, on_compact=compacted.append
+    )
+    session = store.get("s")
+    text = "word " * 10
+
+    with session.lock:
+        store.append(session, text, text)
+        store.append(session, text, text)
+    assert store.stats()["pending_compactions"] == 1
+    assert started.wait(2)
+
+    # the summarize call is still blocked, the next exchange goes through
+    assert session.lock.acquire(timeout=0.5)
+    try:
+        store.append(session, "next question", "next answer")
+    finally:
+        session.lock.release()
+    release.set()
+
+    _wait_for(lambda: store.stats()["pending_compactions"] == 0)
+    assert session.summary == "summary of 2 turns"
+    assert [turn.text for turn in session.turns] == [
+        text,
+        text,
+        "next question",
+        "next answer",
+    ]
+    assert compacted == [session]
+    store.shutdown()
+
+
+def test_inline_compaction_keeps_the_last_turns():
+    store = SessionStore(
+        lambda previous, turns: "summary",
+        token_budget=20,
+        keep_turns=2,
+        compaction_workers=0,
+    )
+    session = store.get("s")
+
+    for i in range(3):
+        store.append(session, f"question {i} " * 5, f"answer {i} " * 5)
+
+    assert session.summary == "summary"
+    assert len(session.turns) == 2
+    assert session.turns[-1].text.startswith("answer 2")
+    assert store.stats()["compactions"] >= 1
+
+
+def test_failed_summary_drops_the_older_turns():
+    def summarize(previous, turns):
+        raise RuntimeError("model unavailable")
+
+    store = SessionStore(summarize, token_budget=10, keep_turns=2)
+    session = store.get("s")
+
+    with session.lock:
+        store.append(session, "a " * 20, "b " * 20)
+        store.append(session, "c", "d")
+
+    _wait_for(lambda: session.compactions == 1)
+    assert [turn.text for turn in session.turns] == ["c", "d"]
+    assert session.summary == ""
+    store.shutdown()
+
+
+def test_background_compaction_is_billed_to_the_request_endpoint():
+    records = []
+    tracker = UsageTracker(on_record=records.append)
+
+    def summarize(previous, turns):
+        tracker.record_generation("model", FakeUsage(100, 20))
+        return "summary"
+
+    store = SessionStore(summarize, token_budget=10, keep_turns=2)
+    session = store.get("s")
+
+    with usage_scope("/tools/chat", "u1"), session.lock:
+        store.append(session, "a " * 20, "b " * 20)
+        store.append(session, "c", "d")
+
+    _wait_for(lambda: session.compactions == 1)
+    store.shutdown()
+    assert [(r["endpoint"], r["user_id"]) for r in records] == [("/tools/chat", "u1")]
@@ -0,0 +1,31 @@
+import time
+
+from agent import tools
+
+
+def test_memoized_results_get_a_fresh_timestamp():
+    first = tools.execute_tool("do_math", {"expression": "6 * 7"})
+    time.sleep(0.01)
+    second = tools.execute_tool("do_math", {"expression": "6 * 7"})
+
+    assert second["result"] == first["result"] == 42
+    assert second["timestamp"] > first["timestamp"]
+    assert tools.get_tool_cache_stats()["do_math"]["hits"] >= 1
+
+    first = tools.execute_tool(
+        "calculate_distance", {"point1": [0, 0], "point2": [3, 4]}
+    )
+    time.sleep(0.01)
+    second = tools.execute_tool(
+        "calculate_distance", {"point1": [0, 0], "point2": [3, 4]}
+    )
+    assert second["distance"] == first["distance"]
+    assert second["timestamp"] > first["timestamp"]
+
+
+def test_ttl_results_keep_their_observation_time():
+    first = tools.execute_tool("get_weather", {"city": "Tainan"})
+    time.sleep(0.01)
+    second = tools.execute_tool("get_weather", {"city": "Tainan"})
+
+    assert second == first
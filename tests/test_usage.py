@@ -0,0 +1,32 @@
+from telemetry.monitoring import CloudMonitoring
+
+
+def test_usage_metrics_are_not_labelled_per_user(monkeypatch):
+    written = []
+    monkeypatch.setattr(
+        CloudMonitoring,
+        "write_time_series",
+        lambda self, metric_type, value, labels=None, aggregate="mean": written.append(
+            (metric_type, labels)
+        ),
+    )
+    record = {
+        "endpoint": "/query/answer",
+        "model": "gemini-2.5-flash",
+        "kind": "generation",
+        "user_id": "alice",
+        "prompt_tokens": 100,
+        "output_tokens": 20,
+        "cached_tokens": 0,
+        "characters": 0,
+        "cost_usd": 0.001,
+    }
+
+    CloudMonitoring.log_usage_metrics(object.__new__(CloudMonitoring), record)
+
+    assert [metric for metric, _ in written] == [
+        "custom.googleapis.com/usage/tokens",
+        "custom.googleapis.com/usage/tokens",
+        "custom.googleapis.com/usage/cost_usd",
+    ]
+    assert all("user_id" not in labels for _, labels in written)